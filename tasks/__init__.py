@@ -1,13 +1,18 @@
 import invoke
-from tasks.actions import setup, test
-from tasks.components import app, desktop, neuro, neurobase, nwjs, tw5
+
+from tasks.lazy import lazy_collection
+
+MODULES = [
+    "tasks.actions.setup",
+    "tasks.actions.test",
+    "tasks.components.app",
+    "tasks.components.desktop",
+    "tasks.components.neuro",
+    "tasks.components.neurobase",
+    "tasks.components.nwjs",
+    "tasks.components.tw5",
+]
 
 ns = invoke.Collection()
-ns.add_collection(setup)
-ns.add_collection(test)
-ns.add_collection(app)
-ns.add_collection(desktop)
-ns.add_collection(neuro)
-ns.add_collection(neurobase)
-ns.add_collection(nwjs)
-ns.add_collection(tw5)
+for module_name in MODULES:
+    ns.add_collection(lazy_collection(module_name))
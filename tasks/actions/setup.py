@@ -3,14 +3,28 @@ Load environment config, chdir to NF_DIR, and prepare submodules.
 """
 
 import getpass
+import hashlib
+import json
 import os
+import queue
 import secrets
+import shutil
 import subprocess
+import threading
+import time
+import tomllib
+from concurrent.futures import ThreadPoolExecutor
 
 import invoke
+from neuro.utils import (
+    build_utils,
+    config,
+    internal_utils,
+    network_utils,
+    terminal_style,
+)
 
-from neuro.utils import build_utils, config, internal_utils, network_utils, terminal_style
-
+from tasks import paths
 
 LOCAL_SUBMODULES = [
     "neuro",
@@ -28,34 +42,148 @@ SUBMODULES = [
     "tw5-plugins/neuroforest/mobile",
 ]
 
+WATCH_EVENTS = "close_write,create,delete,moved_to,moved_from"
+WATCH_EXCLUDE = r"(/\.git/|__pycache__|\.pyc$|\.swp$|~$)"
+WATCH_DEBOUNCE = 0.2
+WATCH_TESTS = "tests"
+WATCH_PYTEST_ARGS = ["-m", "not (integration or e2e)"]  # neuro.test --mode unit
+
+NENV_DIR = "nenv"
+NENV_STAMP = ".neuro-deps"
+NENV_INSTALL_STAMP = ".neuro-install"
+
+APP_DIR = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+CONFIG_FILES = [".env", ".env.local", ".env.testing"]
+
+# (environment, dotenv mtimes) -> variables set by config.main() for that key
+_config_cache = {}
+# Variables the loaded config set, with their values from before it (None if unset).
+_config_applied = {}
+
 
 def reset_submodule(path, branch_name, remote=None):
-    """Reset submodule to a branch. If remote is given, fetch first and reset to remote/branch."""
-    with build_utils.chdir(path):
+    """Reset submodule to a branch. If remote is given, fetch first and reset to remote/branch.
+
+    Runs git with cwd=path so several submodules can be reset concurrently.
+    Returns a summary row: path, target, commit, status (ok/missing/failed), error, seconds.
+    """
+    target = f"{remote}/{branch_name}" if remote else branch_name
+    row = {"path": path, "target": target, "commit": None, "status": "ok", "error": None}
+    started = time.monotonic()
+    try:
         if remote:
-            subprocess.run(["git", "fetch", remote], check=True, capture_output=True)
-        target = f"{remote}/{branch_name}" if remote else branch_name
+            subprocess.run(["git", "fetch", remote], check=True, capture_output=True, cwd=path)
         result = subprocess.run(
             ["git", "rev-parse", "--short", target],
-            capture_output=True, text=True
+            capture_output=True, text=True, cwd=path,
+            check=False,
         )
         if result.returncode != 0:
-            return
-        commit = result.stdout.strip()
-        with terminal_style.step(f"Reset {path} to {target} ({commit})"):
-            subprocess.run(["git", "reset", "--hard", target], check=True, capture_output=True)
-            subprocess.run(["git", "clean", "-fdx"], check=True, capture_output=True)
+            row["status"] = "missing"
+        else:
+            row["commit"] = result.stdout.strip()
+            subprocess.run(["git", "reset", "--hard", target], check=True, capture_output=True, cwd=path)
+            subprocess.run(["git", "clean", "-fdx"], check=True, capture_output=True, cwd=path)
+    except (subprocess.CalledProcessError, OSError) as e:
+        row["status"] = "failed"
+        stderr = getattr(e, "stderr", None)
+        if isinstance(stderr, bytes):
+            stderr = stderr.decode(errors="replace")
+        message = (stderr or "").strip() or str(e)
+        row["error"] = message.splitlines()[-1]
+    row["seconds"] = time.monotonic() - started
+    return row
+
+
+def sync_submodules(components, branch_name, remote=None, jobs=4):
+    """Reset submodules concurrently with at most jobs in flight, preserving order."""
+    with ThreadPoolExecutor(max_workers=max(int(jobs), 1)) as pool:
+        return list(pool.map(lambda path: reset_submodule(path, branch_name, remote), components))
+
+
+def print_sync_table(rows):
+    width = max([len(row["path"]) for row in rows] + [9])
+    print(f"  {'submodule':<{width}} {'target':<20} {'commit':<10} {'time':>7}")
+    for row in rows:
+        mark = terminal_style.SUCCESS if row["status"] == "ok" else terminal_style.FAIL
+        commit = row["commit"] or row["status"]
+        print(f"  {row['path']:<{width}} {row['target']:<20} {commit:<10} {row['seconds']:>6.1f}s {mark}")
+        if row["error"]:
+            print(f"      {row['error']}")
+
+
+def run_sync(components, branch_name, remote=None, jobs=4):
+    target = f"{remote}/{branch_name}" if remote else branch_name
+    terminal_style.header(f"Resetting {len(components)} submodules to {target}")
+    rows = sync_submodules(components, branch_name, remote=remote, jobs=jobs)
+    print_sync_table(rows)
+    if any(row["status"] == "failed" for row in rows):
+        raise SystemExit(1)
+
+
+def get_config_files():
+    """Dotenv files that config.main() may read: the app's, plus NF_CONFIG/.env.local once known."""
+    paths = [os.path.join(APP_DIR, name) for name in CONFIG_FILES]
+    nf_config = os.environ.get("NF_CONFIG")
+    if nf_config:
+        paths.append(os.path.join(nf_config, ".env.local"))
+    return paths
+
+
+def get_config_key():
+    mtimes = []
+    for path in get_config_files():
+        try:
+            mtimes.append(os.stat(path).st_mtime_ns)
+        except FileNotFoundError:
+            mtimes.append(None)
+    return os.environ.get("ENVIRONMENT"), tuple(mtimes)
+
+
+def unload_config():
+    """Undo the variables set by the loaded config, so another environment starts from the process's own."""
+    for key, value in _config_applied.items():
+        if value is None:
+            os.environ.pop(key, None)
+        else:
+            os.environ[key] = value
+    _config_applied.clear()
+
+
+def load_config(environment=None):
+    """Load config once per environment and dotenv mtimes. Returns True if config.main() ran."""
+    environment = environment or os.environ.get("ENVIRONMENT")
+    unload_config()
+    if environment:
+        os.environ["ENVIRONMENT"] = environment
+    before = dict(os.environ)
+    key = get_config_key()
+    cached = _config_cache.get(key)
+    if cached is not None:
+        os.environ.update(cached)
+        loaded = False
+    else:
+        config.CONFIG_INITIALIZED = False
+        config.main()
+        cached = {k: v for k, v in os.environ.items() if before.get(k) != v}
+        _config_cache[key] = cached
+        loaded = True
+    _config_applied.update({key: before.get(key) for key in cached})
+    return loaded
+
+
+def invalidate_config():
+    """Forget loaded config so the next setup.env re-reads the dotenv files."""
+    _config_cache.clear()
 
 
 @invoke.task
 def env(c, environment=None):
     """Load config and chdir to NF_DIR."""
     nf_dir = internal_utils.get_path("nf")
-    if environment:
-        os.environ["ENVIRONMENT"] = environment
-    config.main()
+    loaded = load_config(environment)
     env_name = os.environ["ENVIRONMENT"]
-    if env_name not in ("BUILD", "PRODUCTION"):
+    if loaded and env_name not in ("BUILD", "PRODUCTION"):
         terminal_style.header(f"Environment [{env_name}] {nf_dir}")
     try:
         os.chdir(nf_dir)
@@ -63,13 +191,74 @@ def env(c, environment=None):
         raise invoke.exceptions.Exit("Invalid directory: {}")
 
 
+def read_deps(package="neuro"):
+    """Dependency metadata from a package's pyproject.toml (everything that is not its source)."""
+    with open(os.path.join(package, "pyproject.toml"), "rb") as f:
+        pyproject = tomllib.load(f)
+    project = pyproject.get("project", {})
+    return {
+        "requires-python": project.get("requires-python"),
+        "dependencies": project.get("dependencies", []),
+        "optional-dependencies": project.get("optional-dependencies", {}),
+        "build-system": pyproject.get("build-system", {}).get("requires", []),
+    }
+
+
+def get_deps_hash(deps):
+    return hashlib.sha256(json.dumps(deps, sort_keys=True).encode()).hexdigest()
+
+
+def get_pyproject_hash(package="neuro"):
+    """Hash of the whole pyproject.toml; an editable install only needs redoing when it changes."""
+    with open(os.path.join(package, "pyproject.toml"), "rb") as f:
+        return hashlib.sha256(f.read()).hexdigest()
+
+
+def get_wheel_dir():
+    return paths.get_cache_dir("wheels")
+
+
+def read_nenv_stamp(name=NENV_STAMP):
+    try:
+        with open(os.path.join(NENV_DIR, name)) as f:
+            return f.read().strip()
+    except FileNotFoundError:
+        return None
+
+
+def write_nenv_stamp(value, name=NENV_STAMP):
+    with open(os.path.join(NENV_DIR, name), "w") as f:
+        f.write(value + "\n")
+
+
 @invoke.task(pre=[env])
-def nenv(c):
-    """Create virtualenv and install neuro."""
-    with terminal_style.step("Installing neuro"):
-        subprocess.run(["python3", "-m", "venv", "nenv"], check=True, capture_output=True)
-        subprocess.run(["nenv/bin/pip", "install", "./neuro"], check=True, capture_output=True)
-    nenv_bin = os.path.abspath("nenv/bin")
+def nenv(c, rebuild=False):
+    """Create virtualenv and install neuro (editable, so source changes need no reinstall)."""
+    deps = read_deps()
+    deps_hash = get_deps_hash(deps)
+    pip = os.path.join(NENV_DIR, "bin", "pip")
+    recreate = rebuild or not os.path.exists(pip) or read_nenv_stamp() != deps_hash
+    if recreate:
+        wheel_dir = get_wheel_dir()
+        requirements = deps["dependencies"]
+        with terminal_style.step("Installing neuro dependencies"):
+            subprocess.run(["python3", "-m", "venv", "--clear", NENV_DIR], check=True, capture_output=True)
+            if requirements:
+                subprocess.run(
+                    [pip, "wheel", "--wheel-dir", wheel_dir, "--find-links", wheel_dir, *requirements],
+                    check=True, capture_output=True
+                )
+                subprocess.run(
+                    [pip, "install", "--no-index", "--find-links", wheel_dir, *requirements],
+                    check=True, capture_output=True
+                )
+        write_nenv_stamp(deps_hash)
+    pyproject_hash = get_pyproject_hash()
+    if recreate or read_nenv_stamp(NENV_INSTALL_STAMP) != pyproject_hash:
+        with terminal_style.step("Installing neuro"):
+            subprocess.run([pip, "install", "--no-deps", "-e", "./neuro"], check=True, capture_output=True)
+        write_nenv_stamp(pyproject_hash, NENV_INSTALL_STAMP)
+    nenv_bin = os.path.abspath(os.path.join(NENV_DIR, "bin"))
     if nenv_bin not in os.environ.get("PATH", ""):
         os.environ["PATH"] = nenv_bin + os.pathsep + os.environ.get("PATH", "")
 
@@ -80,39 +269,124 @@ def rsync(c, components):
     if not components:
         components = LOCAL_SUBMODULES
     for component in components:
-        source = str(internal_utils.get_path(component)) + "/"
-        dest = internal_utils.get_path("nf") / component
-        build_utils.rsync_local(source, dest, component)
+        rsync_component(component)
 
     if "neuro" in components:
         nenv(c)
 
 
+def rsync_component(component):
+    source = str(internal_utils.get_path(component)) + "/"
+    dest = internal_utils.get_path("nf") / component
+    build_utils.rsync_local(source, dest, component)
+
+
+def watch_changes(paths, debounce=WATCH_DEBOUNCE):
+    """Yield sets of files changed under paths, batching inotify events that arrive within debounce seconds."""
+    command = [
+        "inotifywait", "-m", "-r", "-q", "-e", WATCH_EVENTS,
+        "--exclude", WATCH_EXCLUDE, "--format", "%w%f", *paths
+    ]
+    events = queue.Queue()
+
+    def read(stream):
+        for line in stream:
+            events.put(line.rstrip("\n"))
+        events.put(None)
+
+    with subprocess.Popen(command, stdout=subprocess.PIPE, text=True) as proc:
+        threading.Thread(target=read, args=(proc.stdout,), daemon=True).start()
+        try:
+            while (path := events.get()) is not None:
+                batch = {path}
+                try:
+                    while (path := events.get(timeout=debounce)) is not None:
+                        batch.add(path)
+                except queue.Empty:
+                    pass
+                yield batch
+                if path is None:
+                    return
+        finally:
+            proc.terminate()
+
+
+def affected_tests(changed, source):
+    """neuro test files to rerun for changed files (paths relative to source): changed tests,
+    plus test_<module>.py for each changed module. An empty list means nothing to run."""
+    tests_dir = os.path.join(source, WATCH_TESTS)
+    targets = set()
+    for path in changed:
+        if not path.endswith(".py"):
+            continue
+        name = os.path.basename(path)
+        if path.startswith(WATCH_TESTS + os.sep):
+            if name.startswith("test_"):
+                targets.add(path)
+            continue
+        for root, _, files in os.walk(tests_dir):
+            if f"test_{name}" in files:
+                targets.add(os.path.relpath(os.path.join(root, f"test_{name}"), source))
+    return sorted(targets)
+
+
+def apply_changes(c, component, changed, run_tests=True):
+    """Sync one component after a batch of changes (paths relative to its source) and do dependent work."""
+    rsync_component(component)
+    if component != "neuro":
+        return
+    # neuro is installed editable, so synced source is live; only new packaging metadata needs nenv.
+    if "pyproject.toml" in changed:
+        nenv(c)
+    targets = affected_tests(changed, str(internal_utils.get_path("neuro")))
+    if run_tests and targets:
+        command = ["nenv/bin/pytest", *[os.path.join("neuro", t) for t in targets], *WATCH_PYTEST_ARGS]
+        subprocess.run(command, check=False)
+
+
 @invoke.task(pre=[env], iterable="components")
-def master(c, components):
-    """Reset all submodules to their configured branches."""
+def watch(c, components, tests=True):
+    """Rsync local submodules into app/ as they change and rerun affected neuro tests."""
+    if not shutil.which("inotifywait"):
+        raise invoke.exceptions.Exit("inotifywait not found (install inotify-tools)")
     if not components:
-        components = SUBMODULES
-    for component in components:
-        reset_submodule(component, "master")
+        components = LOCAL_SUBMODULES
+    sources = {str(internal_utils.get_path(component)): component for component in components}
+    rsync(c, components=components)
+
+    terminal_style.header(f"Watching {', '.join(components)} (Ctrl+C to stop)")
+    try:
+        for batch in watch_changes(list(sources)):
+            started = time.monotonic()
+            for source, component in sources.items():
+                changed = sorted(
+                    os.path.relpath(path, source) for path in batch
+                    if path.startswith(source.rstrip(os.sep) + os.sep)
+                )
+                if changed:
+                    print(f"  {component}: {', '.join(changed)}")
+                    apply_changes(c, component, changed, run_tests=tests)
+            print(f"{terminal_style.SUCCESS} Synced in {time.monotonic() - started:.1f}s")
+    except KeyboardInterrupt:
+        pass
 
 
 @invoke.task(pre=[env], iterable="components")
-def develop(c, components):
+def master(c, components, jobs=4):
+    """Reset all submodules to their configured branches."""
+    run_sync(components or SUBMODULES, "master", jobs=jobs)
+
+
+@invoke.task(pre=[env], iterable="components")
+def develop(c, components, jobs=4):
     """Fetch and reset NF submodules to origin/develop."""
-    if not components:
-        components = SUBMODULES
-    for component in components:
-        reset_submodule(component, "develop", remote="origin")
+    run_sync(components or SUBMODULES, "develop", remote="origin", jobs=jobs)
 
 
 @invoke.task(pre=[env], iterable="components")
-def branch(c, branch_name, components):
+def branch(c, branch_name, components, jobs=4):
     """Reset submodules to a branch, with fallback to configured branch."""
-    if not components:
-        components = SUBMODULES
-    for component in components:
-        reset_submodule(component, branch_name)
+    run_sync(components or SUBMODULES, branch_name, jobs=jobs)
 
 
 @invoke.task(pre=[env])
@@ -167,10 +441,9 @@ def init(c):
         f"NEO4J_URI=bolt://127.0.0.1:{bolt_port}\n"
     )
 
-    with terminal_style.step(f"Generating {env_local_path}"):
-        with open(env_local_path, "w") as f:
-            f.write(env_content)
+    with terminal_style.step(f"Generating {env_local_path}"), open(env_local_path, "w") as f:
+        f.write(env_content)
 
     # Reload config with the new .env.local
-    config.CONFIG_INITIALIZED = False
-    config.main()
+    invalidate_config()
+    load_config()
@@ -2,57 +2,319 @@
 Run NeuroForest tests.
 """
 
+import json
+import logging
 import os
 import shlex
 import subprocess
+import sys
+import time
+import urllib.parse
+from concurrent.futures import ThreadPoolExecutor
 
 import invoke
+import neo4j
+from neuro.utils import terminal_components, terminal_style
 
-from neuro.utils import terminal_style
-
+from tasks import devtools, paths
 from tasks.actions import setup
-from tasks.components import app as app_tasks, neuro, tw5
-
+from tasks.components import app as app_tasks
+from tasks.components import desktop, neuro, neurobase, tw5
 
 COMPONENTS = ["app", "neuro", "tw5"]
 
+# Invoke arguments for each suite in parallel mode. Shared preparation
+# (rsync of neuro, tw5 bundle) is done once beforehand, hence --bundled.
+PARALLEL_TASKS = {
+    "app": ["app.test"],
+    "neuro": ["neuro.test", "--mode", "e2e", "--bundled"],
+    "tw5": ["tw5.test", "--bundled"],
+}
+LOG_TAIL = 20
 
-@invoke.task(pre=[invoke.call(setup.env, environment="TESTING")], iterable="components")
-def local(c, components):
-    if not components:
-        components = COMPONENTS
+BENCH_VERSION = 1
+BENCH_SIZES = [1000, 10000, 100000]
+BENCH_REPEAT = 20
+BENCH_THRESHOLD = 0.2
+# Filters run through the TW5 HTTP API: most popular tag, full-text search, field match.
+BENCH_FILTERS = {
+    "tag": "[tag[{tag}]]",
+    "search": "[!is[system]search[neuron forest]]",
+    "field": "[field:neuro.id[{uuid}]]",
+}
+BENCH_RENDERED = "!!document.querySelector('.tc-story-river')"
+SAVED_QUERY = "MATCH (t {title: $title}) RETURN t.text AS text"
 
-    failed = []
 
-    if "app" in components:
-        terminal_style.header("Testing APP")
-        try:
-            app_tasks.test(c)
-        except SystemExit:
-            failed.append("app")
+def get_log_path(component):
+    return paths.get_state_dir("logs", f"test-{component}.log")
+
+
+def run_suite(component):
+    """Run one component suite as an invoke subprocess, logging its output."""
+    log_path = get_log_path(component)
+    os.makedirs(os.path.dirname(log_path), exist_ok=True)
+    started = time.monotonic()
+    with open(log_path, "w") as log:
+        result = subprocess.run(
+            [sys.executable, "-m", "invoke", *PARALLEL_TASKS[component]],
+            stdout=log, stderr=subprocess.STDOUT,
+            check=False,
+        )
+    return {
+        "component": component,
+        "ok": result.returncode == 0,
+        "seconds": time.monotonic() - started,
+        "log": log_path,
+    }
 
+
+def run_parallel(c, components):
     if "neuro" in components:
-        terminal_style.header("Testing NEURO")
+        setup.rsync(c, components=["neuro"])
+    if "neuro" in components or "tw5" in components:
+        tw5.bundle(c)
+    terminal_style.header(f"Testing {', '.join(name.upper() for name in components)} in parallel")
+    with ThreadPoolExecutor(max_workers=len(components)) as pool:
+        return list(pool.map(run_suite, components))
+
+
+def run_sequential(c, components):
+    suites = {"app": app_tasks.test, "neuro": neuro.test_local, "tw5": tw5.test}
+    rows = []
+    for component in components:
+        terminal_style.header(f"Testing {component.upper()}")
+        started = time.monotonic()
         try:
-            neuro.test_local(c)
+            suites[component](c)
+            ok = True
         except SystemExit:
-            failed.append("neuro")
+            ok = False
+        rows.append({"component": component, "ok": ok, "seconds": time.monotonic() - started, "log": None})
+    return rows
+
+
+def print_log_tail(path, lines=LOG_TAIL):
+    with open(path, errors="replace") as f:
+        tail = f.readlines()[-lines:]
+    for line in tail:
+        print(f"    {line.rstrip()}")
+
+
+# ---------------------------------------------------------------------------
+# Production benchmarks
+# ---------------------------------------------------------------------------
+
+def get_bench_dir():
+    return paths.get_state_dir("bench")
+
+
+def confirm_clear(driver, confirmed=False):
+    """Refuse to empty a NeuroBase outside TESTING, and ask before deleting tiddlers already in it."""
+    environment = os.getenv("ENVIRONMENT")
+    if environment != "TESTING":
+        print(f"{terminal_style.FAIL} Benchmarks empty NeuroBase, refusing in environment {environment}")
+        raise SystemExit(1)
+    existing = neurobase.count_tiddlers(driver)
+    if existing and not confirmed:
+        base_name = os.getenv("BASE_NAME")
+        if not terminal_components.bool_prompt(f"Benchmark '{base_name}'? ({existing} tiddlers will be deleted)"):
+            raise SystemExit("Aborting benchmarks.")
+
+
+def ensure_desktop_closed(port):
+    """Exit if a desktop is already running: the benchmark would measure or close it instead of its own."""
+    pid = desktop.running_pid()
+    if pid:
+        print(f"{terminal_style.FAIL} NeuroDesktop already running (PID {pid}), close it first")
+        raise SystemExit(1)
+    if desktop.server_ready(port):
+        print(f"{terminal_style.FAIL} A wiki already answers on port {port}, close it first")
+        raise SystemExit(1)
+
+
+def seed_bench(driver, graph):
+    """Empty the database and write the synthetic graph; returns seconds."""
+    started = time.monotonic()
+    neurobase.clear_graph(driver)
+    neurobase.write_graph(driver, graph)
+    return time.monotonic() - started
+
+
+def timed(func, *args):
+    started = time.monotonic()
+    func(*args)
+    return time.monotonic() - started
+
+
+def put_tiddler(port, fields):
+    desktop.tw_request(port, f"/recipes/default/tiddlers/{urllib.parse.quote(fields['title'], safe='')}", "PUT", fields)
+
+
+def run_filter(port, tw_filter):
+    path = f"/recipes/default/tiddlers.json?filter={urllib.parse.quote(tw_filter)}"
+    return json.loads(desktop.tw_request(port, path))
+
+
+def wait_for_saved(driver, title, text, timeout=10):
+    """Seconds until the syncadaptor has written text to NeuroBase, or None after timeout."""
+    started = time.monotonic()
+    while time.monotonic() - started < timeout:
+        records, _, _ = driver.execute_query(SAVED_QUERY, title=title)
+        if records and records[0]["text"] == text:
+            return time.monotonic() - started
+        time.sleep(0.01)
+    return None
 
-    if "tw5" in components:
-        terminal_style.header("Testing TW5")
+
+def wait_for_render(port, started, timeout=desktop.READY_TIMEOUT):
+    """Seconds from started until the wiki's story river is in the page (needs the DevTools port)."""
+    deadline = started + timeout
+    while time.monotonic() < deadline:
         try:
-            tw5.test(c)
-        except SystemExit:
-            failed.append("tw5")
+            if devtools.evaluate(port, BENCH_RENDERED, timeout=5):
+                return time.monotonic() - started
+        except (devtools.DevToolsError, OSError):
+            pass
+        time.sleep(desktop.READY_INTERVAL)
+    return None
+
+
+def add_percentiles(metrics, name, values):
+    values = [value for value in values if value is not None]
+    if values:
+        metrics[f"{name}_p50"] = neurobase.percentile(values, 50)
+        metrics[f"{name}_p95"] = neurobase.percentile(values, 95)
+
+
+def measure_desktop(c, driver, graph, repeat=BENCH_REPEAT):
+    """Cold start, first render, save, filter and neuro:// resolution timings against a running desktop."""
+    port = os.getenv("PORT")
+    devtools_port = os.getenv("DESKTOP_DEVTOOLS_PORT")
+    metrics = {}
+    ensure_desktop_closed(port)
+
+    started = time.monotonic()
+    process = desktop.spawn(desktop.get_app_dir())
+    try:
+        if desktop.wait_until_ready(process, port) != "ready":
+            raise SystemExit(f"NeuroDesktop not ready with {graph.count} tiddlers")
+        metrics["cold_start"] = time.monotonic() - started
+        if devtools_port:
+            metrics["first_render"] = wait_for_render(devtools_port, started)
+
+        save, saved = [], []
+        for i in range(repeat):
+            fields = dict(graph.tiddler(graph.count + i), text=f"saved {i} {time.time()}")
+            save.append(timed(put_tiddler, port, fields))
+            saved.append(wait_for_saved(driver, fields["title"], fields["text"]))
+        add_percentiles(metrics, "save", save)
+        add_percentiles(metrics, "saved", saved)
+
+        # Spread lookups over the graph, from hub tiddlers to the long tail.
+        uuids = [graph.tiddler(i * graph.count // repeat)["neuro.id"] for i in range(repeat)]
+        for name, tw_filter in BENCH_FILTERS.items():
+            timings = [timed(run_filter, port, tw_filter.format(tag=graph.tag(0), uuid=u)) for u in uuids]
+            add_percentiles(metrics, f"filter_{name}", timings)
+
+        cache = desktop.TitleCache()
+        add_percentiles(metrics, "resolve_cold", [timed(desktop.resolve_title, u, cache) for u in uuids])
+        add_percentiles(metrics, "resolve_warm", [timed(desktop.resolve_title, u, cache) for u in uuids])
+    finally:
+        desktop.close(c)
+    return metrics
+
+
+def run_benchmarks(c, sizes, repeat=BENCH_REPEAT, confirmed=False):
+    logging.getLogger("neo4j").setLevel(logging.ERROR)
+    auth = (os.getenv("NEO4J_USER"), os.getenv("NEO4J_PASSWORD"))
+    results = {}
+    with neo4j.GraphDatabase.driver(os.getenv("NEO4J_URI"), auth=auth) as driver:
+        confirm_clear(driver, confirmed)
+        ensure_desktop_closed(os.getenv("PORT"))
+        for count in sizes:
+            terminal_style.header(f"Benchmark: {count} tiddlers")
+            graph = neurobase.SyntheticGraph(count)
+            with terminal_style.step(f"Seed {count} tiddlers"):
+                seed = seed_bench(driver, graph)
+            metrics = measure_desktop(c, driver, graph, repeat=repeat)
+            results[str(count)] = {"seed": seed, **metrics}
+    return results
+
+
+def compare_results(current, baseline, threshold=BENCH_THRESHOLD):
+    """Rows for metrics present in both runs; all metrics are durations, so higher is worse."""
+    rows = []
+    for size, metrics in current.items():
+        for name, value in metrics.items():
+            before = baseline.get(size, {}).get(name)
+            if value is None or not before:
+                continue
+            change = value / before - 1
+            rows.append({
+                "metric": f"{size}/{name}",
+                "baseline": before,
+                "current": value,
+                "change": change,
+                "regressed": change > threshold,
+            })
+    return rows
+
+
+def print_bench_table(results, rows):
+    compared = {row["metric"]: row for row in rows}
+    print(f"  {'Metric':<28} {'Baseline':>10} {'Current':>10} {'Change':>8}")
+    for size, metrics in results.items():
+        for name, value in metrics.items():
+            row = compared.get(f"{size}/{name}")
+            current = f"{value * 1000:.1f}ms" if value is not None else "-"
+            if row:
+                mark = terminal_style.FAIL if row["regressed"] else terminal_style.SUCCESS
+                print(f"{mark} {size + '/' + name:<28} {row['baseline'] * 1000:>8.1f}ms {current:>10} {row['change']:>+8.0%}")
+            else:
+                print(f"  {size + '/' + name:<28} {'-':>10} {current:>10}")
+
+
+def read_results(path):
+    with open(path) as f:
+        return json.load(f)["results"]
+
+
+def write_results(path, results, sizes):
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    with open(path, "w") as f:
+        json.dump({
+            "version": BENCH_VERSION,
+            "time": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "sizes": sizes,
+            "results": results,
+        }, f, indent=2)
+
+
+# ---------------------------------------------------------------------------
+# Tasks
+# ---------------------------------------------------------------------------
+
+@invoke.task(pre=[invoke.call(setup.env, environment="TESTING")], iterable="components")
+def local(c, components, parallel=False):
+    """Run app, neuro and tw5 tests, optionally as concurrent subprocesses."""
+    if not components:
+        components = COMPONENTS
+    components = [component for component in COMPONENTS if component in components]
+
+    rows = run_parallel(c, components) if parallel else run_sequential(c, components)
 
     terminal_style.header("Results")
-    for component in components:
-        if component in failed:
-            print(f"  {terminal_style.FAIL} {component}")
-        else:
-            print(f"  {terminal_style.SUCCESS} {component}")
+    for row in rows:
+        mark = terminal_style.SUCCESS if row["ok"] else terminal_style.FAIL
+        log = f"  {row['log']}" if row["log"] else ""
+        print(f"  {mark} {row['component']:<6} {row['seconds']:>6.1f}s{log}")
+    for row in rows:
+        if row["log"] and not row["ok"]:
+            terminal_style.header(f"{row['component']} (last {LOG_TAIL} lines)")
+            print_log_tail(row["log"])
 
-    if failed:
+    if any(not row["ok"] for row in rows):
         raise SystemExit(1)
 
 
@@ -64,13 +326,38 @@ def ruff(c, ruff_args=""):
         ruff_args = []
     else:
         ruff_args = shlex.split(ruff_args)
-    result = subprocess.run(["nenv/bin/ruff", "check", "tasks/", "tests/"] + ruff_args)
+    result = subprocess.run(["nenv/bin/ruff", "check", "tasks/", "tests/"] + ruff_args, check=False)
     if result.returncode != 0:
         raise SystemExit(result.returncode)
 
 
-@invoke.task(pre=[setup.env])
-def production(c):
-    """Build desktop and run production tests (stub)."""
-    os.environ["ENVIRONMENT"] = "TESTING"
-    print("Production tests not yet implemented.")
+@invoke.task(pre=[invoke.call(setup.env, environment="TESTING")], iterable=["sizes"])
+def production(c, sizes, repeat=BENCH_REPEAT, baseline=None, threshold=BENCH_THRESHOLD, output=None,
+               save_baseline=False, confirmed=False):
+    """Benchmark desktop and neurobase on seeded graphs; fail on regressions against a baseline."""
+    sizes = [int(size) for size in sizes] or BENCH_SIZES
+    bench_dir = get_bench_dir()
+    baseline = baseline or os.path.join(bench_dir, "baseline.json")
+    output = output or os.path.join(bench_dir, time.strftime("bench-%Y%m%d-%H%M%S.json"))
+
+    neurobase.start(c)
+    results = run_benchmarks(c, sizes, repeat=int(repeat), confirmed=confirmed)
+    write_results(output, results, sizes)
+
+    rows = []
+    if os.path.isfile(baseline):
+        rows = compare_results(results, read_results(baseline), float(threshold))
+    terminal_style.header("Results")
+    print_bench_table(results, rows)
+    print(f"Results written to {output}")
+
+    if save_baseline:
+        write_results(baseline, results, sizes)
+        print(f"{terminal_style.SUCCESS} Saved as baseline: {baseline}")
+    elif not rows:
+        print(f"No baseline at {baseline}, run with --save-baseline to create one")
+
+    regressed = [row["metric"] for row in rows if row["regressed"]]
+    if regressed and not save_baseline:
+        print(f"{terminal_style.FAIL} Regressed beyond {float(threshold):.0%}: {', '.join(regressed)}")
+        raise SystemExit(1)
@@ -1,19 +1,312 @@
 """
-Top-level NeuroForest app tasks: build, run, stop, test.
+Top-level NeuroForest app tasks: build, run, stop, supervise, test.
 """
 
+import abc
+import collections
+import http.server
+import json
+import logging
 import os
 import shlex
 import shutil
+import signal
 import subprocess
+import threading
+import time
 
 import invoke
+import neo4j
+from neuro.utils import (
+    docker_tools,
+    internal_utils,
+    terminal_components,
+    terminal_style,
+)
 
-from neuro.utils import internal_utils, terminal_components, terminal_style
-
+from tasks import paths
 from tasks.actions import setup
 from tasks.components import desktop, neurobase, tw5
+from tasks.pytest_plugins import nf_bench, nf_impact
+
+SUPERVISE_PORT = 8071
+SUPERVISE_INTERVAL = 2
+BACKOFF_MIN = 1
+BACKOFF_MAX = 60
+# A service that stays up this long is considered healthy again and its backoff starts over.
+BACKOFF_RESET = 60
+HISTORY_SIZE = 1800
+# Non-Python inputs of the app tests (the integration tests build from the repo's Dockerfile).
+IMPACT_GLOBALS = ("Dockerfile", "docker-compose.yml", ".env")
+
+
+# ---------------------------------------------------------------------------
+# Supervisor
+# ---------------------------------------------------------------------------
+
+class Service(abc.ABC):
+    """A supervised child process. Subclasses start, check, stop and probe it."""
+
+    name = None
+
+    def __init__(self):
+        self.started_at = None
+        self.restarts = 0
+        self.crashes = 0
+        self.backoff = BACKOFF_MIN
+        self.next_start = 0.0
+        self.last_exit = None
+        self.finished = False
+        self.cpu_sample = None
+
+    @abc.abstractmethod
+    def start(self):
+        pass
+
+    @abc.abstractmethod
+    def stop(self):
+        pass
+
+    @abc.abstractmethod
+    def running(self):
+        pass
+
+    @abc.abstractmethod
+    def pid(self):
+        pass
+
+    def exit_code(self):
+        """Exit status of the last run, negative for a signal, or None if unknown."""
+
+    @abc.abstractmethod
+    def probe(self):
+        """Round trip of one request in seconds, or None if the service does not answer."""
+
+
+class DesktopService(Service):
+    name = "desktop"
+
+    def __init__(self, app_dir, port):
+        super().__init__()
+        self.app_dir = app_dir
+        self.port = port
+        self.process = None
+
+    def start(self):
+        self.process = desktop.spawn(self.app_dir)
+
+    def stop(self):
+        if not self.running():
+            return
+        desktop.flush_desktop(os.getenv("DESKTOP_DEVTOOLS_PORT"))
+        self.process.terminate()
+        try:
+            self.process.wait(timeout=desktop.CLOSE_TIMEOUT)
+        except subprocess.TimeoutExpired:
+            self.process.kill()
+            self.process.wait()
+        desktop.remove_pid()
+
+    def running(self):
+        return self.process is not None and self.process.poll() is None
+
+    def pid(self):
+        return self.process.pid if self.process else None
+
+    def exit_code(self):
+        return self.process.poll() if self.process else None
+
+    def probe(self):
+        started = time.monotonic()
+        if desktop.server_ready(self.port):
+            return time.monotonic() - started
+        return None
+
+
+class NeuroBaseService(Service):
+    name = "neurobase"
+
+    def __init__(self, base_name):
+        super().__init__()
+        self.base_name = base_name
+        self.driver = None
+
+    def inspect(self, template):
+        result = subprocess.run(
+            ["docker", "inspect", "--format", template, self.base_name],
+            capture_output=True, text=True,
+            check=False,
+        )
+        try:
+            return int(result.stdout.strip())
+        except ValueError:
+            return None
+
+    def start(self):
+        subprocess.run(["docker", "start", self.base_name], capture_output=True, check=False)
+
+    def stop(self):
+        if self.driver:
+            self.driver.close()
+            self.driver = None
+        if docker_tools.container_running(self.base_name):
+            subprocess.run(["docker", "stop", self.base_name], capture_output=True, check=False)
+
+    def running(self):
+        return docker_tools.container_running(self.base_name)
+
+    def pid(self):
+        return self.inspect("{{.State.Pid}}") or None
+
+    def exit_code(self):
+        return self.inspect("{{.State.ExitCode}}")
 
+    def probe(self):
+        if self.driver is None:
+            logging.getLogger("neo4j").setLevel(logging.ERROR)
+            auth = (os.getenv("NEO4J_USER"), os.getenv("NEO4J_PASSWORD"))
+            self.driver = neo4j.GraphDatabase.driver(os.getenv("NEO4J_URI"), auth=auth)
+        started = time.monotonic()
+        try:
+            self.driver.execute_query("RETURN 1")
+        except (neo4j.exceptions.Neo4jError, neo4j.exceptions.DriverError):
+            self.driver.close()
+            self.driver = None
+            return None
+        return time.monotonic() - started
+
+
+class Supervisor:
+    """Keeps services running, restarting crashed ones with exponential backoff, and samples their usage.
+
+    A service that exits with status 0 (e.g. the desktop window was closed) stays stopped.
+    """
+
+    def __init__(self, services, history=HISTORY_SIZE):
+        self.services = services
+        self.started = time.monotonic()
+        self.samples = collections.deque(maxlen=history)
+        self.latest = []
+        self.lock = threading.Lock()
+
+    def check(self, now=None):
+        """Restart what is due and record one sample of every service."""
+        now = time.monotonic() if now is None else now
+        table = desktop.read_proc_table()
+        rows = []
+        for service in self.services:
+            if service.running():
+                service.finished = False
+                if service.started_at is None:
+                    service.started_at = now
+                elif now - service.started_at >= BACKOFF_RESET:
+                    service.backoff = BACKOFF_MIN
+            elif not service.finished:
+                if service.started_at is not None:
+                    service.started_at = None
+                    service.last_exit = service.exit_code()
+                    # Only a failure or a signal is a crash; None (status unknown) counts as one.
+                    service.finished = service.last_exit == 0
+                    if service.finished:
+                        print(f"{terminal_style.SUCCESS} {service.name} exited cleanly, not restarting")
+                    else:
+                        service.crashes += 1
+                        service.next_start = now + service.backoff
+                        print(
+                            f"{terminal_style.FAIL} {service.name} stopped (exit {service.last_exit}), "
+                            f"restarting in {service.backoff}s"
+                        )
+                        service.backoff = min(service.backoff * 2, BACKOFF_MAX)
+                if not service.finished and now >= service.next_start:
+                    service.restarts += bool(service.crashes)
+                    service.start()
+                    service.started_at = now
+            rows.append(self.sample(service, now, table))
+
+        with self.lock:
+            self.latest = rows
+            self.samples.append({"time": time.time(), "services": rows})
+        return rows
+
+    def sample(self, service, now, table):
+        pid = service.pid() if service.started_at is not None else None
+        usage = desktop.tree_usage(pid, table) if pid else None
+        rss = cpu = latency = None
+        if usage:
+            rss, cpu_seconds, _ = usage
+            previous = service.cpu_sample
+            if previous and previous[0] == pid and now > previous[2]:
+                cpu = round(100 * (cpu_seconds - previous[1]) / (now - previous[2]), 1)
+            service.cpu_sample = (pid, cpu_seconds, now)
+            latency = service.probe()
+        if service.started_at is not None:
+            state = "running" if latency is not None else "starting"
+        elif service.finished:
+            state = "stopped"
+        else:
+            state = "restarting"
+        return {
+            "name": service.name,
+            "state": state,
+            "pid": pid,
+            "uptime": round(now - service.started_at, 1) if service.started_at is not None else None,
+            "restarts": service.restarts,
+            "last_exit": service.last_exit,
+            "rss": rss,
+            "cpu": cpu,
+            "latency_ms": round(latency * 1000, 1) if latency is not None else None,
+        }
+
+    def status(self):
+        with self.lock:
+            return {"uptime": round(time.monotonic() - self.started, 1), "services": self.latest}
+
+    def history(self):
+        with self.lock:
+            return list(self.samples)
+
+    def run(self, interval=SUPERVISE_INTERVAL):
+        while True:
+            self.check()
+            time.sleep(interval)
+
+    def stop(self):
+        """Stop services in reverse order, so the desktop flushes before NeuroBase goes down."""
+        for service in reversed(self.services):
+            service.stop()
+
+
+class StatusHandler(http.server.BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path == "/status":
+            body = self.server.supervisor.status()
+        elif self.path == "/history":
+            body = self.server.supervisor.history()
+        else:
+            self.send_error(404)
+            return
+        data = json.dumps(body).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, *args):
+        pass
+
+
+def serve_status(supervisor, port):
+    """Serve /status and /history on 127.0.0.1:port from a background thread."""
+    server = http.server.ThreadingHTTPServer(("127.0.0.1", port), StatusHandler)
+    server.supervisor = supervisor
+    threading.Thread(target=server.serve_forever, name="supervise-status", daemon=True).start()
+    return server
+
+
+# ---------------------------------------------------------------------------
+# Tasks
+# ---------------------------------------------------------------------------
 
 @invoke.task(pre=[setup.env])
 def build(c, build_dir=None):
@@ -34,19 +327,75 @@ def build(c, build_dir=None):
 @invoke.task(pre=[setup.env, setup.init, neurobase.start, desktop.run])
 def run(c):
     """Initialize (if needed), start neurobase and launch desktop."""
-    pass
 
 
-@invoke.task(pre=[setup.env, neurobase.stop, desktop.close])
+# Close the desktop first so it can flush to NeuroBase before it stops.
+@invoke.task(pre=[setup.env, desktop.close, neurobase.stop])
 def stop(c):
     """Close desktop and stop neurobase."""
-    pass
+
+
+@invoke.task(pre=[setup.env, setup.init])
+def supervise(c, port=None, interval=SUPERVISE_INTERVAL):
+    """Own neurobase and desktop, restart them on crash and serve their status on SUPERVISE_PORT."""
+    port = int(port or os.getenv("SUPERVISE_PORT") or SUPERVISE_PORT)
+    app_dir = desktop.get_app_dir()
+    if not os.path.isfile(os.path.join(app_dir, "nw")):
+        print(f"NW.js binary not found in {app_dir}. Run build.desktop first.")
+        raise SystemExit(1)
+    pid = desktop.running_pid()
+    if pid:
+        print(f"{terminal_style.FAIL} NeuroDesktop already running (PID {pid}), close it first")
+        raise SystemExit(1)
+
+    neurobase.start(c)
+    supervisor = Supervisor([
+        NeuroBaseService(os.getenv("BASE_NAME")),
+        DesktopService(app_dir, os.getenv("PORT")),
+    ])
+    server = serve_status(supervisor, port)
+    print(f"{terminal_style.SUCCESS} Supervising neurobase and desktop, status on http://127.0.0.1:{port}/status")
+
+    def terminate(signum, frame):
+        raise SystemExit(0)
+
+    previous = signal.signal(signal.SIGTERM, terminate)
+    try:
+        supervisor.run(float(interval))
+    except KeyboardInterrupt:
+        pass
+    finally:
+        signal.signal(signal.SIGTERM, previous)
+        server.shutdown()
+        server.server_close()
+        supervisor.stop()
+        print(f"{terminal_style.SUCCESS} Stopped desktop and neurobase")
 
 
 @invoke.task(pre=[invoke.call(setup.env, environment="TESTING")])
-def test(c, pytest_args=""):
+def test(c, pytest_args="", impact=False):
     """Run app tests (pytest tests/)."""
     extra = shlex.split(pytest_args) if pytest_args else []
-    result = subprocess.run(["nenv/bin/pytest", "tests/"] + extra)
+    command = ["nenv/bin/pytest", "tests/"] + extra
+    if impact:
+        # Exit code 5 (no tests collected) means every test was deselected as unaffected.
+        global_paths = [internal_utils.get_path("nf") / path for path in IMPACT_GLOBALS]
+        args = nf_impact.impact_args(paths.get_state_dir("impact", "app.json"), global_paths)
+        result = subprocess.run(command + args, env=nf_impact.impact_env(), check=False)
+        success = (0, nf_impact.NO_TESTS_COLLECTED)
+    else:
+        result = subprocess.run(command, check=False)
+        success = (0,)
+    if result.returncode not in success:
+        raise SystemExit(result.returncode)
+
+
+@invoke.task(pre=[invoke.call(setup.env, environment="TESTING")])
+def bench(c, tolerance=None, save=False, pytest_args=""):
+    """Run micro-benchmarks (tests/bench) against their history; --save accepts regressions."""
+    tolerance = float(tolerance) if tolerance is not None else nf_bench.TOLERANCE
+    extra = shlex.split(pytest_args) if pytest_args else []
+    command = ["nenv/bin/pytest", "tests/bench", "-q"] + extra + nf_bench.bench_args(paths.get_state_dir("bench", "micro.json"), tolerance, save)
+    result = subprocess.run(command, env=nf_impact.impact_env(), check=False)
     if result.returncode != 0:
         raise SystemExit(result.returncode)
@@ -4,24 +4,182 @@ Build, run and close NeuroForest desktop application.
 
 import json
 import os
+import re
 import signal
+import socketserver
 import subprocess
 import sys
+import threading
 import time
+import urllib.error
+import urllib.parse
+import urllib.request
+from collections import OrderedDict, defaultdict
 
 import invoke
+from neuro.tools.tw5api import tw_actions, tw_get
+from neuro.utils import build_utils, internal_utils, network_utils, terminal_style
 
-from neuro.tools.tw5api import tw_get, tw_actions
-from neuro.utils import internal_utils, terminal_style, build_utils, network_utils
-
+from tasks import devtools, paths, protocol
 from tasks.actions import setup
 from tasks.components import nwjs
 
+ID_PAIRS = ":map[get[neuro.id]addsuffix[ ]addsuffix<currentTiddler>]"
+ID_MAP_FILTER = f"[has[neuro.id]] {ID_PAIRS}"
+ID_CACHE_SIZE = 4096
+# Seconds the daemon trusts its neuro.id map before reloading it (protocol.invalidate drops entries sooner).
+ID_MAP_TTL = 30
+# UUIDs per resolve_titles filter query, so the GET URL stays far below server limits (~3.5 KB).
+RESOLVE_CHUNK = 50
+STORY_LIST = "$:/StoryList"
+TITLE_LIST_ITEM = re.compile(r"\[\[(.*?)\]\]|(\S+)")
+READY_TIMEOUT = 30
+READY_INTERVAL = 0.05
+CLOSE_TIMEOUT = 10
+CLOSE_INTERVAL = 0.1
+# TW5's syncer: processTaskQueue() starts saving dirty tiddlers now instead of at its next poll.
+SYNCER_FLUSH = "$tw.syncer ? ($tw.syncer.processTaskQueue(), $tw.syncer.isDirty()) : null"
+SYNCER_DIRTY = "$tw.syncer ? $tw.syncer.isDirty() : null"
+FLUSH_REQUEST_TIMEOUT = 5
+PROFILE_INTERVAL = 1
+PROFILE_TOP = 15
+MIB = 1024 ** 2
+
 
 # ---------------------------------------------------------------------------
 # Helpers
 # ---------------------------------------------------------------------------
 
+class TitleCache:
+    """LRU map of neuro.id to tiddler title, optionally persisted as JSON."""
+
+    def __init__(self, path=None, maxsize=ID_CACHE_SIZE):
+        self.path = path
+        self.maxsize = maxsize
+        self.entries = OrderedDict()
+        if path:
+            self.load()
+
+    def load(self):
+        try:
+            with open(self.path) as f:
+                self.entries = OrderedDict(json.load(f))
+        except (OSError, ValueError):
+            self.entries = OrderedDict()
+
+    def save(self):
+        if not self.path:
+            return
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(list(self.entries.items()), f)
+        os.replace(tmp_path, self.path)
+
+    def get(self, uuid):
+        title = self.entries.get(uuid)
+        if title is not None:
+            self.entries.move_to_end(uuid)
+        return title
+
+    def put(self, uuid, title):
+        self.entries[uuid] = title
+        self.entries.move_to_end(uuid)
+        while len(self.entries) > self.maxsize:
+            self.entries.popitem(last=False)
+
+    def invalidate(self, uuid=None):
+        if uuid is None:
+            self.entries.clear()
+        else:
+            self.entries.pop(uuid, None)
+
+
+def get_id_cache_path():
+    return paths.get_cache_dir("neuro-ids.json")
+
+
+def find_title(uuid):
+    """Exact neuro.id lookup (unlike search:, never matches substrings)."""
+    titles = tw_get.filter_output(f"[field:neuro.id[{uuid}]]")
+    return titles[0] if titles else None
+
+
+def resolve_title(uuid, cache):
+    """
+    Title for a neuro.id, served from cache when still valid.
+
+    A cached title is confirmed with a direct title lookup, so renamed or
+    deleted tiddlers fall through to the exact field lookup.
+    """
+    title = cache.get(uuid)
+    if title is not None:
+        if tw_get.filter_output(f"[[{title}]get[neuro.id]]") == [uuid]:
+            return title
+        cache.invalidate(uuid)
+    title = find_title(uuid)
+    if title is not None:
+        cache.put(uuid, title)
+    return title
+
+
+def parse_id_pairs(pairs):
+    return dict(pair.split(" ", 1) for pair in pairs if " " in pair)
+
+
+def resolve_titles(uuids, chunk=RESOLVE_CHUNK):
+    """neuro.id -> title for many UUIDs, one filter query per chunk of UUIDs."""
+    titles = {}
+    for first in range(0, len(uuids), chunk):
+        runs = " ".join(f"[field:neuro.id[{uuid}]]" for uuid in uuids[first:first + chunk])
+        titles.update(parse_id_pairs(tw_get.filter_output(f"{runs} {ID_PAIRS}")))
+    return titles
+
+
+def tw_request(port, path, method="GET", body=None):
+    request = urllib.request.Request(
+        f"http://127.0.0.1:{port}{path}",
+        data=json.dumps(body).encode() if body is not None else None,
+        method=method,
+        headers={"X-Requested-With": "TiddlyWiki", "Content-Type": "application/json"},
+    )
+    with urllib.request.urlopen(request, timeout=30) as response:
+        return response.read()
+
+
+def parse_title_list(text):
+    """Titles of a TiddlyWiki list field: [[bracketed]] or space separated."""
+    return [match.group(1) if match.group(1) is not None else match.group(2)
+            for match in TITLE_LIST_ITEM.finditer(text or "")]
+
+
+def stringify_title_list(titles):
+    return " ".join(f"[[{title}]]" if not title or re.search(r"\s", title) else title for title in titles)
+
+
+def open_story(port, titles):
+    """Put titles at the top of the story river, in order, with a single $:/StoryList write."""
+    path = f"/recipes/default/tiddlers/{urllib.parse.quote(STORY_LIST, safe='')}"
+    try:
+        story = json.loads(tw_request(port, path))
+    except urllib.error.HTTPError as e:
+        if e.code != 404:
+            raise
+        story = {}
+    # The server returns non-standard fields such as list under "fields".
+    current = parse_title_list(story.get("fields", {}).get("list", ""))
+    titles = list(dict.fromkeys(titles))
+    story_list = titles + [title for title in current if title not in titles]
+    tw_request(port, path, "PUT", {"title": STORY_LIST, "text": "", "list": stringify_title_list(story_list)})
+    return story_list
+
+
+def read_uuids(path):
+    """UUIDs from a file with one UUID or neuro:// link per line; blank lines and # comments are skipped."""
+    with open(path) as f:
+        lines = [line.strip() for line in f]
+    return [line.removeprefix("neuro://") for line in lines if line and not line.startswith("#")]
+
+
 def register_protocol(url):
     uuid = url.removeprefix("neuro://")
     nd_port = os.getenv("PORT")
@@ -30,18 +188,110 @@ def register_protocol(url):
         print("NeuroDesktop not running")
         return
 
-    try:
-        tid_title = tw_get.filter_output(f"[search:neuro.id[{uuid}]]")[0]
-        tw_actions.open_tiddler(tid_title)
-    except IndexError:
+    cache = TitleCache(get_id_cache_path())
+    tid_title = resolve_title(uuid, cache)
+    cache.save()
+    if tid_title is None:
         print(f"Not found: {uuid}")
+        return
+    tw_actions.open_tiddler(tid_title)
+
+
+class ProtocolResolver:
+    """
+    Resolves and opens neuro.id deep links against a warm in-memory title map.
+
+    The map is trusted for ID_MAP_TTL seconds, so a click on a known UUID costs
+    only the open_tiddler request. While the last request reached the wiki the
+    port is not probed; a failed request marks the desktop as not running.
+    """
+
+    def __init__(self, cache_path=None, ttl=ID_MAP_TTL):
+        self.cache = TitleCache(cache_path, maxsize=sys.maxsize)
+        self.ttl = ttl
+        self.loaded_at = None
+        self.connected = False
+
+    def refresh(self):
+        """Replace the whole map with a single filter query."""
+        pairs = parse_id_pairs(tw_get.filter_output(ID_MAP_FILTER))
+        self.cache.invalidate()
+        for uuid, title in pairs.items():
+            self.cache.put(uuid, title)
+        self.loaded_at = time.monotonic()
+
+    def resolve(self, uuid):
+        if self.loaded_at is None or time.monotonic() - self.loaded_at > self.ttl:
+            self.refresh()
+        title = self.cache.get(uuid)
+        if title is None:
+            title = find_title(uuid)
+            if title is not None:
+                self.cache.put(uuid, title)
+        return title
+
+    def open(self, uuid):
+        if not self.connected and not network_utils.is_port_in_use(os.getenv("PORT")):
+            return {"status": "not running"}
+        try:
+            title = self.resolve(uuid)
+            if title is not None:
+                tw_actions.open_tiddler(title)
+        except OSError:
+            # requests and urllib errors are OSErrors: the desktop went away since the last click.
+            self.connected = False
+            self.loaded_at = None
+            return {"status": "not running"}
+        self.connected = True
+        if title is None:
+            return {"status": "not found"}
+        return {"status": "opened", "title": title}
+
+
+class ProtocolHandler(socketserver.StreamRequestHandler):
+    def handle(self):
+        message = self.rfile.readline().decode().strip()
+        command, _, argument = message.partition(" ")
+        if command == "ping":
+            response = {"status": "ok"}
+        elif command == "invalidate":
+            self.server.resolver.cache.invalidate(argument or None)
+            response = {"status": "ok"}
+        elif command == "shutdown":
+            # shutdown() waits for serve_forever, which is running this handler.
+            threading.Thread(target=self.server.shutdown).start()
+            response = {"status": "ok"}
+        else:
+            response = self.server.resolver.open(message)
+        self.wfile.write((json.dumps(response) + "\n").encode())
+
+
+def serve_protocol(socket_path):
+    if os.path.exists(socket_path):
+        os.remove(socket_path)
+    with socketserver.UnixStreamServer(socket_path, ProtocolHandler) as server:
+        os.chmod(socket_path, 0o600)
+        server.resolver = ProtocolResolver()
+        try:
+            server.serve_forever()
+        finally:
+            os.remove(socket_path)
+
+
+def start_protocol_daemon():
+    """Spawn desktop.protocol-daemon in the background unless one is already answering."""
+    if protocol.ping():
+        return
+    subprocess.Popen(
+        [sys.executable, "-m", "invoke", "desktop.protocol-daemon"],
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+        start_new_session=True,
+    )
 
 
 def get_pid_path():
-    state_dir = os.environ.get("NF_STATE", "")
-    if state_dir:
-        return os.path.join(state_dir, "nw.pid")
-    return os.path.join(internal_utils.get_path("nf"), "nw.pid")
+    return paths.get_state_dir("nw.pid")
 
 
 def save_pid(pid):
@@ -49,6 +299,146 @@ def save_pid(pid):
         f.write(str(pid))
 
 
+def read_pid():
+    try:
+        with open(get_pid_path()) as f:
+            return int(f.read().strip())
+    except (FileNotFoundError, ValueError):
+        return None
+
+
+def remove_pid():
+    try:
+        os.remove(get_pid_path())
+    except FileNotFoundError:
+        pass
+
+
+def pid_alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+def is_desktop_process(pid):
+    """True if pid runs the NW.js binary of get_app_dir(), so a reused PID is never taken for the desktop."""
+    nw_binary = os.path.realpath(os.path.join(get_app_dir(), "nw"))
+    if os.path.realpath(f"/proc/{pid}/exe") == nw_binary:
+        return True
+    try:
+        with open(f"/proc/{pid}/cmdline", "rb") as f:
+            command = f.read().split(b"\0", 1)[0]
+    except OSError:
+        return False
+    return bool(command) and os.path.realpath(os.fsdecode(command)) == nw_binary
+
+
+def running_pid():
+    """PID of the running NeuroDesktop from the pid file, or None; a stale pid file is removed."""
+    pid = read_pid()
+    if pid is None:
+        return None
+    if pid_alive(pid) and is_desktop_process(pid):
+        return pid
+    remove_pid()
+    return None
+
+
+def server_ready(port, timeout=1):
+    """True once the TiddlyWiki server inside NW.js answers /status.
+
+    The server only starts listening after boot has loaded the tiddlers, so an
+    answer means the wiki is interactive, not just that the port is bound.
+    """
+    try:
+        with urllib.request.urlopen(f"http://127.0.0.1:{port}/status", timeout=timeout) as response:
+            return "tiddlywiki_version" in json.loads(response.read())
+    except (OSError, ValueError):
+        return False
+
+
+def wait_until_ready(process, port, timeout=READY_TIMEOUT):
+    """Poll until the server is ready, the process exits or timeout passes: "ready", "exited" or "timeout"."""
+    deadline = time.monotonic() + timeout
+    while True:
+        if server_ready(port):
+            return "ready"
+        if process.poll() is not None:
+            return "exited"
+        if time.monotonic() >= deadline:
+            return "timeout"
+        time.sleep(READY_INTERVAL)
+
+
+def request_flush(devtools_port, expression=SYNCER_DIRTY, timeout=FLUSH_REQUEST_TIMEOUT):
+    """Whether the desktop's syncer still has unsaved tiddlers, asked over the DevTools port.
+
+    Returns None if it cannot be asked: no DESKTOP_DEVTOOLS_PORT, no answer, or a wiki without a syncer.
+    """
+    if not devtools_port:
+        return None
+    try:
+        dirty = devtools.evaluate(devtools_port, expression, timeout=timeout)
+    except (devtools.DevToolsError, OSError):
+        return None
+    return dirty if isinstance(dirty, bool) else None
+
+
+def flush_desktop(devtools_port, timeout=CLOSE_TIMEOUT):
+    """Start saving and wait until the syncer is clean: (dirty at request, still dirty, seconds).
+
+    Both flags are None when the syncer cannot be asked.
+    """
+    started = time.monotonic()
+    deadline = started + timeout
+    dirty = initial = request_flush(devtools_port, SYNCER_FLUSH)
+    while dirty and time.monotonic() < deadline:
+        time.sleep(CLOSE_INTERVAL)
+        dirty = request_flush(devtools_port)
+    return initial, dirty, time.monotonic() - started
+
+
+def wait_for_exit(pid, timeout=CLOSE_TIMEOUT):
+    deadline = time.monotonic() + timeout
+    while pid_alive(pid):
+        if time.monotonic() >= deadline:
+            return False
+        time.sleep(CLOSE_INTERVAL)
+    return True
+
+
+def spawn(app_dir):
+    """Start NW.js from app_dir and record its PID.
+
+    With DESKTOP_DEVTOOLS_PORT set, NW.js also listens for the DevTools protocol (desktop.profile --heap).
+    """
+    command = [os.path.join(app_dir, "nw")]
+    devtools_port = os.getenv("DESKTOP_DEVTOOLS_PORT")
+    if devtools_port:
+        command.append(f"--remote-debugging-port={devtools_port}")
+    process = subprocess.Popen(
+        command,
+        cwd=app_dir,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+    )
+    save_pid(process.pid)
+    return process
+
+
+def write_package_json(build_dir, name):
+    """Copy source/package.json to the build root under the app's name (NW.js reads it from there)."""
+    with open(os.path.join(build_dir, "source", "package.json")) as f:
+        package = json.load(f)
+    package["name"] = name
+    with open(os.path.join(build_dir, "package.json"), "w") as f:
+        json.dump(package, f, indent=2)
+
+
 def get_app_dir():
     app_dir = internal_utils.get_path("build")
     if app_dir and not app_dir.is_absolute():
@@ -56,6 +446,172 @@ def get_app_dir():
     return app_dir
 
 
+# ---------------------------------------------------------------------------
+# Process usage and profiling
+# ---------------------------------------------------------------------------
+
+def read_proc_table():
+    """Parent PID and CPU seconds (user + system) of every process: {pid: (ppid, cpu)}."""
+    ticks = os.sysconf("SC_CLK_TCK")
+    table = {}
+    for entry in os.listdir("/proc"):
+        if not entry.isdigit():
+            continue
+        try:
+            with open(f"/proc/{entry}/stat") as f:
+                stat = f.read()
+        except OSError:
+            continue
+        # The command name may contain spaces and parentheses; fields resume after the last ")".
+        fields = stat.rsplit(")", 1)[1].split()
+        table[int(entry)] = (int(fields[1]), (int(fields[11]) + int(fields[12])) / ticks)
+    return table
+
+
+def read_rss(pid):
+    try:
+        with open(f"/proc/{pid}/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, IndexError, ValueError):
+        return 0
+
+
+def tree_usage(pid, table=None):
+    """Total RSS bytes, CPU seconds and process count of pid and its descendants, or None if pid is gone.
+
+    NW.js runs its renderers and the container runs Neo4j as child processes,
+    so the root process alone would understate both.
+    """
+    table = read_proc_table() if table is None else table
+    if pid not in table:
+        return None
+    children = defaultdict(list)
+    for child, (parent, _) in table.items():
+        children[parent].append(child)
+    rss = cpu = processes = 0
+    queue = [pid]
+    while queue:
+        current = queue.pop()
+        rss += read_rss(current)
+        cpu += table[current][1]
+        processes += 1
+        queue.extend(children[current])
+    return rss, cpu, processes
+
+
+def get_profile_dir():
+    return paths.get_state_dir("profiles")
+
+
+def record_samples(pid, path, interval=PROFILE_INTERVAL, duration=None):
+    """Append one NDJSON sample of the process tree to path every interval until duration, exit or Ctrl-C."""
+    started = time.monotonic()
+    samples = []
+    previous = None
+    with open(path, "w") as f:
+        try:
+            while True:
+                usage = tree_usage(pid)
+                if usage is None:
+                    break
+                now = time.monotonic()
+                rss, cpu_seconds, processes = usage
+                cpu = None
+                if previous and now > previous[1]:
+                    cpu = round(100 * (cpu_seconds - previous[0]) / (now - previous[1]), 1)
+                previous = (cpu_seconds, now)
+                sample = {
+                    "time": round(time.time(), 3),
+                    "elapsed": round(now - started, 3),
+                    "rss": rss,
+                    "cpu": cpu,
+                    "processes": processes,
+                }
+                samples.append(sample)
+                f.write(json.dumps(sample) + "\n")
+                f.flush()
+                if duration is not None and now - started >= duration:
+                    break
+                time.sleep(interval)
+        except KeyboardInterrupt:
+            pass
+    return samples
+
+
+def linear_slope(xs, ys):
+    """Least-squares slope of ys over xs, or None with fewer than two distinct xs."""
+    if len(xs) < 2:
+        return None
+    mean_x = sum(xs) / len(xs)
+    mean_y = sum(ys) / len(ys)
+    variance = sum((x - mean_x) ** 2 for x in xs)
+    if not variance:
+        return None
+    return sum((x - mean_x) * (y - mean_y) for x, y in zip(xs, ys)) / variance
+
+
+def heap_growth(first, last, top=PROFILE_TOP):
+    """Top object types of the last heap snapshot, by growth since the first if there are two."""
+    before = devtools.heap_type_sizes(first) if first != last else {}
+    rows = [
+        {
+            "type": name,
+            "count": count,
+            "size": size,
+            "count_delta": count - before.get(name, [0, 0])[0],
+            "size_delta": size - before.get(name, [0, 0])[1],
+        }
+        for name, (count, size) in devtools.heap_type_sizes(last).items()
+    ]
+    key = "size_delta" if before else "size"
+    return sorted(rows, key=lambda row: row[key], reverse=True)[:int(top)]
+
+
+def summarize_profile(samples, snapshots=(), top=PROFILE_TOP):
+    rss = [sample["rss"] for sample in samples]
+    cpu = [sample["cpu"] for sample in samples if sample["cpu"] is not None]
+    slope = linear_slope([sample["elapsed"] for sample in samples], rss)
+    summary = {
+        "samples": len(samples),
+        "seconds": samples[-1]["elapsed"] if samples else 0,
+        "rss_start": rss[0] if rss else None,
+        "rss_end": rss[-1] if rss else None,
+        "rss_peak": max(rss) if rss else None,
+        "rss_growth_per_hour": round(slope * 3600) if slope is not None else None,
+        "cpu_mean": round(sum(cpu) / len(cpu), 1) if cpu else None,
+        "cpu_peak": max(cpu) if cpu else None,
+        "snapshots": list(snapshots),
+    }
+    if snapshots:
+        summary["heap"] = heap_growth(snapshots[0], snapshots[-1], top=top)
+    return summary
+
+
+def print_profile(summary):
+    if not summary["samples"]:
+        print(f"{terminal_style.FAIL} No samples recorded")
+        return
+    growth = summary["rss_growth_per_hour"]
+    print(f"Samples: {summary['samples']} over {summary['seconds']:.0f}s")
+    print(
+        f"RSS:     {summary['rss_start'] / MIB:.1f} -> {summary['rss_end'] / MIB:.1f} MiB, "
+        f"peak {summary['rss_peak'] / MIB:.1f} MiB"
+        + (f", {growth / MIB:+.1f} MiB/h" if growth is not None else "")
+    )
+    if summary["cpu_mean"] is not None:
+        print(f"CPU:     mean {summary['cpu_mean']:.1f}%, peak {summary['cpu_peak']:.1f}%")
+    if summary.get("heap"):
+        print(f"{'Type':<40} {'Count':>10} {'Size':>12} {'Growth':>12}")
+        for row in summary["heap"]:
+            print(f"{row['type'][:40]:<40} {row['count']:>10} {row['size']:>12} {row['size_delta']:>+12}")
+
+
+def take_heap_snapshot(port, path):
+    with terminal_style.step(f"Heap snapshot: {path}"):
+        devtools.take_heap_snapshot(port, path)
+    return path
+
+
 # ---------------------------------------------------------------------------
 # Tasks
 # ---------------------------------------------------------------------------
@@ -76,12 +632,7 @@ def build(c, build_dir=None):
     # Desktop
     desktop_source = internal_utils.get_path("nf") / "desktop" / "source"
     build_utils.rsync_local(desktop_source, build_dir, "desktop source")
-    source_pkg = os.path.join(build_dir, "source", "package.json")
-    with open(source_pkg) as f:
-        package = json.load(f)
-    package["name"] = os.environ["DESKTOP_NAME"]
-    with open(os.path.join(build_dir, "package.json"), "w") as f:
-        json.dump(package, f, indent=2)
+    write_package_json(build_dir, os.environ["DESKTOP_NAME"])
 
     # Install node modules
     with terminal_style.step("npm install"):
@@ -89,45 +640,145 @@ def build(c, build_dir=None):
 
 
 @invoke.task(pre=[setup.env])
-def run(c):
-    """Launch NW.js desktop app. --protocol=neuro://uuid for deep linking."""
+def run(c, timeout=READY_TIMEOUT):
+    """Launch NW.js desktop app and wait until its wiki is interactive."""
     app_dir = get_app_dir()
+    port = os.getenv("PORT")
 
     nw_binary = os.path.join(app_dir, "nw")
     if not os.path.isfile(nw_binary):
         print(f"NW.js binary not found at {nw_binary}. Run build.desktop first.")
         sys.exit(1)
 
-    process = subprocess.Popen(
-        [nw_binary],
-        cwd=app_dir,
-        stdout=subprocess.DEVNULL,
-        stderr=subprocess.DEVNULL,
-    )
-    time.sleep(1)
-    if process.poll() is not None:
+    if server_ready(port) or running_pid():
         print(f"{terminal_style.SUCCESS} Already running.")
         return
-    save_pid(process.pid)
-    print(f"{terminal_style.SUCCESS} Running NW.js (PID {process.pid})")
+
+    started = time.monotonic()
+    process = spawn(app_dir)
+    state = wait_until_ready(process, port, timeout=float(timeout))
+    elapsed = time.monotonic() - started
+
+    if state == "exited":
+        remove_pid()
+        if server_ready(port):
+            print(f"{terminal_style.SUCCESS} Already running.")
+            return
+        print(f"{terminal_style.FAIL} NW.js exited with code {process.poll()}")
+        raise SystemExit(1)
+    if state == "timeout":
+        print(f"{terminal_style.FAIL} NW.js (PID {process.pid}) not ready on port {port} after {elapsed:.1f}s")
+        raise SystemExit(1)
+
+    start_protocol_daemon()
+    print(f"{terminal_style.SUCCESS} Running NW.js (PID {process.pid}), interactive in {elapsed:.1f}s")
+
+
+@invoke.task(pre=[setup.env], name="open", iterable=["urls"])
+def open_links(c, urls, uuids_file=None):
+    """Open many neuro:// links with batched lookups and one story list write. --uuids-file reads one link per line."""
+    uuids = [url.removeprefix("neuro://") for url in urls]
+    if uuids_file:
+        uuids += read_uuids(uuids_file)
+    uuids = list(dict.fromkeys(uuids))
+    if not uuids:
+        print("No links given")
+        return
+
+    port = os.getenv("PORT")
+    if not network_utils.is_port_in_use(port):
+        print("NeuroDesktop not running")
+        raise SystemExit(1)
+
+    titles = resolve_titles(uuids)
+    cache = TitleCache(get_id_cache_path())
+    for uuid, title in titles.items():
+        cache.put(uuid, title)
+    cache.save()
+
+    for uuid in uuids:
+        if uuid not in titles:
+            print(f"Not found: {uuid}")
+    opened = [titles[uuid] for uuid in uuids if uuid in titles]
+    if opened:
+        open_story(port, opened)
+    print(f"{terminal_style.SUCCESS} Opened {len(titles)} of {len(uuids)} links")
+
+
+@invoke.task(pre=[setup.env])
+def protocol_daemon(c):
+    """Serve neuro:// deep links over a Unix socket (see tasks/protocol.py)."""
+    socket_path = protocol.get_socket_path()
+    print(f"{terminal_style.SUCCESS} Serving neuro:// links on {socket_path}")
+    serve_protocol(socket_path)
 
 
 @invoke.task(pre=[setup.env])
-def close(c):
-    """Close NW.js desktop app by reading PID file."""
-    pid_path = get_pid_path()
+def profile(c, interval=PROFILE_INTERVAL, duration=None, output=None, heap=False, top=PROFILE_TOP):
+    """Sample RSS/CPU of the NW.js process tree into a time series. --heap adds V8 heap snapshots."""
+    pid = running_pid()
+    if not pid:
+        print("NeuroDesktop not running")
+        raise SystemExit(1)
+    devtools_port = os.getenv("DESKTOP_DEVTOOLS_PORT")
+    if heap and not devtools_port:
+        print(f"{terminal_style.FAIL} --heap needs DESKTOP_DEVTOOLS_PORT set when the desktop is started")
+        raise SystemExit(1)
+
+    output = output or os.path.join(get_profile_dir(), time.strftime("desktop-%Y%m%d-%H%M%S"))
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    snapshots = []
+    if heap:
+        try:
+            snapshots.append(take_heap_snapshot(devtools_port, f"{output}-start.heapsnapshot"))
+        except devtools.DevToolsError as e:
+            raise SystemExit(f"Heap snapshot failed: {e}")
+
+    print(f"Sampling NeuroDesktop (PID {pid}) every {interval}s into {output}.ndjson, Ctrl-C to stop")
+    samples = record_samples(pid, f"{output}.ndjson", float(interval), float(duration) if duration else None)
 
-    if not os.path.isfile(pid_path):
+    if heap and pid_alive(pid):
+        try:
+            snapshots.append(take_heap_snapshot(devtools_port, f"{output}-end.heapsnapshot"))
+        except devtools.DevToolsError as e:
+            print(f"{terminal_style.FAIL} Final heap snapshot failed: {e}")
+
+    summary = summarize_profile(samples, snapshots, top=top)
+    with open(f"{output}-summary.json", "w") as f:
+        json.dump(summary, f, indent=2)
+    print_profile(summary)
+
+
+@invoke.task(pre=[setup.env])
+def close(c, timeout=CLOSE_TIMEOUT):
+    """Flush pending saves, then close NW.js desktop app by reading PID file."""
+    if protocol.shutdown():
+        print(f"{terminal_style.SUCCESS} Stopped neuro:// protocol daemon")
+
+    if not os.path.isfile(get_pid_path()):
         print(f"{terminal_style.SUCCESS} NeuroDesktop already closed (no file)")
         return
 
-    with open(pid_path) as f:
-        pid = int(f.read().strip())
+    pid = running_pid()
+    if not pid:
+        print(f"{terminal_style.SUCCESS} NeuroDesktop already closed (no process)")
+        return
 
     try:
+        initial, dirty, elapsed = flush_desktop(os.getenv("DESKTOP_DEVTOOLS_PORT"), timeout=float(timeout))
+        if dirty:
+            print(f"{terminal_style.FAIL} Saves still pending after {elapsed:.1f}s")
+        elif initial:
+            print(f"{terminal_style.SUCCESS} Flushed pending saves in {elapsed:.1f}s")
+
         os.kill(pid, signal.SIGTERM)
-        print(f"{terminal_style.SUCCESS} Closed NeuroDesktop (PID {pid})")
+        if wait_for_exit(pid, timeout=float(timeout)):
+            print(f"{terminal_style.SUCCESS} Closed NeuroDesktop (PID {pid})")
+        else:
+            os.kill(pid, signal.SIGKILL)
+            print(f"{terminal_style.FAIL} Killed NeuroDesktop (PID {pid}) after {timeout}s without exit")
     except ProcessLookupError:
         print(f"{terminal_style.SUCCESS} NeuroDesktop already closed (no process)")
     finally:
-        os.remove(pid_path)
+        remove_pid()
+
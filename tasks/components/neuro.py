@@ -2,12 +2,15 @@ import shlex
 import subprocess
 
 import invoke
+from neuro.utils import build_utils, internal_utils
 
-from neuro.utils import internal_utils, build_utils
-
+from tasks import paths
 from tasks.actions import setup
-from tasks.components import tw5, neurobase
+from tasks.components import neurobase, tw5
+from tasks.pytest_plugins import nf_impact
 
+# Non-Python inputs of the neuro tests: any change in them reruns every test under --impact.
+IMPACT_GLOBALS = ("tw5-plugins", "tw5-editions")
 
 MODES = {
     "unit": ["-m", "not (integration or e2e)"],
@@ -17,24 +20,35 @@ MODES = {
 
 
 @invoke.task(pre=[invoke.call(setup.env, environment="TESTING")])
-def test(c, mode="integration", location="neuro/tests", pytest_args=""):
+def test(c, mode="integration", location="neuro/tests", pytest_args="", impact=False, bundled=False):
     """Run neuro tests. Modes: unit, integration (default), e2e."""
     if mode not in MODES:
         raise SystemExit(f"Unknown mode: {mode}. Choose from {', '.join(MODES)}")
     if mode in ("integration", "e2e"):
-        tw5.bundle(c)
+        if not bundled:
+            tw5.bundle(c)
         neurobase.reset(c, confirmed=True)
     extra = shlex.split(pytest_args) if pytest_args else []
-    result = subprocess.run(["nenv/bin/pytest", location] + MODES[mode] + extra)
-    if result.returncode != 0:
+    command = ["nenv/bin/pytest", location] + MODES[mode] + extra
+    if impact:
+        # Exit code 5 (no tests collected) means every test was deselected as unaffected.
+        nf_path = internal_utils.get_path("nf")
+        global_paths = [nf_path / path for path in IMPACT_GLOBALS] + [location]
+        args = nf_impact.impact_args(paths.get_state_dir("impact", f"neuro-{mode}.json"), global_paths)
+        result = subprocess.run(command + args, env=nf_impact.impact_env(), check=False)
+        success = (0, nf_impact.NO_TESTS_COLLECTED)
+    else:
+        result = subprocess.run(command, check=False)
+        success = (0,)
+    if result.returncode not in success:
         raise SystemExit(result.returncode)
 
 
 @invoke.task(pre=[invoke.call(setup.env, environment="TESTING")])
-def test_local(c, mode="e2e", location="neuro/tests", pytest_args=""):
+def test_local(c, mode="e2e", location="neuro/tests", pytest_args="", impact=False):
     """Rsync neuro and run tests. Modes: unit, integration, e2e (default)."""
     setup.rsync(c, components=["neuro"])
-    test(c, mode, location, pytest_args)
+    test(c, mode, location, pytest_args, impact)
 
 
 @invoke.task(pre=[invoke.call(setup.env, environment="TESTING")])
@@ -51,7 +65,7 @@ def ruff(c, ruff_args=""):
         ruff_args = []
     else:
         ruff_args = shlex.split(ruff_args)
-    result = subprocess.run(["nenv/bin/ruff", "check", internal_utils.get_path("neuro")] + ruff_args)
+    result = subprocess.run(["nenv/bin/ruff", "check", internal_utils.get_path("neuro")] + ruff_args, check=False)
     if result.returncode != 0:
         raise SystemExit(result.returncode)
 
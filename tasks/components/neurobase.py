@@ -1,18 +1,489 @@
+import bisect
+import datetime
+import hashlib
+import itertools
+import json
 import logging
+import math
 import os
+import random
+import re
+import socket
 import subprocess
 import sys
+import threading
 import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
 
 import invoke
 import neo4j
-
 from neuro.base.api import NeuroBase
-from neuro.utils import docker_tools
-from neuro.utils import internal_utils, network_utils, terminal_components, terminal_style
+from neuro.utils import (
+    docker_tools,
+    internal_utils,
+    network_utils,
+    terminal_components,
+    terminal_style,
+)
 
+from tasks import paths
 from tasks.actions import setup
 
+MIB = 1024 ** 2
+GIB = 1024 ** 3
+
+HEAP_MIN = 512 * MIB
+# A desktop graph needs little heap; the page cache is what keeps its queries off the disk.
+HEAP_MAX = 4 * GIB
+PAGECACHE_MIN = 128 * MIB
+OS_RESERVED_MIN = 2 * GIB
+
+NBASE_LABEL = "label=com.docker.compose.service=nbase"
+IMAGE_HASH_LENGTH = 12
+BOLT_PORT = re.compile(r":(\d+)->7687/tcp")
+PORT_VARIABLES = {"NEO4J_PORT_HTTP": "7474/tcp", "NEO4J_PORT_BOLT": "7687/tcp"}
+
+# PROFILE reports page cache hits and misses per operator; reading properties(...) pulls in property pages.
+WARMUP_QUERIES = (
+    "PROFILE MATCH (n) RETURN sum(size(keys(properties(n)))) AS properties",
+    "PROFILE MATCH ()-[r]->() RETURN sum(size(keys(properties(r)))) AS properties",
+)
+WARMUP_INDEX_QUERY = (
+    "SHOW RANGE INDEXES YIELD entityType, labelsOrTypes, properties, state "
+    "WHERE state = 'ONLINE' RETURN entityType, labelsOrTypes, properties"
+)
+SEED_BATCH = 5000
+SEED_TAGS = 3
+SEED_TAG_COUNT = 200
+SEED_LINKS = 4
+SEED_FIELDS = 2
+SEED_FIELD_SIZE = 32
+SEED_WORDS = 150
+SEED_VOCABULARY = (
+    "neuron", "forest", "graph", "tiddler", "synapse", "branch", "root", "leaf", "signal", "memory", "cortex",
+    "axon", "dendrite", "pattern", "network", "node", "edge", "concept", "idea", "note", "source", "claim",
+    "evidence", "question", "answer", "method", "model", "theory", "result", "protein", "gene", "cell", "tissue",
+    "organ", "species", "habitat", "climate", "river", "stone", "light", "wave", "field", "energy", "matter",
+    "time", "space", "number", "system", "structure", "process", "function",
+)
+SEED_EPOCH = datetime.datetime(2020, 1, 1)
+COUNT_TIDDLERS_QUERY = "MATCH (t) WHERE t.title IS NOT NULL RETURN count(t) AS count"
+SEED_QUERY = "UNWIND $tiddlers AS fields CREATE (t:Tiddler) SET t = fields"
+# Batched so that clearing a large graph does not need one huge transaction.
+CLEAR_QUERY = "MATCH (n) CALL (n) { DETACH DELETE n } IN TRANSACTIONS OF 10000 ROWS"
+
+
+# ---------------------------------------------------------------------------
+# Helpers
+# ---------------------------------------------------------------------------
+
+def compose_env(base_name, **overrides):
+    """Environment for docker compose, scoped to base_name."""
+    env = dict(os.environ)
+    env["BASE_NAME"] = base_name
+    env.update(overrides)
+    return env
+
+
+def inspect_instances():
+    """All NeuroBase containers on this host (by compose service label) with state and Bolt port."""
+    result = subprocess.run(
+        ["docker", "ps", "-a", "--filter", NBASE_LABEL, "--format", "{{.Names}}\t{{.State}}\t{{.Ports}}"],
+        capture_output=True, text=True,
+        check=False,
+    )
+    if result.returncode != 0:
+        return []
+    instances = []
+    for line in result.stdout.splitlines():
+        if not line:
+            continue
+        name, state, ports = (line.split("\t") + ["", ""])[:3]
+        match = BOLT_PORT.search(ports)
+        instances.append({
+            "name": name,
+            "state": state,
+            "bolt_port": int(match.group(1)) if match else None,
+        })
+    return sorted(instances, key=lambda i: i["name"])
+
+
+def list_instances():
+    """Names of all NeuroBase containers on this host."""
+    return [instance["name"] for instance in inspect_instances()]
+
+
+def get_bolt_port(name):
+    result = subprocess.run(["docker", "port", name, "7687/tcp"], capture_output=True, text=True, check=False)
+    match = re.search(r":(\d+)$", result.stdout.strip().split("\n")[0])
+    return int(match.group(1)) if match else None
+
+
+def get_published_ports(name):
+    """
+    Compose port variables for the host ports an existing container publishes, {} if none.
+
+    Read from its port bindings rather than `docker port`, so a stopped
+    container keeps its ports when it is recomposed.
+    """
+    result = subprocess.run(
+        ["docker", "inspect", "--format", "{{json .HostConfig.PortBindings}}", name],
+        capture_output=True, text=True,
+        check=False,
+    )
+    if result.returncode != 0:
+        return {}
+    bindings = json.loads(result.stdout or "null") or {}
+    return {
+        variable: bindings[port][0]["HostPort"]
+        for variable, port in PORT_VARIABLES.items()
+        if bindings.get(port)
+    }
+
+
+def get_free_port_settings():
+    """Compose port variables on free host ports, for instances other than BASE_NAME."""
+    http_port, bolt_port = network_utils.get_free_ports(2)
+    return {"NEO4J_PORT_HTTP": str(http_port), "NEO4J_PORT_BOLT": str(bolt_port)}
+
+
+def print_instance_env(name, settings):
+    print(f"  BASE_NAME={name}")
+    print(f"  NEO4J_PORT_HTTP={settings['NEO4J_PORT_HTTP']}")
+    print(f"  NEO4J_PORT_BOLT={settings['NEO4J_PORT_BOLT']}")
+    print(f"  NEO4J_URI=bolt://127.0.0.1:{settings['NEO4J_PORT_BOLT']}")
+
+
+def bolt_ready(port, timeout=60):
+    """Wait until the Bolt port accepts connections; False after timeout."""
+    deadline = time.monotonic() + timeout
+    while True:
+        try:
+            with socket.create_connection(("127.0.0.1", port), timeout=1):
+                return True
+        except OSError:
+            if time.monotonic() >= deadline:
+                return False
+            time.sleep(0.25)
+
+
+def run_concurrently(func, names, jobs):
+    """Apply func to each instance name with at most jobs in flight, preserving order."""
+    with ThreadPoolExecutor(max_workers=max(int(jobs), 1)) as pool:
+        return list(pool.map(func, names))
+
+
+def start_instance(name, timeout=60):
+    started = time.monotonic()
+    if not docker_tools.container_running(name):
+        subprocess.run(["docker", "start", name], capture_output=True, check=False)
+    port = get_bolt_port(name)
+    ready = port is not None and bolt_ready(port, timeout=timeout)
+    return {
+        "name": name,
+        "state": "running" if docker_tools.container_running(name) else "stopped",
+        "bolt_port": port,
+        "ready": ready,
+        "seconds": time.monotonic() - started,
+    }
+
+
+def stop_instance(name):
+    started = time.monotonic()
+    if docker_tools.container_running(name):
+        subprocess.run(["docker", "stop", name], capture_output=True, check=False)
+    return {
+        "name": name,
+        "state": "running" if docker_tools.container_running(name) else "stopped",
+        "bolt_port": None,
+        "ready": False,
+        "seconds": time.monotonic() - started,
+    }
+
+
+def probe_instance(instance):
+    port = instance["bolt_port"]
+    started = time.monotonic()
+    ready = port is not None and bolt_ready(port, timeout=0)
+    return dict(instance, ready=ready, seconds=time.monotonic() - started)
+
+
+def print_instance_table(rows):
+    width = max([len(row["name"]) for row in rows] + [4])
+    print(f"  {'name':<{width}} {'state':<9} {'bolt':>6} {'ready':<5} {'time':>7}")
+    for row in rows:
+        port = row["bolt_port"] or "-"
+        mark = terminal_style.SUCCESS if row["ready"] else terminal_style.FAIL
+        print(f"  {row['name']:<{width}} {row['state']:<9} {port:>6} {mark:<5} {row['seconds']:>6.1f}s")
+
+
+def get_build_args():
+    neo4j_version = os.getenv("NEO4J_VERSION")
+    return {
+        "NEO4J_BASE_VERSION": neo4j_version,
+        "APOC_EXTENDED_VERSION": os.getenv("APOC_EXTENDED_VERSION") or neo4j_version,
+    }
+
+
+def get_image():
+    """
+    The nbase image reference, tagged by a hash of the Dockerfile and its build args.
+
+    Instances that share the hash share one image, and a Dockerfile or version
+    change gets a new tag instead of silently reusing a stale image.
+    """
+    digest = hashlib.sha256()
+    with open(internal_utils.get_path("nf") / "Dockerfile", "rb") as f:
+        digest.update(f.read())
+    digest.update(json.dumps(get_build_args(), sort_keys=True).encode())
+    return f"{os.getenv('NBASE_IMAGE')}:{os.getenv('NBASE_VERSION')}-{digest.hexdigest()[:IMAGE_HASH_LENGTH]}"
+
+
+def image_exists(image):
+    result = subprocess.run(["docker", "image", "inspect", image], capture_output=True, check=False)
+    return result.returncode == 0
+
+
+def build_image(image, no_cache=False):
+    command = ["docker", "build", "--tag", image]
+    for key, value in get_build_args().items():
+        command += ["--build-arg", f"{key}={value}"]
+    if no_cache:
+        command.append("--no-cache")
+    command.append(str(internal_utils.get_path("nf")))
+    result = subprocess.run(
+        command, capture_output=True, text=True, env={**os.environ, "DOCKER_BUILDKIT": "1"}, check=False
+    )
+    if result.returncode != 0:
+        print(result.stderr)
+        raise SystemExit(1)
+
+
+def ensure_image():
+    """Build the nbase image unless it already exists; returns its reference."""
+    image = get_image()
+    if not image_exists(image):
+        with terminal_style.step(f"Build {image}"):
+            build_image(image)
+    return image
+
+
+def volume_exists(volume):
+    result = subprocess.run(["docker", "volume", "inspect", volume], capture_output=True, check=False)
+    return result.returncode == 0
+
+
+def volume_command(volume, mount, command, *args):
+    """Run a command in a throwaway nbase container with volume mounted read-only."""
+    image = ensure_image()
+    return subprocess.run(
+        ["docker", "run", "--rm", "--entrypoint", command, "-v", f"{volume}:{mount}:ro", image, *args],
+        capture_output=True, text=True,
+        check=False,
+    )
+
+
+def get_store_size(base_name):
+    """On-disk size of the data volume in bytes, 0 if it does not exist yet."""
+    volume = f"{base_name}-data"
+    if not volume_exists(volume):
+        return 0
+    result = volume_command(volume, "/data", "du", "-sb", "/data")
+    try:
+        return int(result.stdout.split()[0])
+    except (IndexError, ValueError):
+        return 0
+
+
+def copy_volume(source, target, project):
+    """
+    Copy one volume into a new one in a throwaway container.
+
+    cp reflinks where the filesystem supports it and keeps sparse store files
+    sparse. The target carries compose labels so compose adopts it as its own.
+    """
+    subprocess.run([
+        "docker", "volume", "create",
+        "--label", f"com.docker.compose.project={project}",
+        "--label", "com.docker.compose.volume=data",
+        target,
+    ], check=True, capture_output=True)
+    image = ensure_image()
+    subprocess.run([
+        "docker", "run", "--rm", "--entrypoint", "cp",
+        "-v", f"{source}:/from:ro", "-v", f"{target}:/to", image,
+        "-a", "--reflink=auto", "--sparse=always", "/from/.", "/to/",
+    ], check=True, capture_output=True)
+
+
+def get_host_memory():
+    return os.sysconf("SC_PAGE_SIZE") * os.sysconf("SC_PHYS_PAGES")
+
+
+def format_size(size):
+    return f"{max(size // MIB, 1)}m"
+
+
+def compute_memory(host_memory, store_size, instances=1):
+    """
+    Split host memory between co-resident instances into (heap, pagecache) bytes.
+
+    A quarter of the host (at least 2 GiB) is left to the OS and NeuroDesktop.
+    A quarter of each instance's share goes to the heap. The page cache gets at
+    least half of the rest, so a new or empty store can grow without a tune,
+    and up to all of it for a store that needs more (its size plus 20% growth).
+    """
+    reserved = max(OS_RESERVED_MIN, host_memory // 4)
+    available = max(host_memory - reserved, 0) // max(instances, 1)
+    heap = min(max(available // 4, HEAP_MIN), HEAP_MAX)
+    rest = available - heap
+    pagecache = max(min(store_size * 6 // 5, rest), rest // 2, PAGECACHE_MIN)
+    return heap, pagecache
+
+
+def memory_settings(base_name, instances=None):
+    """
+    Compose variables for Neo4j heap and page cache sizes.
+
+    Values pinned in the environment (e.g. .env.local) take precedence.
+    """
+    if instances is None:
+        names = list_instances()
+        instances = len(names) + (base_name not in names)
+    heap, pagecache = compute_memory(get_host_memory(), get_store_size(base_name), int(instances))
+    return {
+        "NEO4J_HEAP_SIZE": os.getenv("NEO4J_HEAP_SIZE") or format_size(heap),
+        "NEO4J_PAGECACHE_SIZE": os.getenv("NEO4J_PAGECACHE_SIZE") or format_size(pagecache),
+    }
+
+
+def compose_up(base_name, settings, image):
+    """Create or recreate the instance from a prebuilt image (see ensure_image)."""
+    tag = image.rsplit(":", 1)[1]
+    result = subprocess.run(
+        ["docker", "compose", "up", "-d"],
+        capture_output=True, text=True, env=compose_env(base_name, NBASE_TAG=tag, **settings),
+        check=False,
+    )
+    if result.returncode != 0:
+        print(result.stderr)
+        raise SystemExit(1)
+
+
+# ---------------------------------------------------------------------------
+# Query log
+# ---------------------------------------------------------------------------
+
+QUERY_LOG_ENTRY = re.compile(r"^\d{4}-\d{2}-\d{2} \d{2}:\d{2}:\d{2}")
+QUERY_LOG_TIMING = re.compile(r" - (?P<ms>\d+) ms: ")
+QUERY_LOG_PAGES = re.compile(r" - (?P<hits>\d+) page hits, (?P<faults>\d+) page faults - ")
+QUERY_LOG_QUERY = re.compile(r">\s+\S+ - \S* - (?P<query>.*?)(?: - \{.*\})? - runtime=", re.DOTALL)
+QUERY_LITERALS = re.compile(r"'(?:[^'\\]|\\.)*'|\"(?:[^\"\\]|\\.)*\"|\b\d+(?:\.\d+)?\b")
+
+
+def enable_query_log(uri, threshold):
+    """
+    Turn on query logging for the instance at uri (dynamic settings, no restart).
+
+    Page hits and faults are only logged with db.logs.query.page_logging_enabled.
+    """
+    logging.getLogger("neo4j").setLevel(logging.ERROR)
+    auth = (os.getenv("NEO4J_USER"), os.getenv("NEO4J_PASSWORD"))
+    with neo4j.GraphDatabase.driver(uri, auth=auth) as driver:
+        driver.execute_query("CALL dbms.setConfigValue('db.logs.query.enabled', 'INFO')")
+        driver.execute_query("CALL dbms.setConfigValue('db.logs.query.page_logging_enabled', 'true')")
+        driver.execute_query("CALL dbms.setConfigValue('db.logs.query.threshold', $threshold)",
+                             threshold=threshold)
+
+
+def read_query_log(base_name):
+    """Concatenated query.log (including rotated files) from the logs volume."""
+    result = volume_command(f"{base_name}-logs", "/logs", "sh", "-c", "cat /logs/query.log*")
+    return result.stdout
+
+
+def query_shape(query):
+    """Normalize a Cypher query so that calls differing only in literals aggregate together."""
+    return " ".join(QUERY_LITERALS.sub("?", query).split())
+
+
+def parse_query_log(text):
+    """Yield dicts with query, ms, hits and faults for completed queries in a query log."""
+    entries = []
+    for line in text.splitlines():
+        if QUERY_LOG_ENTRY.match(line) or line.startswith("{"):
+            entries.append(line)
+        elif entries:
+            entries[-1] += "\n" + line
+
+    for entry in entries:
+        if entry.startswith("{"):
+            try:
+                record = json.loads(entry)
+            except json.JSONDecodeError:
+                continue
+            if "elapsedTimeMs" not in record or "query" not in record:
+                continue
+            yield {
+                "query": record["query"],
+                "ms": int(record["elapsedTimeMs"]),
+                "hits": int(record.get("pageHits", 0)),
+                "faults": int(record.get("pageFaults", 0)),
+            }
+            continue
+        timing = QUERY_LOG_TIMING.search(entry)
+        query = QUERY_LOG_QUERY.search(entry)
+        if not timing or not query:
+            continue
+        pages = QUERY_LOG_PAGES.search(entry)
+        yield {
+            "query": query.group("query"),
+            "ms": int(timing.group("ms")),
+            "hits": int(pages.group("hits")) if pages else 0,
+            "faults": int(pages.group("faults")) if pages else 0,
+        }
+
+
+def percentile(values, p):
+    ordered = sorted(values)
+    rank = max(math.ceil(p / 100 * len(ordered)), 1)
+    return ordered[rank - 1]
+
+
+def aggregate_queries(records):
+    """Aggregate parsed query log records per query shape, slowest total time first."""
+    groups = {}
+    for record in records:
+        group = groups.setdefault(query_shape(record["query"]), {"ms": [], "hits": 0, "faults": 0})
+        group["ms"].append(record["ms"])
+        group["hits"] += record["hits"]
+        group["faults"] += record["faults"]
+
+    report = []
+    for shape, group in groups.items():
+        ms = group["ms"]
+        report.append({
+            "query": shape,
+            "count": len(ms),
+            "total_ms": sum(ms),
+            "p50_ms": percentile(ms, 50),
+            "p95_ms": percentile(ms, 95),
+            "p99_ms": percentile(ms, 99),
+            "max_ms": max(ms),
+            "page_hits": group["hits"],
+            "page_faults": group["faults"],
+        })
+    return sorted(report, key=lambda r: (-r["total_ms"], r["query"]))
+
+
+def print_query_report(report):
+    print(f"  {'count':>7} {'total':>9} {'p50':>7} {'p95':>7} {'p99':>7} {'hits':>10} {'faults':>8}  query")
+    for r in report:
+        query = r["query"] if len(r["query"]) <= 80 else r["query"][:77] + "..."
+        print(f"  {r['count']:>7} {r['total_ms']:>7}ms {r['p50_ms']:>5}ms {r['p95_ms']:>5}ms "
+              f"{r['p99_ms']:>5}ms {r['page_hits']:>10} {r['page_faults']:>8}  {query}")
+
 
 def verify_neo4j(timeout=60):
     logging.getLogger("neo4j").setLevel(logging.ERROR)
@@ -33,6 +504,7 @@ def verify_neo4j(timeout=60):
                 logs = subprocess.run(
                     ["docker", "logs", "--tail", "50", base_name],
                     capture_output=True, text=True,
+                    check=False,
                 )
                 print(logs.stdout)
                 print(logs.stderr)
@@ -42,24 +514,252 @@ def verify_neo4j(timeout=60):
             driver.close()
 
 
+# ---------------------------------------------------------------------------
+# Warm-up
+# ---------------------------------------------------------------------------
+
+def get_warmup_path(base_name):
+    return paths.get_state_dir(f"{base_name}-warmup.json")
+
+
+def quote_name(name):
+    return "`" + name.replace("`", "``") + "`"
+
+
+def index_scan_query(entity_type, token, properties):
+    """A PROFILEd scan of one range index, forced with USING INDEX."""
+    token = quote_name(token)
+    pattern = f"(e:{token})" if entity_type == "NODE" else f"()-[e:{token}]-()"
+    keys = ", ".join(quote_name(key) for key in properties)
+    conditions = " AND ".join(f"e.{quote_name(key)} IS NOT NULL" for key in properties)
+    return f"PROFILE MATCH {pattern} USING INDEX e:{token}({keys}) WHERE {conditions} RETURN count(e) AS entries"
+
+
+def profile_pages(plan):
+    """Page cache hits plus misses over a profiled plan tree (summary.profile)."""
+    if not plan:
+        return 0
+    pages = plan.get("pageCacheHits", 0) + plan.get("pageCacheMisses", 0)
+    return pages + sum(profile_pages(child) for child in plan.get("children", []))
+
+
+def warmup_page_cache(base_name):
+    """
+    Load the store into the page cache and record pages touched and elapsed time.
+
+    Runs a PROFILEd scan of all nodes, all relationships and each online
+    range index, and sums the page cache hits and misses the profiles report.
+    """
+    logging.getLogger("neo4j").setLevel(logging.ERROR)
+    auth = (os.getenv("NEO4J_USER"), os.getenv("NEO4J_PASSWORD"))
+
+    started = time.monotonic()
+    with neo4j.GraphDatabase.driver(get_bolt_uri(base_name), auth=auth) as driver:
+        indexes, _, _ = driver.execute_query(WARMUP_INDEX_QUERY)
+        queries = list(WARMUP_QUERIES) + [
+            index_scan_query(index["entityType"], index["labelsOrTypes"][0], index["properties"])
+            for index in indexes
+        ]
+        pages = 0
+        for query in queries:
+            _, summary, _ = driver.execute_query(query)
+            pages += profile_pages(summary.profile)
+    elapsed = time.monotonic() - started
+
+    result = {"name": base_name, "pages": pages, "indexes": len(indexes), "seconds": round(elapsed, 3)}
+    with open(get_warmup_path(base_name), "w") as f:
+        json.dump(result, f, indent=2)
+    print(f"{terminal_style.SUCCESS} Warmed up page cache of {base_name}: "
+          f"{pages} pages ({len(indexes)} indexes) in {elapsed:.1f}s")
+    return result
+
+
+def start_warmup(base_name):
+    """Warm up in a non-daemon thread: the caller continues and the process exits once it is done."""
+    thread = threading.Thread(target=warmup_page_cache, args=(base_name,), name=f"warmup-{base_name}")
+    thread.start()
+    return thread
+
+
+# ---------------------------------------------------------------------------
+# Synthetic graphs
+# ---------------------------------------------------------------------------
+
+def zipf_weights(n, exponent=1.0):
+    """Cumulative Zipf weights over n ranks, for random.choices(cum_weights=...)."""
+    return list(itertools.accumulate(1 / (rank ** exponent) for rank in range(1, n + 1)))
+
+
+def poisson(rng, mean):
+    """Knuth's method; fine for the small means used here."""
+    limit = math.exp(-mean)
+    k, p = 0, rng.random()
+    while p > limit:
+        k += 1
+        p *= rng.random()
+    return k
+
+
+class SyntheticGraph:
+    """
+    Deterministic synthetic tiddlers for load testing.
+
+    tiddler(i) depends only on the parameters and i, so any tiddler can be
+    regenerated without the others. Tag and link targets and word frequencies
+    follow Zipf distributions (a few popular tags and hub tiddlers); text length
+    is log-normal around `words`, tags and links per tiddler are Poisson.
+    """
+
+    def __init__(self, count, seed=0, tags=SEED_TAGS, tag_count=SEED_TAG_COUNT, links=SEED_LINKS,
+                 fields=SEED_FIELDS, field_size=SEED_FIELD_SIZE, words=SEED_WORDS):
+        self.count = int(count)
+        self.seed = seed
+        self.tags = float(tags)
+        self.tag_count = int(tag_count)
+        self.links = float(links)
+        self.fields = int(fields)
+        self.field_size = int(field_size)
+        self.words = int(words)
+        self.tag_weights = zipf_weights(self.tag_count)
+        self.link_weights = zipf_weights(self.count)
+        # Texts are windows into one Zipf-distributed corpus: far cheaper than drawing every word.
+        corpus_rng = random.Random(f"{seed}:corpus")
+        self.corpus = corpus_rng.choices(
+            SEED_VOCABULARY, cum_weights=zipf_weights(len(SEED_VOCABULARY)), k=21 * self.words + 4096,
+        )
+
+    def title(self, i):
+        size = len(SEED_VOCABULARY)
+        return f"{SEED_VOCABULARY[i % size].capitalize()} {SEED_VOCABULARY[(i // size) % size]} {i}"
+
+    def tag(self, rank):
+        return f"topic-{rank:04d}"
+
+    def pick(self, rng, weights, k):
+        return [bisect.bisect_left(weights, rng.random() * weights[-1]) for _ in range(k)]
+
+    def text(self, rng, i):
+        length = min(max(int(rng.lognormvariate(math.log(self.words), 0.8)), 1), 20 * self.words)
+        offset = rng.randrange(len(self.corpus) - length)
+        words = self.corpus[offset:offset + length]
+        paragraphs = [" ".join(words[start:start + 80]) for start in range(0, len(words), 80)]
+        targets = {k for k in self.pick(rng, self.link_weights, poisson(rng, self.links)) if k != i}
+        paragraphs += [f"See [[{self.title(k)}]]." for k in sorted(targets)]
+        return "\n\n".join(paragraphs)
+
+    def tiddler(self, i):
+        rng = random.Random(f"{self.seed}:{i}")
+        tags = sorted(set(self.pick(rng, self.tag_weights, min(poisson(rng, self.tags), self.tag_count))))
+        created = SEED_EPOCH + datetime.timedelta(seconds=rng.randrange(365 * 24 * 3600))
+        modified = created + datetime.timedelta(seconds=int(rng.expovariate(1 / (30 * 24 * 3600))))
+        tiddler = {
+            "title": self.title(i),
+            "text": self.text(rng, i),
+            "tags": " ".join(self.tag(rank) for rank in tags),
+            "neuro.id": str(uuid.UUID(int=rng.getrandbits(128), version=4)),
+            "created": created.strftime("%Y%m%d%H%M%S000"),
+            "modified": modified.strftime("%Y%m%d%H%M%S000"),
+        }
+        for k in range(self.fields):
+            tiddler[f"seed.field{k}"] = f"{rng.getrandbits(4 * self.field_size):0{self.field_size}x}"
+        return tiddler
+
+    def batches(self, size=SEED_BATCH):
+        """The tiddlers in lists of at most size, generated as they are consumed."""
+        for first in range(0, self.count, size):
+            yield [self.tiddler(i) for i in range(first, min(first + size, self.count))]
+
+
+def count_tiddlers(driver):
+    records, _, _ = driver.execute_query(COUNT_TIDDLERS_QUERY)
+    return records[0]["count"]
+
+
+def clear_graph(driver):
+    with driver.session() as session:
+        # CALL ... IN TRANSACTIONS needs an auto-commit transaction.
+        session.run(CLEAR_QUERY).consume()
+
+
+def write_graph(driver, graph, batch=SEED_BATCH):
+    """Stream the graph into NeuroBase with one UNWIND write per batch; returns tiddlers written."""
+    written = 0
+    for tiddlers in graph.batches(int(batch)):
+        driver.execute_query(SEED_QUERY, tiddlers=tiddlers)
+        written += len(tiddlers)
+    return written
+
+
+def get_bolt_uri(name=None):
+    """Bolt URI of a named instance (by its published port), or NEO4J_URI."""
+    if name:
+        port = get_bolt_port(name)
+        if port is None:
+            raise SystemExit(f"No Bolt port published by {name}")
+        return f"bolt://127.0.0.1:{port}"
+    return os.getenv("NEO4J_URI")
+
+
+# ---------------------------------------------------------------------------
+# Tasks
+# ---------------------------------------------------------------------------
+
 @invoke.task(pre=[setup.env])
-def create(c, name=None):
+def image(c, rebuild=False):
+    """Build the nbase image once, tagged by the hash of its Dockerfile and build args."""
+    docker_tools.verify_access()
+    ref = get_image()
+    if image_exists(ref) and not rebuild:
+        print(f"{terminal_style.SUCCESS} Image up to date: {ref}")
+        return
+
+    started = time.monotonic()
+    with terminal_style.step(f"Build {ref}"):
+        build_image(ref, no_cache=rebuild)
+    print(f"{terminal_style.SUCCESS} Built {ref} in {time.monotonic() - started:.1f}s")
+
+
+@invoke.task(pre=[setup.env])
+def create(c, name=None, instances=None):
     """Create the neurobase docker container if it doesn't exist."""
     base_name = name or os.getenv("BASE_NAME")
 
     if docker_tools.container_exists(base_name):
         return
 
+    settings = memory_settings(base_name, instances)
+    # The environment's ports belong to BASE_NAME; another instance on them would collide.
+    named = base_name != os.getenv("BASE_NAME")
+    if named:
+        settings.update(get_free_port_settings())
+    image = ensure_image()
     with terminal_style.step(f"Compose NeuroBase: {base_name}"):
-        result = subprocess.run(["docker", "compose", "up", "-d"], capture_output=True, text=True)
-        if result.returncode != 0:
-            print(result.stderr)
-            raise SystemExit(1)
+        compose_up(base_name, settings, image)
+    if named:
+        print_instance_env(base_name, settings)
+
+
+@invoke.task(pre=[setup.env])
+def tune(c, name=None, instances=None):
+    """Recompute Neo4j heap and page cache sizes and apply them to the container."""
+    base_name = name or os.getenv("BASE_NAME")
+    settings = memory_settings(base_name, instances)
+    for key, value in settings.items():
+        print(f"  {key}={value}")
+
+    if not docker_tools.container_exists(base_name):
+        print(f"{terminal_style.FAIL} NeuroBase container does not exist: {base_name}")
+        raise SystemExit(1)
+
+    settings.update(get_published_ports(base_name))
+    image = ensure_image()
+    with terminal_style.step(f"Apply memory settings: {base_name}"):
+        compose_up(base_name, settings, image)
 
 
 @invoke.task(pre=[setup.env])
-def start(c, name=None):
-    """Start the neurobase docker container and wait for Neo4j."""
+def start(c, name=None, warmup=False):
+    """Start the neurobase docker container and wait for Neo4j. --warmup preloads the page cache."""
     docker_tools.verify_access()
     base_name = name or os.getenv("BASE_NAME")
     create(c, name=base_name)
@@ -71,10 +771,104 @@ def start(c, name=None):
 
     with terminal_style.step(f"Start NeuroBase instance: {base_name}"):
         if not docker_tools.container_running(base_name):
-            subprocess.run(["docker", "start", base_name], capture_output=True)
+            subprocess.run(["docker", "start", base_name], capture_output=True, check=False)
         network_utils.wait_for_socket("127.0.0.1", bolt_port, timeout=60)
         verify_neo4j()
 
+    if warmup:
+        start_warmup(base_name)
+
+
+@invoke.task(pre=[setup.env])
+def stats(c, name=None, top=10, threshold=None, output=None):
+    """Report slowest query shapes (latency percentiles, page hits/faults) from the query log."""
+    base_name = name or os.getenv("BASE_NAME")
+
+    if threshold is not None:
+        with terminal_style.step(f"Enable query log (threshold {threshold}): {base_name}"):
+            enable_query_log(get_bolt_uri(name), threshold)
+
+    report = aggregate_queries(parse_query_log(read_query_log(base_name)))
+    if not report:
+        print(f"{terminal_style.FAIL} No queries logged for {base_name}, enable the query log with --threshold")
+        return
+
+    terminal_style.header(f"Top {min(top, len(report))} of {len(report)} query shapes: {base_name}")
+    print_query_report(report[:top])
+
+    if output:
+        with open(output, "w") as f:
+            json.dump(report, f, indent=2, sort_keys=True)
+        print(f"{terminal_style.SUCCESS} Saved report to {output}")
+
+
+@invoke.task(pre=[setup.env])
+def seed(c, name=None, count=1000, seed=0, tags=SEED_TAGS, tag_count=SEED_TAG_COUNT, links=SEED_LINKS,
+         fields=SEED_FIELDS, field_size=SEED_FIELD_SIZE, words=SEED_WORDS, batch=SEED_BATCH, clear=False):
+    """Write a deterministic synthetic tiddler graph for load testing. --clear empties the database first."""
+    logging.getLogger("neo4j").setLevel(logging.ERROR)
+    graph = SyntheticGraph(
+        count, seed=seed, tags=tags, tag_count=tag_count, links=links,
+        fields=fields, field_size=field_size, words=words,
+    )
+    auth = (os.getenv("NEO4J_USER"), os.getenv("NEO4J_PASSWORD"))
+    with neo4j.GraphDatabase.driver(get_bolt_uri(name), auth=auth) as driver:
+        if clear:
+            with terminal_style.step("Clear database"):
+                clear_graph(driver)
+        else:
+            existing = count_tiddlers(driver)
+            if existing:
+                print(f"{terminal_style.FAIL} Database already has {existing} tiddlers, use --clear")
+                raise SystemExit(1)
+        started = time.monotonic()
+        with terminal_style.step(f"Seed {graph.count} tiddlers (seed {seed})"):
+            written = write_graph(driver, graph, batch)
+        elapsed = time.monotonic() - started
+    rate = written / elapsed if elapsed else 0
+    print(f"{terminal_style.SUCCESS} Wrote {written} tiddlers in {elapsed:.1f}s ({rate:.0f}/s)")
+
+
+@invoke.task(pre=[setup.env])
+def start_all(c, jobs=4, timeout=60):
+    """Start all NeuroBase containers on this host concurrently and wait for Bolt."""
+    docker_tools.verify_access()
+    names = list_instances()
+    if not names:
+        print(f"{terminal_style.FAIL} No NeuroBase containers found")
+        return
+
+    terminal_style.header(f"Starting {len(names)} NeuroBase instances")
+    rows = run_concurrently(lambda name: start_instance(name, timeout=timeout), names, jobs)
+    print_instance_table(rows)
+    if not all(row["ready"] for row in rows):
+        raise SystemExit(1)
+
+
+@invoke.task(pre=[setup.env])
+def stop_all(c, jobs=4):
+    """Stop all NeuroBase containers on this host concurrently."""
+    names = [i["name"] for i in inspect_instances() if i["state"] == "running"]
+    if not names:
+        print(f"{terminal_style.SUCCESS} No running NeuroBase containers")
+        return
+
+    terminal_style.header(f"Stopping {len(names)} NeuroBase instances")
+    rows = run_concurrently(stop_instance, names, jobs)
+    print_instance_table(rows)
+    if any(row["state"] == "running" for row in rows):
+        raise SystemExit(1)
+
+
+@invoke.task(pre=[setup.env])
+def status(c, jobs=4):
+    """Show state and Bolt readiness of all NeuroBase containers on this host."""
+    instances = inspect_instances()
+    if not instances:
+        print(f"{terminal_style.FAIL} No NeuroBase containers found")
+        return
+    print_instance_table(run_concurrently(probe_instance, instances, jobs))
+
 
 @invoke.task(pre=[setup.env])
 def reset(c, name=None, confirmed=False):
@@ -105,7 +899,7 @@ def stop(c, name=None):
         return
 
     with terminal_style.step(f"Stop NeuroBase instance: {base_name}"):
-        subprocess.run(["docker", "stop", base_name], capture_output=True)
+        subprocess.run(["docker", "stop", base_name], capture_output=True, check=False)
 
 
 @invoke.task(pre=[setup.env])
@@ -120,6 +914,44 @@ def backup(c, name=None):
         container.clean()
 
 
+@invoke.task(pre=[setup.env])
+def clone(c, from_, to):
+    """Fork a NeuroBase: copy its data volume into a new instance on free ports."""
+    source_volume = f"{from_}-data"
+    target_volume = f"{to}-data"
+
+    if not volume_exists(source_volume):
+        print(f"{terminal_style.FAIL} NeuroBase volume not found: {source_volume}")
+        raise SystemExit(1)
+    if docker_tools.container_exists(to) or volume_exists(target_volume):
+        print(f"{terminal_style.FAIL} NeuroBase already exists: {to}")
+        raise SystemExit(1)
+
+    was_running = docker_tools.container_running(from_)
+    stop.__wrapped__(c, name=from_)
+    try:
+        size = get_store_size(from_)
+        started = time.monotonic()
+        with terminal_style.step(f"Copy {source_volume} to {target_volume}"):
+            copy_volume(source_volume, target_volume, project=to)
+        elapsed = time.monotonic() - started
+    finally:
+        if was_running:
+            with terminal_style.step(f"Restart NeuroBase instance: {from_}"):
+                subprocess.run(["docker", "start", from_], capture_output=True, check=False)
+
+    settings = memory_settings(to)
+    settings.update(get_free_port_settings())
+    image = ensure_image()
+    with terminal_style.step(f"Compose NeuroBase: {to}"):
+        compose_up(to, settings, image)
+
+    rate = size / MIB / elapsed if elapsed else 0
+    print(f"{terminal_style.SUCCESS} Cloned {from_} to {to}: "
+          f"{size / MIB:.0f} MiB in {elapsed:.1f}s ({rate:.0f} MiB/s)")
+    print_instance_env(to, settings)
+
+
 @invoke.task(pre=[setup.env])
 def delete(c, name=None):
     """Remove the neurobase container and its associated volumes."""
@@ -136,8 +968,8 @@ def delete(c, name=None):
     volumes = docker_tools.get_container_volumes(base_name)
 
     with terminal_style.step(f"Remove container: {base_name}"):
-        subprocess.run(["docker", "rm", base_name], capture_output=True)
+        subprocess.run(["docker", "rm", base_name], capture_output=True, check=False)
 
     for vol in volumes:
         with terminal_style.step(f"Remove volume: {vol}"):
-            subprocess.run(["docker", "volume", "rm", vol], capture_output=True)
+            subprocess.run(["docker", "volume", "rm", vol], capture_output=True, check=False)
@@ -3,7 +3,6 @@ import shutil
 import subprocess
 
 import invoke
-
 from neuro.utils import internal_utils, terminal_style
 
 from tasks.actions import setup
@@ -0,0 +1,208 @@
+"""
+Minimal Chrome DevTools Protocol client for the NW.js remote debugging port.
+
+Uses only the standard library: a WebSocket client just large enough for
+CDP's JSON text frames. NW.js exposes the port when started with
+--remote-debugging-port (DESKTOP_DEVTOOLS_PORT, see desktop.spawn).
+"""
+
+import base64
+import hashlib
+import json
+import os
+import socket
+import struct
+import urllib.parse
+import urllib.request
+
+TIMEOUT = 60
+WEBSOCKET_GUID = "258EAFA5-E914-47DA-95CA-C5AB0DC85B11"
+
+OP_CONTINUATION = 0x0
+OP_TEXT = 0x1
+OP_CLOSE = 0x8
+OP_PING = 0x9
+OP_PONG = 0xA
+
+
+class DevToolsError(Exception):
+    pass
+
+
+def list_targets(port, timeout=5):
+    with urllib.request.urlopen(f"http://127.0.0.1:{port}/json/list", timeout=timeout) as response:
+        return json.loads(response.read())
+
+
+def page_url(port):
+    """WebSocket URL of the first page target: the wiki window of NeuroDesktop."""
+    try:
+        targets = list_targets(port)
+    except (OSError, ValueError) as e:
+        raise DevToolsError(f"No DevTools endpoint on port {port}: {e}")
+    for target in targets:
+        if target.get("type") == "page" and target.get("webSocketDebuggerUrl"):
+            return target["webSocketDebuggerUrl"]
+    raise DevToolsError(f"No page target on port {port}")
+
+
+class Session:
+    """One CDP connection. call() sends a command and returns its result; events go to on_event."""
+
+    def __init__(self, url, timeout=TIMEOUT):
+        parsed = urllib.parse.urlsplit(url)
+        self.sock = socket.create_connection((parsed.hostname, parsed.port or 80), timeout=timeout)
+        self.buffer = b""
+        self.next_id = 0
+        self.handshake(parsed.netloc, parsed.path or "/")
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def handshake(self, host, path):
+        key = base64.b64encode(os.urandom(16)).decode()
+        request = (
+            f"GET {path} HTTP/1.1\r\n"
+            f"Host: {host}\r\n"
+            "Upgrade: websocket\r\n"
+            "Connection: Upgrade\r\n"
+            f"Sec-WebSocket-Key: {key}\r\n"
+            "Sec-WebSocket-Version: 13\r\n\r\n"
+        )
+        self.sock.sendall(request.encode())
+        while b"\r\n\r\n" not in self.buffer:
+            self.fill()
+        head, self.buffer = self.buffer.split(b"\r\n\r\n", 1)
+        lines = head.decode("latin-1").split("\r\n")
+        if lines[0].split()[1:2] != ["101"]:
+            raise DevToolsError(f"WebSocket upgrade refused: {lines[0]}")
+        accept = base64.b64encode(hashlib.sha1((key + WEBSOCKET_GUID).encode()).digest()).decode()
+        headers = dict(line.split(": ", 1) for line in lines[1:] if ": " in line)
+        if {k.lower(): v for k, v in headers.items()}.get("sec-websocket-accept") != accept:
+            raise DevToolsError("WebSocket upgrade with a wrong Sec-WebSocket-Accept")
+
+    def fill(self):
+        data = self.sock.recv(65536)
+        if not data:
+            raise DevToolsError("DevTools connection closed")
+        self.buffer += data
+
+    def read_exact(self, size):
+        while len(self.buffer) < size:
+            self.fill()
+        data, self.buffer = self.buffer[:size], self.buffer[size:]
+        return data
+
+    def send_frame(self, opcode, payload):
+        # Client frames are always masked (RFC 6455 5.3).
+        header = bytes([0x80 | opcode])
+        if len(payload) < 126:
+            header += bytes([0x80 | len(payload)])
+        elif len(payload) < 1 << 16:
+            header += bytes([0x80 | 126]) + struct.pack("!H", len(payload))
+        else:
+            header += bytes([0x80 | 127]) + struct.pack("!Q", len(payload))
+        mask = os.urandom(4)
+        masked = bytes(b ^ mask[i % 4] for i, b in enumerate(payload))
+        self.sock.sendall(header + mask + masked)
+
+    def read_frame(self):
+        first, second = self.read_exact(2)
+        length = second & 0x7F
+        if length == 126:
+            length = struct.unpack("!H", self.read_exact(2))[0]
+        elif length == 127:
+            length = struct.unpack("!Q", self.read_exact(8))[0]
+        mask = self.read_exact(4) if second & 0x80 else None
+        payload = self.read_exact(length)
+        if mask:
+            payload = bytes(b ^ mask[i % 4] for i, b in enumerate(payload))
+        return first & 0x80, first & 0x0F, payload
+
+    def recv(self):
+        """Next JSON message, reassembling fragments and answering pings."""
+        message = b""
+        while True:
+            fin, opcode, payload = self.read_frame()
+            if opcode == OP_PING:
+                self.send_frame(OP_PONG, payload)
+            elif opcode == OP_CLOSE:
+                raise DevToolsError("DevTools connection closed")
+            elif opcode in (OP_TEXT, OP_CONTINUATION):
+                message += payload
+                if fin:
+                    return json.loads(message)
+
+    def send(self, method, **params):
+        self.next_id += 1
+        self.send_frame(OP_TEXT, json.dumps({"id": self.next_id, "method": method, "params": params}).encode())
+        return self.next_id
+
+    def call(self, method, on_event=None, **params):
+        request_id = self.send(method, **params)
+        while True:
+            message = self.recv()
+            if message.get("id") == request_id:
+                if "error" in message:
+                    raise DevToolsError(f"{method}: {message['error'].get('message')}")
+                return message.get("result", {})
+            if on_event and "method" in message:
+                on_event(message["method"], message.get("params", {}))
+
+    def close(self):
+        try:
+            self.send_frame(OP_CLOSE, b"")
+        except OSError:
+            pass
+        self.sock.close()
+
+
+def evaluate(port, expression, timeout=TIMEOUT):
+    """Value of a JavaScript expression evaluated in the desktop page."""
+    with Session(page_url(port), timeout=timeout) as session:
+        result = session.call("Runtime.evaluate", expression=expression, returnByValue=True)
+    if "exceptionDetails" in result:
+        raise DevToolsError(f"Evaluation failed: {result['exceptionDetails'].get('text')}")
+    return result.get("result", {}).get("value")
+
+
+def take_heap_snapshot(port, path, timeout=TIMEOUT):
+    """Write a V8 heap snapshot of the desktop page to path; returns its size in bytes."""
+    with Session(page_url(port), timeout=timeout) as session, open(path, "w") as f:
+        def on_event(method, params):
+            if method == "HeapProfiler.addHeapSnapshotChunk":
+                f.write(params["chunk"])
+
+        session.call("HeapProfiler.enable")
+        session.call("HeapProfiler.collectGarbage")
+        session.call("HeapProfiler.takeHeapSnapshot", on_event=on_event, reportProgress=False)
+    return os.path.getsize(path)
+
+
+def heap_type_sizes(path):
+    """Count and shallow size per object type of a .heapsnapshot: {type: [count, bytes]}.
+
+    Objects are grouped by constructor name, everything else by node type
+    ("(string)", "(closure)", ...), like the DevTools summary view.
+    """
+    with open(path) as f:
+        snapshot = json.load(f)
+    meta = snapshot["snapshot"]["meta"]
+    fields = meta["node_fields"]
+    node_types = meta["node_types"][0]
+    width = len(fields)
+    type_at, name_at, size_at = fields.index("type"), fields.index("name"), fields.index("self_size")
+    strings = snapshot["strings"]
+    nodes = snapshot["nodes"]
+
+    sizes = {}
+    for i in range(0, len(nodes), width):
+        kind = node_types[nodes[i + type_at]]
+        name = strings[nodes[i + name_at]] if kind == "object" else f"({kind})"
+        entry = sizes.setdefault(name, [0, 0])
+        entry[0] += 1
+        entry[1] += nodes[i + size_at]
+    return sizes
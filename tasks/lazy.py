@@ -0,0 +1,157 @@
+"""
+Lazily loaded task collections.
+
+Task metadata (names, signatures, docstrings, decorator options) is read from
+the module source with ast, so `invoke --list` and argument parsing work
+without importing the modules. A module, and with it neo4j and neuro, is
+imported only when one of its tasks runs. A module whose task defaults or
+options are not literals is imported right away instead.
+"""
+
+import ast
+import importlib
+import importlib.util
+import inspect
+import logging
+
+import invoke
+
+logger = logging.getLogger(__name__)
+TASK_OPTIONS = ("name", "aliases", "positional", "optional", "iterable", "incrementable", "help", "default")
+
+
+class LazyTask(invoke.Task):
+    """Stand-in for a task defined in a module that has not been imported yet."""
+
+    def __init__(self, module_name, attr, signature, doc, **options):
+        self.module_name = module_name
+        self.attr = attr
+        self.signature = signature
+
+        def body(c, *args, **kwargs):
+            return self.load().body(c, *args, **kwargs)
+
+        body.__name__ = attr
+        body.__doc__ = doc
+        body.__module__ = module_name
+        super().__init__(body, **options)
+
+    def load(self):
+        return getattr(importlib.import_module(self.module_name), self.attr)
+
+    def argspec(self, body):
+        return self.signature
+
+    # Pre- and post-tasks are only needed once the executor expands a call.
+    @property
+    def pre(self):
+        return self.load().pre
+
+    @pre.setter
+    def pre(self, value):
+        pass
+
+    @property
+    def post(self):
+        return self.load().post
+
+    @post.setter
+    def post(self, value):
+        pass
+
+    def __eq__(self, other):
+        if isinstance(other, LazyTask):
+            return (self.module_name, self.attr) == (other.module_name, other.attr)
+        return isinstance(other, invoke.Task) and self.load() == other
+
+    def __hash__(self):
+        return hash((self.module_name, self.attr))
+
+
+def _is_task_decorator(node):
+    if isinstance(node, ast.Call):
+        node = node.func
+    return (
+        isinstance(node, ast.Attribute) and node.attr == "task"
+        and isinstance(node.value, ast.Name) and node.value.id == "invoke"
+    )
+
+
+def _constants(tree):
+    """Module-level NAME = <literal> assignments, so defaults like timeout=READY_TIMEOUT resolve."""
+    constants = {}
+    for node in tree.body:
+        if isinstance(node, ast.Assign) and len(node.targets) == 1 and isinstance(node.targets[0], ast.Name):
+            try:
+                constants[node.targets[0].id] = ast.literal_eval(node.value)
+            except ValueError:
+                pass
+    return constants
+
+
+def _literal(node, constants):
+    if node is None:
+        return inspect.Parameter.empty
+    if isinstance(node, ast.Name) and node.id in constants:
+        return constants[node.id]
+    try:
+        return ast.literal_eval(node)
+    except ValueError:
+        raise ValueError(f"{ast.unparse(node)} is not a literal") from None
+
+
+def _signature(function, constants):
+    args = function.args
+    params = args.posonlyargs + args.args
+    defaults = [None] * (len(params) - len(args.defaults)) + list(args.defaults)
+    parameters = [
+        inspect.Parameter(arg.arg, inspect.Parameter.POSITIONAL_OR_KEYWORD, default=_literal(default, constants))
+        for arg, default in zip(params[1:], defaults[1:])
+    ]
+    parameters += [
+        inspect.Parameter(arg.arg, inspect.Parameter.KEYWORD_ONLY, default=_literal(default, constants))
+        for arg, default in zip(args.kwonlyargs, args.kw_defaults)
+    ]
+    return inspect.Signature(parameters)
+
+
+def discover_tasks(module_name):
+    """
+    LazyTasks for every @invoke.task function in a module, without importing it.
+
+    If a default or decorator option cannot be evaluated from the source, the
+    module is imported and its real tasks are returned.
+    """
+    spec = importlib.util.find_spec(module_name)
+    with open(spec.origin) as f:
+        tree = ast.parse(f.read(), filename=spec.origin)
+
+    constants = _constants(tree)
+    tasks = []
+    for node in tree.body:
+        if not isinstance(node, ast.FunctionDef):
+            continue
+        decorators = [d for d in node.decorator_list if _is_task_decorator(d)]
+        if not decorators:
+            continue
+        try:
+            options = {}
+            if isinstance(decorators[0], ast.Call):
+                for keyword in decorators[0].keywords:
+                    if keyword.arg in TASK_OPTIONS:
+                        options[keyword.arg] = _literal(keyword.value, constants)
+            signature = _signature(node, constants)
+        except ValueError as e:
+            logger.warning("Importing %s eagerly: task %s: %s", module_name, node.name, e)
+            collection = invoke.Collection.from_module(importlib.import_module(module_name))
+            return list(collection.tasks.values())
+        tasks.append(LazyTask(module_name, node.name, signature, ast.get_docstring(node), **options))
+    return tasks
+
+
+def lazy_collection(module_name):
+    """Collection named after the module's last component, like Collection.from_module."""
+    collection = invoke.Collection(module_name.rsplit(".", 1)[-1])
+    for task in discover_tasks(module_name):
+        collection.add_task(task)
+    return collection
@@ -0,0 +1,20 @@
+"""
+Per-user state and cache locations.
+
+System-mode installs set NF_STATE and NF_CACHE (see setup.init); a development
+checkout keeps both under NF_DIR.
+"""
+
+import os
+
+from neuro.utils import internal_utils
+
+
+def get_state_dir(*parts):
+    """Path under $NF_STATE, or under NF_DIR if it is not set."""
+    return os.path.join(os.environ.get("NF_STATE") or internal_utils.get_path("nf"), *parts)
+
+
+def get_cache_dir(*parts):
+    """Path under $NF_CACHE, or under NF_DIR if it is not set."""
+    return os.path.join(os.environ.get("NF_CACHE") or internal_utils.get_path("nf"), *parts)
@@ -0,0 +1,109 @@
+"""
+Lightweight neuro:// protocol handler.
+
+Forwards deep links to the resident daemon (desktop.protocol-daemon) over a
+Unix socket. Uses only the standard library and is meant to be run by path,
+so that a click does not pay for importing invoke, neo4j or neuro:
+
+    python3 tasks/protocol.py neuro://<uuid>
+
+Falls back to desktop.register_protocol when the daemon is not running.
+
+Each ENVIRONMENT and PORT has its own daemon and socket. A click outside
+invoke takes them from the app's .env unless they are set, so a handler for
+another instance is registered as e.g. `env ENVIRONMENT=TESTING PORT=8069
+python3 tasks/protocol.py %u`.
+"""
+
+import json
+import os
+import socket
+import subprocess
+import sys
+
+TIMEOUT = 5
+APP_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SOCKET_KEYS = ("ENVIRONMENT", "PORT")
+FALLBACK = (
+    "import sys; "
+    "from neuro.utils import config; config.main(); "
+    "from tasks.components import desktop; "
+    "[desktop.register_protocol(url) for url in sys.argv[1:]]"
+)
+
+
+def read_dotenv(path, keys):
+    """Values of keys from a dotenv file, without expansion; {} if it is missing."""
+    values = {}
+    try:
+        with open(path) as f:
+            for line in f:
+                key, sep, value = line.strip().partition("=")
+                if sep and key in keys:
+                    values[key] = value.strip().strip("\"'")
+    except OSError:
+        pass
+    return values
+
+
+def get_socket_path():
+    """Socket of the daemon for this ENVIRONMENT and PORT."""
+    settings = read_dotenv(os.path.join(APP_DIR, ".env"), SOCKET_KEYS)
+    settings.update({key: os.environ[key] for key in SOCKET_KEYS if os.environ.get(key)})
+    environment = settings.get("ENVIRONMENT", "DEVELOP").lower()
+    port = settings.get("PORT", "")
+    runtime_dir = os.environ.get("XDG_RUNTIME_DIR") or "/tmp"
+    return os.path.join(runtime_dir, f"neuroforest-protocol-{os.getuid()}-{environment}-{port}.sock")
+
+
+def request(message, timeout=TIMEOUT):
+    """Send one request line to the daemon and return its decoded JSON response."""
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+        sock.settimeout(timeout)
+        sock.connect(get_socket_path())
+        sock.sendall(message.encode() + b"\n")
+        with sock.makefile("rb") as f:
+            return json.loads(f.readline())
+
+
+def ping():
+    try:
+        return request("ping", timeout=1).get("status") == "ok"
+    except (OSError, ValueError):
+        return False
+
+
+def invalidate(uuid=None):
+    """Drop one (or every) cached neuro.id from the daemon, e.g. after a tiddler change."""
+    message = f"invalidate {uuid}" if uuid else "invalidate"
+    try:
+        return request(message, timeout=1).get("status") == "ok"
+    except (OSError, ValueError):
+        return False
+
+
+def shutdown():
+    """Stop the daemon; False if none was answering."""
+    try:
+        return request("shutdown", timeout=1).get("status") == "ok"
+    except (OSError, ValueError):
+        return False
+
+
+def main(urls):
+    try:
+        responses = [request(url.removeprefix("neuro://")) for url in urls]
+    except (OSError, ValueError):
+        # No daemon, or it closed the connection without an answer (a failed handler).
+        return subprocess.run([sys.executable, "-c", FALLBACK, *urls], cwd=APP_DIR, check=False).returncode
+
+    for url, response in zip(urls, responses):
+        if response["status"] == "not running":
+            print("NeuroDesktop not running")
+        elif response["status"] == "not found":
+            print(f"Not found: {url.removeprefix('neuro://')}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,191 @@
+"""
+Micro-benchmarks for pytest.
+
+    pytest -p nf_bench --bench-history PATH [--bench-tolerance 0.25] [--bench-save]
+
+Tests time a callable through the `bench` fixture (tests/bench/conftest.py):
+it runs once to warm up, then for a number of timed rounds, then once more
+under tracemalloc for its peak allocation. Each benchmark's median time and
+peak allocation are compared with the median of the last HISTORY_WINDOW runs
+in the history file. Exceeding that by more than the tolerance fails the
+session. A run is appended to the history only when all its benchmarks pass,
+or with --bench-save, which accepts the new numbers.
+
+Uses only the standard library and pytest's hook names (no pytest import), so
+the tasks can import it for bench_args() without pytest installed.
+"""
+
+import json
+import os
+import statistics
+import time
+import tracemalloc
+
+VERSION = 1
+ROUNDS = 20
+TOLERANCE = 0.25
+HISTORY_WINDOW = 5
+HISTORY_SIZE = 200
+METRICS = ("median", "alloc_peak")
+TESTS_FAILED = 1
+
+
+def bench_args(path, tolerance=TOLERANCE, save=False):
+    """Arguments enabling the plugin with the history file at path."""
+    # With "--opt=value" pytest does not take the history path for a test path when choosing the rootdir.
+    args = ["-p", "nf_bench", f"--bench-history={os.path.abspath(path)}", f"--bench-tolerance={tolerance}"]
+    return args + ["--bench-save"] if save else args
+
+
+def measure(func, rounds=ROUNDS, setup=None):
+    """Time func over rounds (after one warm-up call) and trace its peak allocation: (stats, result).
+
+    setup, if given, runs untimed before every call, e.g. to reset a directory.
+    """
+    if setup:
+        setup()
+    result = func()
+    times = []
+    for _ in range(rounds):
+        if setup:
+            setup()
+        started = time.perf_counter_ns()
+        result = func()
+        times.append(time.perf_counter_ns() - started)
+
+    if setup:
+        setup()
+    tracing = tracemalloc.is_tracing()
+    if not tracing:
+        tracemalloc.start()
+    tracemalloc.reset_peak()
+    before = tracemalloc.get_traced_memory()[0]
+    func()
+    peak = tracemalloc.get_traced_memory()[1] - before
+    if not tracing:
+        tracemalloc.stop()
+
+    seconds = [t / 1e9 for t in times]
+    return {
+        "rounds": rounds,
+        "min": min(seconds),
+        "median": statistics.median(seconds),
+        "mean": statistics.fmean(seconds),
+        "stdev": statistics.stdev(seconds) if len(seconds) > 1 else 0.0,
+        "alloc_peak": peak,
+    }, result
+
+
+def get_baseline(history, window=HISTORY_WINDOW):
+    """Per benchmark, the median of each metric over the last window runs that include it."""
+    baseline = {}
+    for name in {name for run in history for name in run["results"]}:
+        runs = [run["results"][name] for run in history if name in run["results"]][-window:]
+        baseline[name] = {metric: statistics.median(stats[metric] for stats in runs) for metric in METRICS}
+    return baseline
+
+
+def compare(results, baseline, tolerance=TOLERANCE):
+    """Rows per benchmark with the change of each metric against the baseline; higher is worse."""
+    rows = []
+    for name, stats in sorted(results.items()):
+        row = {"name": name, "stats": stats, "changes": {}, "regressed": []}
+        for metric in METRICS:
+            before = baseline.get(name, {}).get(metric)
+            if not before:
+                continue
+            change = stats[metric] / before - 1
+            row["changes"][metric] = change
+            if change > tolerance:
+                row["regressed"].append(metric)
+        rows.append(row)
+    return rows
+
+
+def format_change(change):
+    return f"{change:+.0%}" if change is not None else "new"
+
+
+class BenchPlugin:
+    def __init__(self, path, tolerance=TOLERANCE, save=False):
+        self.path = path
+        self.tolerance = tolerance
+        self.save = save
+        self.history = self.load()
+        self.results = {}
+        self.rows = []
+
+    def load(self):
+        try:
+            with open(self.path) as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return []
+        if data.get("version") != VERSION:
+            return []
+        return data["runs"]
+
+    def write(self):
+        runs = self.history + [{"time": time.strftime("%Y-%m-%dT%H:%M:%S"), "results": self.results}]
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, "w") as f:
+            json.dump({"version": VERSION, "runs": runs[-HISTORY_SIZE:]}, f)
+        os.replace(tmp_path, self.path)
+
+    def runner(self, name):
+        """The bench fixture: bench(func, *args, rounds=ROUNDS, setup=None, **kwargs) returns func's result."""
+        def bench(func, *args, rounds=ROUNDS, setup=None, **kwargs):
+            stats, result = measure(lambda: func(*args, **kwargs), rounds=rounds, setup=setup)
+            self.results[name] = stats
+            return result
+        return bench
+
+    def pytest_report_header(self, config):
+        return f"bench: {self.path} (tolerance {self.tolerance:.0%}, {len(self.history)} runs)"
+
+    def pytest_sessionfinish(self, session, exitstatus):
+        self.rows = compare(self.results, get_baseline(self.history), self.tolerance)
+        regressed = any(row["regressed"] for row in self.rows)
+        if regressed and not self.save:
+            session.exitstatus = TESTS_FAILED
+        elif exitstatus == 0 and self.results:
+            self.write()
+
+    def pytest_terminal_summary(self, terminalreporter):
+        if not self.rows:
+            return
+        terminalreporter.section("benchmarks")
+        terminalreporter.write_line(f"{'Benchmark':<44} {'Median':>10} {'Change':>7} {'Peak alloc':>12} {'Change':>7}")
+        for row in self.rows:
+            stats, changes = row["stats"], row["changes"]
+            mark = "REGRESSED " + ",".join(row["regressed"]) if row["regressed"] else ""
+            name = row["name"].rsplit("::", 1)[-1]
+            terminalreporter.write_line(
+                f"{name:<44} {stats['median'] * 1000:>8.2f}ms {format_change(changes.get('median')):>7} "
+                f"{stats['alloc_peak'] / 1024:>9.1f}KiB {format_change(changes.get('alloc_peak')):>7} {mark}"
+            )
+        regressed = [row["name"] for row in self.rows if row["regressed"]]
+        if regressed and self.save:
+            terminalreporter.write_line(f"bench: {len(regressed)} regressions accepted (--bench-save)")
+        elif regressed:
+            terminalreporter.write_line(
+                f"bench: {len(regressed)} regressions beyond {self.tolerance:.0%}, history not updated"
+            )
+
+
+def pytest_addoption(parser):
+    group = parser.getgroup("nf_bench")
+    group.addoption("--bench-history", default=None, help="Benchmark history file; enables the bench fixture.")
+    group.addoption(
+        "--bench-tolerance", type=float, default=TOLERANCE,
+        help="Allowed slowdown or allocation growth over the recent median before failing (default 0.25).",
+    )
+    group.addoption("--bench-save", action="store_true", help="Record this run even if it regressed.")
+
+
+def pytest_configure(config):
+    path = config.getoption("bench_history")
+    if path:
+        plugin = BenchPlugin(path, config.getoption("bench_tolerance"), config.getoption("bench_save"))
+        config.pluginmanager.register(plugin, "nf_bench_plugin")
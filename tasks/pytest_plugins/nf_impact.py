@@ -0,0 +1,322 @@
+"""
+Test impact analysis for pytest.
+
+    pytest -p nf_impact --impact-map PATH
+
+Records which files each test executes (its own module, conftests, the code
+under test, installed packages) together with their content hashes. Tracing
+only sees functions that run, so each test also depends on the project modules
+it imports: those named by the import statements of its executed modules
+(and of the modules of functions and classes they hold), transitively, and
+those first imported during the test. Edits to module-level constants or import-time code
+therefore reselect their tests. On the next run, tests whose files are
+unchanged since the last green run are deselected; new tests always run. The
+map is only written after a green run.
+
+Only Python calls are traced, so data a test reads (bundled TW5 plugins, JSON
+and tid fixtures) is declared with --impact-global: every file under those
+paths, except Python sources, is hashed, and any change, addition or removal
+runs every test. So do a missing map and a changed ini file.
+
+Uses only the standard library and pytest's hook names (no pytest import), so
+the tasks can import it for impact_args() without pytest installed.
+"""
+
+import ast
+import hashlib
+import importlib.util
+import json
+import os
+import sys
+import sysconfig
+import threading
+import types
+
+VERSION = 3
+PLUGIN_DIR = os.path.dirname(os.path.abspath(__file__))
+MONITORING_TOOL = 4  # sys.monitoring tool ids 3 and 4 are free; 1 is used by coverage
+NO_TESTS_COLLECTED = 5
+EXCLUDED_PACKAGES = ("_pytest", "pytest", "pluggy")
+
+
+def impact_args(path, global_paths=()):
+    """Arguments enabling the plugin with the map at path and global dependencies."""
+    # With "--opt=value" pytest does not take an existing map for a test path when choosing the rootdir.
+    args = ["-p", "nf_impact", f"--impact-map={os.path.abspath(path)}"]
+    return args + [f"--impact-global={path}" for path in global_paths]
+
+
+def impact_env():
+    """Environment for a pytest subprocess that can import the plugin."""
+    path = os.environ.get("PYTHONPATH")
+    return {**os.environ, "PYTHONPATH": PLUGIN_DIR + (os.pathsep + path if path else "")}
+
+
+def fingerprint(path, previous=None):
+    """[mtime_ns, size, sha256] of a file, reusing previous when mtime and size match. None if missing."""
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    if previous and previous[:2] == [st.st_mtime_ns, st.st_size]:
+        return previous
+    with open(path, "rb") as f:
+        return [st.st_mtime_ns, st.st_size, hashlib.sha256(f.read()).hexdigest()]
+
+
+def walk_files(paths):
+    """Absolute paths of the files at or under paths, skipping Python sources and caches."""
+    files = set()
+    for path in map(os.path.abspath, paths):
+        if os.path.isfile(path):
+            files.add(path)
+        for root, dirs, names in os.walk(path):
+            dirs[:] = [name for name in dirs if name != "__pycache__"]
+            files.update(os.path.join(root, name) for name in names if not name.endswith((".py", ".pyc")))
+    return files
+
+
+def changed_files(files):
+    """Paths whose content differs from their recorded fingerprint (or that are gone)."""
+    changed = set()
+    for path, previous in files.items():
+        current = fingerprint(path, previous)
+        if current is None or current[2] != previous[2]:
+            changed.add(path)
+    return changed
+
+
+class FileTracer:
+    """Collects the source files of Python functions called between start() and stop()."""
+
+    def __init__(self, roots, excluded=()):
+        self.roots = tuple(os.path.join(root, "") for root in roots)
+        self.excluded = tuple(os.path.join(path, "") for path in excluded)
+        self.files = set()
+        self.monitoring = hasattr(sys, "monitoring")
+        if self.monitoring:
+            try:
+                sys.monitoring.use_tool_id(MONITORING_TOOL, "nf_impact")
+            except ValueError:
+                self.monitoring = False
+            else:
+                sys.monitoring.register_callback(
+                    MONITORING_TOOL, sys.monitoring.events.PY_START, self._on_start
+                )
+
+    def _on_start(self, code, offset):
+        self.files.add(code.co_filename)
+        return sys.monitoring.DISABLE
+
+    def _on_call(self, frame, event, arg):
+        if event == "call":
+            self.files.add(frame.f_code.co_filename)
+
+    def start(self):
+        self.files = set()
+        if self.monitoring:
+            sys.monitoring.set_events(MONITORING_TOOL, sys.monitoring.events.PY_START)
+            sys.monitoring.restart_events()
+        else:
+            threading.setprofile(self._on_call)
+            sys.setprofile(self._on_call)
+
+    def stop(self):
+        if self.monitoring:
+            sys.monitoring.set_events(MONITORING_TOOL, 0)
+        else:
+            sys.setprofile(None)
+            threading.setprofile(None)
+        return sorted(
+            path for path in self.files
+            if path.startswith(self.roots) and not path.startswith(self.excluded)
+        )
+
+
+class ModuleGraph:
+    """Source files of the project modules reachable from a set of modules through their globals."""
+
+    def __init__(self, roots, excluded=()):
+        self.roots = tuple(os.path.join(root, "") for root in roots)
+        self.excluded = tuple(os.path.join(path, "") for path in excluded)
+        self.references = {}
+
+    def source(self, module):
+        path = getattr(module, "__file__", None)
+        if not isinstance(path, str) or not path.endswith(".py"):
+            return None
+        path = os.path.abspath(path)
+        if path.startswith(self.roots) and not path.startswith(self.excluded):
+            return path
+        return None
+
+    @staticmethod
+    def imports(module, path):
+        """Names of the modules imported by module's source, including `from package import submodule`."""
+        try:
+            with open(path, "rb") as f:
+                tree = ast.parse(f.read(), path)
+        except (OSError, SyntaxError, ValueError):
+            return set()
+        package = module.__package__ or ""
+        names = set()
+        for node in ast.walk(tree):
+            if isinstance(node, ast.Import):
+                names.update(alias.name for alias in node.names)
+            elif isinstance(node, ast.ImportFrom):
+                try:
+                    base = importlib.util.resolve_name("." * node.level + (node.module or ""), package)
+                except (ImportError, ValueError):
+                    continue
+                names.add(base)
+                names.update(f"{base}.{alias.name}" for alias in node.names)
+        return names
+
+    def referenced(self, module):
+        """Project modules module imports or takes functions and classes from, computed once per module."""
+        name = module.__name__
+        if name not in self.references:
+            names = self.imports(module, self.source(module))
+            # Submodules set on a package as attributes are not followed: importing one does not import its siblings.
+            for value in list(vars(module).values()):
+                if isinstance(value, (type, types.FunctionType)):
+                    names.add(value.__module__)
+            modules = {sys.modules[n] for n in names if isinstance(n, str) and n in sys.modules}
+            self.references[name] = [m.__name__ for m in modules if m is not module and self.source(m)]
+        return self.references[name]
+
+    def files(self, modules):
+        pending = [module for module in modules if self.source(module)]
+        seen = {module.__name__ for module in pending}
+        files = set()
+        while pending:
+            module = pending.pop()
+            files.add(self.source(module))
+            for name in self.referenced(module):
+                if name not in seen and name in sys.modules:
+                    seen.add(name)
+                    pending.append(sys.modules[name])
+        return files
+
+
+class ImpactPlugin:
+    def __init__(self, config, path):
+        self.config = config
+        self.path = path
+        self.tests, self.files, self.globals = self.load()
+        paths = sysconfig.get_paths()
+        excluded = {PLUGIN_DIR} | {
+            os.path.dirname(sys.modules[name].__file__) for name in EXCLUDED_PACKAGES if name in sys.modules
+        }
+        self.tracer = FileTracer({str(config.rootpath), paths["purelib"], paths["platlib"]}, excluded)
+        self.graph = ModuleGraph([str(config.rootpath)], excluded)
+        self.modules_before = set()
+        self.collected = set()
+        self.affected = set()
+        self.passed = set()
+        self.failed = False
+        self.summary = "no impact map, running all tests"
+
+    def load(self):
+        try:
+            with open(self.path) as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return {}, {}, []
+        if data.get("version") != VERSION:
+            return {}, {}, []
+        return data["tests"], data["files"], data["globals"]
+
+    def save(self):
+        pending = self.affected - self.passed
+        stale = {path for nodeid in pending for path in self.tests.get(nodeid, [])}
+        tests = {nodeid: files for nodeid, files in self.tests.items() if nodeid in self.collected}
+        global_files = self.global_files()
+        files = {}
+        for path in sorted({path for paths in tests.values() for path in paths} | global_files):
+            previous = self.files.get(path)
+            current = previous if path in stale else fingerprint(path, previous)
+            if current is not None:
+                files[path] = current
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, "w") as f:
+            json.dump({"version": VERSION, "tests": tests, "files": files, "globals": sorted(global_files)}, f)
+        os.replace(tmp_path, self.path)
+
+    def global_files(self):
+        """Files whose change runs every test: the ini file and the --impact-global trees."""
+        inipath = getattr(self.config, "inipath", None)
+        files = walk_files(self.config.getoption("impact_global") or [])
+        return files | ({str(inipath)} if inipath else set())
+
+    def pytest_collection_modifyitems(self, session, config, items):
+        self.collected = {item.nodeid for item in items}
+        if not self.tests:
+            self.affected = set(self.collected)
+            return
+        changed = changed_files(self.files)
+        if changed & set(self.globals) or self.global_files() != set(self.globals):
+            self.affected = set(self.collected)
+            self.summary = "ini file or global dependencies changed, running all tests"
+            return
+
+        selected, deselected = [], []
+        for item in items:
+            files = self.tests.get(item.nodeid)
+            if files is None or changed.intersection(files):
+                selected.append(item)
+            else:
+                deselected.append(item)
+        self.affected = {item.nodeid for item in selected}
+        self.summary = f"{len(changed)} changed files, {len(selected)} of {len(items)} tests affected"
+        if deselected:
+            config.hook.pytest_deselected(items=deselected)
+            items[:] = selected
+
+    def pytest_runtest_logstart(self, nodeid, location):
+        self.modules_before = set(sys.modules)
+        self.tracer.start()
+
+    def pytest_runtest_logfinish(self, nodeid, location):
+        traced = self.tracer.stop()
+        modules = {
+            os.path.abspath(module.__file__): module for module in list(sys.modules.values())
+            if isinstance(getattr(module, "__file__", None), str)
+        }
+        imported = [sys.modules[name] for name in set(sys.modules) - self.modules_before if name in sys.modules]
+        roots = [modules[path] for path in traced if path in modules] + imported
+        self.tests[nodeid] = sorted(set(traced) | self.graph.files(roots))
+
+    def pytest_runtest_logreport(self, report):
+        if report.failed:
+            self.failed = True
+        elif report.when == "call" and report.passed:
+            self.passed.add(report.nodeid)
+
+    def pytest_report_header(self, config):
+        return f"impact: {self.path}"
+
+    def pytest_terminal_summary(self, terminalreporter):
+        terminalreporter.write_line(f"impact: {self.summary}")
+
+    def pytest_sessionfinish(self, session, exitstatus):
+        if not self.failed and exitstatus in (0, NO_TESTS_COLLECTED):
+            self.save()
+
+
+def pytest_addoption(parser):
+    parser.addoption(
+        "--impact-map", default=None,
+        help="Record per-test file maps and run only tests affected by changes since the last green run."
+    )
+    parser.addoption(
+        "--impact-global", action="append", default=[],
+        help="File or directory of non-Python test inputs; any change in it runs every test (repeatable)."
+    )
+
+
+def pytest_configure(config):
+    path = config.getoption("impact_map")
+    if path:
+        config.pluginmanager.register(ImpactPlugin(config, path), "nf_impact_plugin")
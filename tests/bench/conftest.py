@@ -0,0 +1,61 @@
+"""
+Fixtures for the micro-benchmarks (invoke app.bench).
+
+The bench fixture comes from the nf_bench plugin; without it (a plain
+`pytest tests/`) every benchmark is skipped before its fixture trees are built.
+"""
+
+import json
+
+import pytest
+
+SIZES = [10, 100, 1000]
+AUTHORS = 10
+TIDDLERS_PER_PLUGIN = 3
+
+
+def write_plugin(path, title, index, plugin_type="plugin"):
+    path.mkdir(parents=True)
+    info = {"title": title, "description": f"Benchmark plugin {index}", "plugin-type": plugin_type}
+    (path / "plugin.info").write_text(json.dumps(info))
+    for n in range(TIDDLERS_PER_PLUGIN):
+        (path / f"tiddler{n}.tid").write_text(f"title: {title}/tiddler{n}\n\n" + "text " * 200)
+
+
+def write_edition(path, index):
+    path.mkdir(parents=True)
+    info = {"description": f"Edition {index}", "plugins": [], "themes": [], "build": {}}
+    (path / "tiddlywiki.info").write_text(json.dumps(info))
+    (path / "tiddlers").mkdir()
+    (path / "tiddlers" / "Start.tid").write_text(f"title: Start\n\nEdition {index}\n")
+
+
+@pytest.fixture(scope="session")
+def bench_plugin(request):
+    plugin = request.config.pluginmanager.get_plugin("nf_bench_plugin")
+    if plugin is None:
+        pytest.skip("benchmarks run with -p nf_bench (invoke app.bench)")
+    return plugin
+
+
+@pytest.fixture
+def bench(bench_plugin, request):
+    """bench(func, *args, rounds=..., setup=None, **kwargs): time func and record it under this test."""
+    # Not the nodeid, which depends on the rootdir pytest picked.
+    return bench_plugin.runner(f"{request.node.module.__name__}::{request.node.name}")
+
+
+@pytest.fixture(scope="session")
+def nf_trees(bench_plugin, tmp_path_factory):
+    """An nf directory per size with that many tw5 plugins (one in ten a theme) and size // 10 editions."""
+    trees = {}
+    for size in SIZES:
+        nf_dir = tmp_path_factory.mktemp(f"nf{size}")
+        for i in range(size):
+            plugin_type = "theme" if i % 10 == 0 else "plugin"
+            title = f"$:/{plugin_type}s/author{i % AUTHORS}/plugin{i}"
+            write_plugin(nf_dir / "tw5-plugins" / f"author{i % AUTHORS}" / f"plugin{i}", title, i, plugin_type)
+        for i in range(max(size // 10, 1)):
+            write_edition(nf_dir / "tw5-editions" / f"edition{i}", i)
+        trees[size] = nf_dir
+    return trees
@@ -0,0 +1,79 @@
+"""
+Micro-benchmarks for the tw5 and desktop file operations.
+"""
+
+import json
+
+import pytest
+
+import tasks.components.desktop as desktop_mod
+import tasks.components.tw5 as tw5_mod
+from tests.bench.conftest import SIZES
+
+# Copying a thousand plugins takes long enough that a few rounds give a stable median.
+COPY_ROUNDS = 5
+
+
+@pytest.fixture
+def tw5_paths(nf_trees, monkeypatch, tmp_path):
+    def use(size):
+        paths = {"nf": nf_trees[size], "tw5": tmp_path / "tw5"}
+        paths["tw5"].mkdir(exist_ok=True)
+        monkeypatch.setattr(tw5_mod.internal_utils, "get_path", lambda k: paths[k])
+        return paths
+    return use
+
+
+# ---------------------------------------------------------------------------
+# tw5
+# ---------------------------------------------------------------------------
+
+@pytest.mark.parametrize("size", SIZES)
+def test_discover_tw5_plugins(bench, tw5_paths, size):
+    tw5_paths(size)
+    plugins = bench(tw5_mod.discover_tw5_plugins)
+    assert len(plugins) == size
+
+
+@pytest.mark.parametrize("size", SIZES)
+def test_validate_tw5_plugin(bench, tw5_paths, size):
+    paths = tw5_paths(size)
+    info_paths = [str(path) for path in paths["nf"].glob("tw5-plugins/*/*/plugin.info")]
+    valid = bench(lambda: [tw5_mod.validate_tw5_plugin(path) for path in info_paths])
+    assert all(valid)
+
+
+@pytest.mark.parametrize("size", SIZES)
+def test_validate_tw5_edition(bench, tw5_paths, size):
+    paths = tw5_paths(size)
+    editions = [str(path) for path in (paths["nf"] / "tw5-editions").iterdir()]
+    valid = bench(lambda: [tw5_mod.validate_tw5_edition(path) for path in editions])
+    assert all(valid)
+
+
+@pytest.mark.parametrize("size", SIZES)
+def test_copy_tw5_editions(bench, tw5_paths, size):
+    paths = tw5_paths(size)
+    bench(tw5_mod.copy_tw5_editions, rounds=COPY_ROUNDS)
+    assert len(list((paths["tw5"] / "editions").iterdir())) == max(size // 10, 1)
+
+
+@pytest.mark.parametrize("size", SIZES)
+def test_copy_tw5_plugins(bench, tw5_paths, size):
+    paths = tw5_paths(size)
+    bench(tw5_mod.copy_tw5_plugins, rounds=COPY_ROUNDS)
+    copied = list(paths["tw5"].glob("plugins/*/*")) + list(paths["tw5"].glob("themes/*/*"))
+    assert len(copied) == size
+
+
+# ---------------------------------------------------------------------------
+# desktop
+# ---------------------------------------------------------------------------
+
+@pytest.mark.parametrize("size", SIZES)
+def test_write_package_json(bench, tmp_path, size):
+    (tmp_path / "source").mkdir()
+    package = {"name": "placeholder", "dependencies": {f"module{i}": f"^{i}.0.0" for i in range(size)}}
+    (tmp_path / "source" / "package.json").write_text(json.dumps(package))
+    bench(desktop_mod.write_package_json, str(tmp_path), "NeuroDesktop")
+    assert json.loads((tmp_path / "package.json").read_text())["name"] == "NeuroDesktop"
@@ -0,0 +1,322 @@
+"""
+An in-process stand-in for the docker CLI and daemon, for hermetic tests.
+
+FakeDocker.run replaces subprocess.run and answers the docker commands the
+neurobase tasks use from plain state: containers, volumes and images. It
+checks what the daemon would refuse (removing a running container or a
+volume in use, publishing a port twice, running a missing image). Running
+nbase containers serve Bolt through a FakeNeo4j whose nodes live in the data
+volume, so data survives restarts and can be copied between volumes.
+
+install() also replaces the neuro.utils.docker_tools helpers the tasks call,
+so they read the same state.
+"""
+
+import copy
+import itertools
+import json
+import pathlib
+import shlex
+import subprocess
+
+from tests.fake_neo4j import FakeNeo4j
+
+NBASE_SERVICE = "nbase"
+HTTP_PORT = "7474/tcp"
+BOLT_PORT = "7687/tcp"
+# Variables docker-compose.yml passes into the container.
+COMPOSE_ENV = (
+    "NEO4J_PASSWORD", "NEO4J_HEAP_SIZE", "NEO4J_PAGECACHE_SIZE", "NEO4J_QUERY_LOG", "NEO4J_QUERY_LOG_THRESHOLD",
+)
+
+
+class DockerError(Exception):
+    pass
+
+
+class FakeContainer:
+    """docker_tools.Container: backup() archives the data volume's nodes as JSON."""
+
+    def __init__(self, docker, name):
+        self.docker = docker
+        self.name = name
+
+    def backup(self):
+        container = self.docker.get_container(self.name)
+        if container["state"] == "running":
+            raise DockerError(f"Container is running: {self.name}")
+        archive = pathlib.Path(self.docker.archive_dir) / f"{self.name}.json"
+        archive.write_text(json.dumps(self.docker.volumes[container["volumes"]["data"]]["nodes"]))
+        self.docker.backups.append(str(archive))
+
+    def clean(self):
+        self.docker.cleaned.append(self.name)
+
+
+class FakeDocker:
+    def __init__(self, archive_dir=None):
+        self.archive_dir = archive_dir
+        self.containers = {}
+        self.volumes = {}
+        self.images = set()
+        self.builds = []
+        self.backups = []
+        self.cleaned = []
+        self.commands = []
+        self.servers = {}
+
+    # -----------------------------------------------------------------------
+    # Installation
+    # -----------------------------------------------------------------------
+
+    def install(self, monkeypatch, module):
+        """Route module's subprocess.run and docker_tools calls to this daemon."""
+        monkeypatch.setattr(module.subprocess, "run", self.run)
+        monkeypatch.setattr(module.docker_tools, "verify_access", lambda: None)
+        monkeypatch.setattr(module.docker_tools, "container_exists", lambda name: name in self.containers)
+        monkeypatch.setattr(module.docker_tools, "container_running", self.container_running)
+        monkeypatch.setattr(module.docker_tools, "get_container_volumes", self.container_volumes)
+        monkeypatch.setattr(module.docker_tools, "Container", lambda name: FakeContainer(self, name))
+
+    def close(self):
+        for server in self.servers.values():
+            server.stop()
+        self.servers.clear()
+
+    def container_running(self, name):
+        return self.containers.get(name, {}).get("state") == "running"
+
+    def container_volumes(self, name):
+        return list(self.get_container(name)["volumes"].values())
+
+    def get_container(self, name):
+        if name not in self.containers:
+            raise DockerError(f"No such container: {name}")
+        return self.containers[name]
+
+    def server(self, name):
+        """The FakeNeo4j of a running container."""
+        return self.servers[name]
+
+    # -----------------------------------------------------------------------
+    # CLI
+    # -----------------------------------------------------------------------
+
+    def run(self, cmd, check=False, capture_output=False, text=False, env=None, **kwargs):
+        if not cmd or cmd[0] != "docker":
+            raise AssertionError(f"FakeDocker got a non-docker command: {shlex.join(cmd)}")
+        self.commands.append(list(cmd))
+        try:
+            stdout = self.dispatch(cmd[1:], env or {})
+            returncode, stderr = 0, ""
+        except DockerError as e:
+            stdout, returncode, stderr = "", 1, f"Error response from daemon: {e}\n"
+        if not text:
+            stdout, stderr = stdout.encode(), stderr.encode()
+        if check and returncode:
+            raise subprocess.CalledProcessError(returncode, cmd, stdout, stderr)
+        return subprocess.CompletedProcess(cmd, returncode, stdout, stderr)
+
+    def dispatch(self, args, env):
+        command = args[0]
+        if command == "compose":
+            return self.compose(args[1:], env)
+        if command in ("volume", "image"):
+            command, args = f"{command}_{args[1]}", args[1:]
+        handler = getattr(self, f"cmd_{command}", None)
+        if handler is None:
+            raise DockerError(f"unknown command: docker {shlex.join(args)}")
+        return handler(args[1:])
+
+    def cmd_ps(self, args):
+        options = parse_options(args, flags={"-a"})
+        label = options.get("--filter", "").removeprefix("label=")
+        rows = []
+        for name, container in sorted(self.containers.items()):
+            key, _, value = label.partition("=")
+            if label and container["labels"].get(key) != value:
+                continue
+            if container["state"] != "running" and "-a" not in options:
+                continue
+            fmt = options.get("--format", "{{.Names}}")
+            ports = ", ".join(f"0.0.0.0:{port}->{target}" for target, port in container["ports"].items())
+            rows.append(fmt.replace("{{.Names}}", name).replace("{{.State}}", container["state"])
+                        .replace("{{.Ports}}", ports if container["state"] == "running" else ""))
+        return "".join(row + "\n" for row in rows)
+
+    def cmd_port(self, args):
+        container = self.get_container(args[0])
+        if container["state"] != "running" or args[1] not in container["ports"]:
+            raise DockerError(f"No public port '{args[1]}' published for {args[0]}")
+        return f"0.0.0.0:{container['ports'][args[1]]}\n"
+
+    def cmd_inspect(self, args):
+        """docker inspect --format '{{json .HostConfig.PortBindings}}' NAME: kept while stopped."""
+        options = parse_options(args[:-1])
+        if options.get("--format") != "{{json .HostConfig.PortBindings}}":
+            raise DockerError(f"unsupported inspect format: {options.get('--format')}")
+        container = self.get_container(args[-1])
+        bindings = {target: [{"HostIp": "", "HostPort": str(port)}] for target, port in container["ports"].items()}
+        return json.dumps(bindings) + "\n"
+
+    def cmd_start(self, args):
+        for name in args:
+            self.start(name)
+        return "".join(name + "\n" for name in args)
+
+    def cmd_stop(self, args):
+        for name in args:
+            self.stop(name)
+        return "".join(name + "\n" for name in args)
+
+    def cmd_rm(self, args):
+        for name in args:
+            if self.container_running(name):
+                raise DockerError(f"cannot remove container {name}: container is running")
+            self.get_container(name)
+            del self.containers[name]
+        return "".join(name + "\n" for name in args)
+
+    def cmd_logs(self, args):
+        self.get_container(args[-1])
+        return ""
+
+    def cmd_volume_inspect(self, args):
+        if args[0] not in self.volumes:
+            raise DockerError(f"get {args[0]}: no such volume")
+        return json.dumps([{"Name": args[0], "Labels": self.volumes[args[0]]["labels"]}])
+
+    def cmd_volume_create(self, args):
+        labels = dict(value.split("=", 1) for flag, value in itertools.pairwise(args) if flag == "--label")
+        name = args[-1]
+        self.volumes.setdefault(name, {"labels": labels, "nodes": []})
+        return name + "\n"
+
+    def cmd_volume_rm(self, args):
+        for name in args:
+            if name not in self.volumes:
+                raise DockerError(f"get {name}: no such volume")
+            users = [c for c, container in self.containers.items() if name in container["volumes"].values()]
+            if users:
+                raise DockerError(f"remove {name}: volume is in use - [{', '.join(users)}]")
+            del self.volumes[name]
+        return "".join(name + "\n" for name in args)
+
+    def cmd_image_inspect(self, args):
+        if args[0] not in self.images:
+            raise DockerError(f"No such image: {args[0]}")
+        return json.dumps([{"RepoTags": [args[0]]}])
+
+    def cmd_build(self, args):
+        tag = args[args.index("--tag") + 1]
+        self.images.add(tag)
+        self.builds.append(tag)
+        return ""
+
+    def cmd_run(self, args):
+        """docker run --rm --entrypoint CMD -v VOLUME:MOUNT[:ro]... IMAGE ARGS: du and cp on volumes."""
+        mounts = {}
+        i = 0
+        entrypoint = None
+        while args[i].startswith("-"):
+            if args[i] == "--entrypoint":
+                entrypoint = args[i + 1]
+            if args[i] == "-v":
+                volume, mount = args[i + 1].split(":")[:2]
+                if volume not in self.volumes:
+                    self.cmd_volume_create([volume])
+                mounts[mount] = volume
+            i += 1 if args[i] == "--rm" else 2
+        image, command = args[i], args[i + 1:]
+        if image not in self.images:
+            raise DockerError(f"pull access denied for {image}")
+        if entrypoint == "du":
+            mount = command[-1]
+            size = len(json.dumps(self.volumes[mounts[mount]]["nodes"]))
+            return f"{size}\t{mount}\n"
+        if entrypoint == "cp":
+            source, target = (mounts[path.rstrip("/.")] for path in command[-2:])
+            self.volumes[target]["nodes"] = copy.deepcopy(self.volumes[source]["nodes"])
+            return ""
+        raise DockerError(f"exec: {entrypoint}: executable file not found")
+
+    # -----------------------------------------------------------------------
+    # Compose
+    # -----------------------------------------------------------------------
+
+    def compose(self, args, env):
+        """docker compose up -d for docker-compose.yml's nbase service, configured by env."""
+        if args[:2] != ["up", "-d"]:
+            raise DockerError(f"unsupported compose command: {shlex.join(args)}")
+        project = env["BASE_NAME"]
+        image = f"{env['NBASE_IMAGE']}:{env.get('NBASE_TAG') or env['NBASE_VERSION']}"
+        if image not in self.images:
+            raise DockerError(f"pull access denied for {image}")
+        volumes = {"data": f"{project}-data", "logs": f"{project}-logs"}
+        for kind, volume in volumes.items():
+            self.cmd_volume_create([
+                "--label", f"com.docker.compose.project={project}",
+                "--label", f"com.docker.compose.volume={kind}", volume,
+            ])
+        config = {
+            "image": image,
+            "ports": {HTTP_PORT: int(env["NEO4J_PORT_HTTP"]), BOLT_PORT: int(env["NEO4J_PORT_BOLT"])},
+            "env": {key: env.get(key) for key in COMPOSE_ENV},
+        }
+        existing = self.containers.get(project)
+        if existing and all(existing[key] == value for key, value in config.items()):
+            if existing["state"] != "running":
+                self.start(project)
+            return ""
+        if existing:
+            self.stop(project)
+            del self.containers[project]
+        self.containers[project] = {
+            **config,
+            "state": "created",
+            "volumes": volumes,
+            "labels": {"com.docker.compose.project": project, "com.docker.compose.service": NBASE_SERVICE},
+        }
+        self.start(project)
+        return ""
+
+    # -----------------------------------------------------------------------
+    # Lifecycle
+    # -----------------------------------------------------------------------
+
+    def start(self, name):
+        container = self.get_container(name)
+        if container["state"] == "running":
+            return
+        for other, running in self.containers.items():
+            if other != name and running["state"] == "running":
+                taken = set(container["ports"].values()) & set(running["ports"].values())
+                if taken:
+                    raise DockerError(f"Bind for 0.0.0.0:{taken.pop()} failed: port is already allocated")
+        server = FakeNeo4j(
+            port=container["ports"][BOLT_PORT],
+            password=container["env"].get("NEO4J_PASSWORD"),
+            nodes=self.volumes[container["volumes"]["data"]]["nodes"],
+        )
+        self.servers[name] = server.start()
+        container["state"] = "running"
+
+    def stop(self, name):
+        container = self.get_container(name)
+        if name in self.servers:
+            self.servers.pop(name).stop()
+        if container["state"] == "running":
+            container["state"] = "exited"
+
+
+def parse_options(args, flags=()):
+    options = {}
+    i = 0
+    while i < len(args):
+        if args[i] in flags:
+            options[args[i]] = True
+            i += 1
+        else:
+            options[args[i]] = args[i + 1]
+            i += 2
+    return options
@@ -0,0 +1,402 @@
+"""
+A Bolt-speaking Neo4j stand-in for hermetic tests.
+
+FakeNeo4j listens on a local port and answers the official driver over Bolt
+5.0 (handshake, chunked PackStream messages, auto-commit and explicit
+transactions, FAILURE/RESET). Queries are matched against a short table of
+patterns over an in-memory list of nodes: the ones the tasks send, plus
+whatever a test registers with handle(). Anything else fails like a syntax
+error, so a new query in the tasks shows up as a test failure rather than
+passing silently.
+"""
+
+import copy
+import re
+import socket
+import struct
+import threading
+
+MAGIC = b"\x60\x60\xb0\x17"
+VERSION = (5, 0)
+SERVER_AGENT = "Neo4j/5.26.0"
+
+HELLO = 0x01
+GOODBYE = 0x02
+RESET = 0x0F
+RUN = 0x10
+BEGIN = 0x11
+COMMIT = 0x12
+ROLLBACK = 0x13
+DISCARD = 0x2F
+PULL = 0x3F
+
+SUCCESS = 0x70
+RECORD = 0x71
+IGNORED = 0x7E
+FAILURE = 0x7F
+
+
+# ---------------------------------------------------------------------------
+# PackStream
+# ---------------------------------------------------------------------------
+
+class Structure:
+    def __init__(self, tag, fields):
+        self.tag = tag
+        self.fields = fields
+
+
+def pack(value):
+    if value is None:
+        return b"\xc0"
+    if value is True:
+        return b"\xc3"
+    if value is False:
+        return b"\xc2"
+    if isinstance(value, int):
+        if -16 <= value < 128:
+            return struct.pack(">b", value)
+        for marker, fmt in ((0xC8, ">b"), (0xC9, ">h"), (0xCA, ">i"), (0xCB, ">q")):
+            try:
+                return bytes([marker]) + struct.pack(fmt, value)
+            except struct.error:
+                continue
+        raise ValueError(f"Integer out of range: {value}")
+    if isinstance(value, float):
+        return b"\xc1" + struct.pack(">d", value)
+    if isinstance(value, str):
+        data = value.encode()
+        return sized_header(len(data), 0x80, 0xD0) + data
+    if isinstance(value, (bytes, bytearray)):
+        return sized_header(len(value), None, 0xCC) + bytes(value)
+    if isinstance(value, (list, tuple)):
+        return sized_header(len(value), 0x90, 0xD4) + b"".join(pack(item) for item in value)
+    if isinstance(value, dict):
+        return sized_header(len(value), 0xA0, 0xD8) + b"".join(pack(k) + pack(v) for k, v in value.items())
+    if isinstance(value, Structure):
+        return bytes([0xB0 | len(value.fields), value.tag]) + b"".join(pack(field) for field in value.fields)
+    raise TypeError(f"Cannot pack {type(value).__name__}")
+
+
+def sized_header(size, tiny, marker):
+    """Header for strings, bytes, lists and maps: tiny marker under 16, else 8/16/32-bit sizes."""
+    if tiny is not None and size < 16:
+        return bytes([tiny | size])
+    for offset, fmt in enumerate((">B", ">H", ">I")):
+        if size < 1 << (8 << offset):
+            return bytes([marker + offset]) + struct.pack(fmt, size)
+    raise ValueError(f"Too large: {size}")
+
+
+def unpack(data, offset=0):
+    """Decode one value at offset: (value, next offset)."""
+    marker = data[offset]
+    offset += 1
+    if marker < 0x80:
+        return marker, offset
+    if marker >= 0xF0:
+        return marker - 0x100, offset
+    high, low = marker & 0xF0, marker & 0x0F
+    if high == 0x80:
+        return data[offset:offset + low].decode(), offset + low
+    if high == 0x90:
+        return unpack_items(data, offset, low)
+    if high == 0xA0:
+        return unpack_map(data, offset, low)
+    if high == 0xB0:
+        tag = data[offset]
+        fields, offset = unpack_items(data, offset + 1, low)
+        return Structure(tag, fields), offset
+    if marker == 0xC0:
+        return None, offset
+    if marker in (0xC2, 0xC3):
+        return marker == 0xC3, offset
+    if marker == 0xC1:
+        return struct.unpack_from(">d", data, offset)[0], offset + 8
+    ints = {0xC8: ">b", 0xC9: ">h", 0xCA: ">i", 0xCB: ">q"}
+    if marker in ints:
+        fmt = ints[marker]
+        return struct.unpack_from(fmt, data, offset)[0], offset + struct.calcsize(fmt)
+    sizes = {0: ">B", 1: ">H", 2: ">I"}
+    for base, kind in ((0xCC, "bytes"), (0xD0, "string"), (0xD4, "list"), (0xD8, "map")):
+        if base <= marker < base + 3:
+            fmt = sizes[marker - base]
+            size = struct.unpack_from(fmt, data, offset)[0]
+            offset += struct.calcsize(fmt)
+            if kind == "bytes":
+                return bytes(data[offset:offset + size]), offset + size
+            if kind == "string":
+                return data[offset:offset + size].decode(), offset + size
+            if kind == "list":
+                return unpack_items(data, offset, size)
+            return unpack_map(data, offset, size)
+    raise ValueError(f"Unknown PackStream marker 0x{marker:02X}")
+
+
+def unpack_items(data, offset, count):
+    items = []
+    for _ in range(count):
+        item, offset = unpack(data, offset)
+        items.append(item)
+    return items, offset
+
+
+def unpack_map(data, offset, count):
+    result = {}
+    for _ in range(count):
+        key, offset = unpack(data, offset)
+        result[key], offset = unpack(data, offset)
+    return result, offset
+
+
+# ---------------------------------------------------------------------------
+# Queries
+# ---------------------------------------------------------------------------
+
+class QueryError(Exception):
+    def __init__(self, code, message):
+        super().__init__(message)
+        self.code = code
+
+
+def return_literal(server, match, params):
+    return [match.group(2) or match.group(1)], [[int(match.group(1))]]
+
+
+def count_nodes(server, match, params):
+    nodes = server.nodes
+    if match.group("property"):
+        nodes = [node for node in nodes if node["properties"].get(match.group("property")) is not None]
+    return [match.group("alias") or f"count({match.group('var')})"], [[len(nodes)]]
+
+
+def create_nodes(server, match, params):
+    for fields in params[match.group("param")]:
+        server.nodes.append({"labels": [match.group("label")], "properties": dict(fields)})
+    return [], []
+
+
+def delete_nodes(server, match, params):
+    server.nodes.clear()
+    return [], []
+
+
+QUERIES = [
+    (r"RETURN (\d+)(?: AS (\w+))?", return_literal),
+    (
+        (
+            r"MATCH \((?P<var>\w+)\)(?: WHERE (?P=var)\.(?P<property>\w+) IS NOT NULL)?"
+            r" RETURN count\((?P=var)\)(?: AS (?P<alias>\w+))?"
+        ),
+        count_nodes,
+    ),
+    (r"UNWIND \$(?P<param>\w+) AS (?P<row>\w+) CREATE \((\w+):(?P<label>\w+)\) SET \3 = (?P=row)", create_nodes),
+    (r"MATCH \((\w+)\) (?:CALL \(\1\) \{ )?DETACH DELETE \1(?: \} IN TRANSACTIONS OF \d+ ROWS)?", delete_nodes),
+]
+
+
+# ---------------------------------------------------------------------------
+# Server
+# ---------------------------------------------------------------------------
+
+class FakeNeo4j:
+    """
+    Bolt server over an in-memory graph: nodes is a list of {"labels", "properties"}.
+
+    Pass nodes to share them with the caller (FakeDocker keeps them in the
+    data volume, so they survive restarts). queries records every query run.
+    """
+
+    def __init__(self, port=0, password=None, nodes=None):
+        self.password = password
+        self.nodes = nodes if nodes is not None else []
+        self.queries = []
+        self.handlers = [(re.compile(pattern), handler) for pattern, handler in QUERIES]
+        self.lock = threading.Lock()
+        self.connections = []
+        self.sock = socket.socket()
+        self.sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        self.sock.bind(("127.0.0.1", port))
+        self.port = self.sock.getsockname()[1]
+
+    @property
+    def uri(self):
+        return f"bolt://127.0.0.1:{self.port}"
+
+    def handle(self, pattern, handler):
+        """Answer queries matching pattern with handler(server, match, params) -> (fields, rows)."""
+        self.handlers.insert(0, (re.compile(pattern), handler))
+
+    def start(self):
+        self.sock.listen()
+        threading.Thread(target=self.accept, daemon=True).start()
+        return self
+
+    def stop(self):
+        # shutdown() wakes the accept thread; close() alone leaves the port listening until it returns.
+        try:
+            self.sock.shutdown(socket.SHUT_RDWR)
+        except OSError:
+            pass
+        self.sock.close()
+        for conn in list(self.connections):
+            try:
+                conn.shutdown(socket.SHUT_RDWR)
+            except OSError:
+                pass
+            conn.close()
+
+    def accept(self):
+        while True:
+            try:
+                conn, _ = self.sock.accept()
+            except OSError:
+                return
+            self.connections.append(conn)
+            threading.Thread(target=self.serve, args=(conn,), daemon=True).start()
+
+    def serve(self, conn):
+        try:
+            with conn:
+                if self.handshake(conn):
+                    Connection(self, conn).loop()
+        except (OSError, ConnectionError):
+            pass
+        finally:
+            if conn in self.connections:
+                self.connections.remove(conn)
+
+    def handshake(self, conn):
+        request = read_exact(conn, 20)
+        if request[:4] != MAGIC:
+            return False
+        major, minor = VERSION
+        for i in range(4, 20, 4):
+            _, span, offered_minor, offered_major = request[i:i + 4]
+            if offered_major == major and offered_minor - span <= minor <= offered_minor:
+                conn.sendall(bytes([0, 0, minor, major]))
+                return True
+        conn.sendall(b"\x00\x00\x00\x00")
+        return False
+
+    def execute(self, query, params):
+        query = " ".join(query.split())
+        self.queries.append(query)
+        for pattern, handler in self.handlers:
+            match = pattern.fullmatch(query)
+            if match:
+                with self.lock:
+                    return handler(self, match, params)
+        raise QueryError("Neo.ClientError.Statement.SyntaxError", f"FakeNeo4j does not support: {query}")
+
+
+def read_exact(conn, size):
+    data = b""
+    while len(data) < size:
+        chunk = conn.recv(size - len(data))
+        if not chunk:
+            raise ConnectionError("connection closed")
+        data += chunk
+    return data
+
+
+class Connection:
+    """One client connection: Bolt message loop with transaction and failure state."""
+
+    def __init__(self, server, conn):
+        self.server = server
+        self.conn = conn
+        self.failed = False
+        self.snapshot = None
+        self.fields = []
+        self.rows = []
+
+    def read_message(self):
+        data = b""
+        while True:
+            size = struct.unpack(">H", read_exact(self.conn, 2))[0]
+            if size == 0:
+                if data:
+                    break
+                continue  # NOOP keep-alive between messages
+            data += read_exact(self.conn, size)
+        message, _ = unpack(data)
+        return message.tag, message.fields
+
+    def send(self, tag, *fields):
+        data = pack(Structure(tag, list(fields)))
+        chunks = b"".join(
+            struct.pack(">H", len(data[i:i + 0xFFFF])) + data[i:i + 0xFFFF] for i in range(0, len(data), 0xFFFF)
+        )
+        self.conn.sendall(chunks + b"\x00\x00")
+
+    def fail(self, code, message):
+        self.failed = True
+        self.send(FAILURE, {"code": code, "message": message})
+
+    def loop(self):
+        while True:
+            tag, fields = self.read_message()
+            if tag == GOODBYE:
+                return
+            if tag == RESET:
+                self.rollback()
+                self.failed = False
+                self.rows = []
+                self.send(SUCCESS, {})
+            elif self.failed:
+                self.send(IGNORED)
+            elif tag == HELLO:
+                if not self.hello(fields[0]):
+                    return
+            elif tag == RUN:
+                self.run(*fields[:2])
+            elif tag in (PULL, DISCARD):
+                self.pull(fields[0] if fields else {}, discard=tag == DISCARD)
+            elif tag == BEGIN:
+                self.snapshot = copy.deepcopy(self.server.nodes)
+                self.send(SUCCESS, {})
+            elif tag == COMMIT:
+                self.snapshot = None
+                self.send(SUCCESS, {"bookmark": "FB:fake"})
+            elif tag == ROLLBACK:
+                self.rollback()
+                self.send(SUCCESS, {})
+            else:
+                self.fail("Neo.ClientError.Request.Invalid", f"Unsupported message 0x{tag:02X}")
+
+    def hello(self, extra):
+        if self.server.password is not None and extra.get("credentials") != self.server.password:
+            self.fail("Neo.ClientError.Security.Unauthorized", "The client is unauthorized due to authentication failure.")
+            return False
+        self.send(SUCCESS, {"server": SERVER_AGENT, "connection_id": f"bolt-{id(self)}"})
+        return True
+
+    def run(self, query, params):
+        try:
+            self.fields, self.rows = self.server.execute(query, params)
+        except QueryError as e:
+            self.fail(e.code, str(e))
+            return
+        metadata = {"fields": self.fields, "t_first": 0}
+        if self.snapshot is not None:
+            metadata["qid"] = 0
+        self.send(SUCCESS, metadata)
+
+    def pull(self, extra, discard=False):
+        n = extra.get("n", -1)
+        rows, self.rows = (self.rows, []) if n < 0 else (self.rows[:n], self.rows[n:])
+        if not discard:
+            for row in rows:
+                self.send(RECORD, row)
+        metadata = {"has_more": bool(self.rows)}
+        if not self.rows:
+            metadata.update(type="rw", t_last=0, db="neo4j")
+            if self.snapshot is None:
+                metadata["bookmark"] = "FB:fake"
+        self.send(SUCCESS, metadata)
+
+    def rollback(self):
+        if self.snapshot is not None:
+            self.server.nodes[:] = self.snapshot
+            self.snapshot = None
@@ -2,14 +2,16 @@
 Tests for tasks.components.app.
 """
 
+import json
+import os
+import urllib.error
+import urllib.request
 
 import pytest
-
 from neuro.utils.test_utils import FakeContext, Recorder, SubprocessResult, noop_step
 
 import tasks.components.app as app_mod
 
-
 # ---------------------------------------------------------------------------
 # Fixtures
 # ---------------------------------------------------------------------------
@@ -51,6 +53,7 @@ class TestPreTasks:
         pre_names = [t.name for t in app_mod.stop.pre]
         assert "env" in pre_names
         assert "close" in pre_names
+        assert pre_names.index("close") < pre_names.index("stop")
 
 
 # ---------------------------------------------------------------------------
@@ -109,6 +112,216 @@ class TestBuild:
         assert (tmp_path / "build").is_dir()
 
 
+# ---------------------------------------------------------------------------
+# supervise
+# ---------------------------------------------------------------------------
+
+class FakeService(app_mod.Service):
+    name = "fake"
+
+    def __init__(self, alive=False, pid=None, latency=0.002, code=1):
+        super().__init__()
+        self.alive = alive
+        self.code = code
+        self._pid = pid or os.getpid()
+        self.latency = latency
+        self.starts = 0
+        self.stopped = False
+
+    def start(self):
+        self.starts += 1
+        self.alive = True
+
+    def stop(self):
+        self.stopped = True
+
+    def running(self):
+        return self.alive
+
+    def pid(self):
+        return self._pid
+
+    def exit_code(self):
+        return self.code
+
+    def probe(self):
+        return self.latency
+
+
+class TestSupervisor:
+    def test_starts_stopped_services(self):
+        service = FakeService()
+        rows = app_mod.Supervisor([service]).check(now=0)
+        assert service.starts == 1
+        assert service.restarts == 0
+        assert rows[0]["state"] == "running"
+        assert rows[0]["rss"] > 0
+        assert rows[0]["latency_ms"] == 2.0
+
+    def test_adopts_running_service(self):
+        service = FakeService(alive=True)
+        app_mod.Supervisor([service]).check(now=0)
+        assert service.starts == 0
+        assert service.started_at == 0
+
+    def test_restarts_with_backoff(self, capsys):
+        service = FakeService(alive=True)
+        supervisor = app_mod.Supervisor([service])
+        supervisor.check(now=0)
+
+        service.alive = False
+        row = supervisor.check(now=10)[0]
+        assert row["state"] == "restarting"
+        assert row["last_exit"] == 1
+        assert service.next_start == 10 + app_mod.BACKOFF_MIN
+        assert "restarting in" in capsys.readouterr().out
+
+        supervisor.check(now=10.5)
+        assert service.starts == 0
+        supervisor.check(now=11)
+        assert service.starts == 1
+        assert service.restarts == 1
+
+        service.alive = False
+        supervisor.check(now=12)
+        assert service.next_start == 12 + 2 * app_mod.BACKOFF_MIN
+
+    def test_clean_exit_is_not_restarted(self, capsys):
+        service = FakeService(alive=True, code=0)
+        supervisor = app_mod.Supervisor([service])
+        supervisor.check(now=0)
+
+        service.alive = False
+        row = supervisor.check(now=10)[0]
+        assert row["state"] == "stopped"
+        assert row["last_exit"] == 0
+        assert "exited cleanly" in capsys.readouterr().out
+
+        supervisor.check(now=100)
+        assert service.starts == 0
+        assert service.crashes == 0
+
+    def test_signal_is_a_crash(self):
+        service = FakeService(alive=True, code=-9)
+        supervisor = app_mod.Supervisor([service])
+        supervisor.check(now=0)
+        service.alive = False
+        assert supervisor.check(now=10)[0]["state"] == "restarting"
+        supervisor.check(now=10 + app_mod.BACKOFF_MIN)
+        assert service.starts == 1
+
+    def test_service_is_abstract(self):
+        with pytest.raises(TypeError):
+            app_mod.Service()
+
+    def test_backoff_is_capped(self):
+        service = FakeService(alive=True)
+        supervisor = app_mod.Supervisor([service])
+        supervisor.check(now=0)
+        now = 0
+        for _ in range(10):
+            service.alive = False
+            now += 1
+            supervisor.check(now=now)
+            now = service.next_start
+            supervisor.check(now=now)
+        assert service.backoff == app_mod.BACKOFF_MAX
+
+    def test_backoff_resets_when_stable(self):
+        service = FakeService(alive=True)
+        service.backoff = 16
+        supervisor = app_mod.Supervisor([service])
+        supervisor.check(now=0)
+        supervisor.check(now=app_mod.BACKOFF_RESET)
+        assert service.backoff == app_mod.BACKOFF_MIN
+
+    def test_cpu_between_samples(self):
+        service = FakeService(alive=True)
+        supervisor = app_mod.Supervisor([service])
+        assert supervisor.check(now=0)[0]["cpu"] is None
+        assert supervisor.check(now=1)[0]["cpu"] >= 0
+
+    def test_history_is_bounded(self):
+        supervisor = app_mod.Supervisor([FakeService(alive=True)], history=3)
+        for now in range(5):
+            supervisor.check(now=now)
+        assert len(supervisor.history()) == 3
+
+    def test_stop_in_reverse_order(self):
+        order = []
+        first, second = FakeService(), FakeService()
+        first.stop = lambda: order.append("first")
+        second.stop = lambda: order.append("second")
+        app_mod.Supervisor([first, second]).stop()
+        assert order == ["second", "first"]
+
+
+class TestStatusServer:
+    @pytest.fixture
+    def server(self):
+        supervisor = app_mod.Supervisor([FakeService(alive=True)])
+        supervisor.check(now=0)
+        server = app_mod.serve_status(supervisor, 0)
+        yield server.server_address[1]
+        server.shutdown()
+        server.server_close()
+
+    def get(self, port, path):
+        with urllib.request.urlopen(f"http://127.0.0.1:{port}{path}", timeout=5) as response:
+            return json.loads(response.read())
+
+    def test_status(self, server):
+        status = self.get(server, "/status")
+        assert status["services"][0]["name"] == "fake"
+        assert status["services"][0]["state"] == "running"
+
+    def test_history(self, server):
+        assert len(self.get(server, "/history")) == 1
+
+    def test_not_found(self, server):
+        with pytest.raises(urllib.error.HTTPError):
+            self.get(server, "/other")
+
+
+class TestSuperviseTask:
+    @pytest.fixture
+    def app_dir(self, monkeypatch, tmp_path):
+        (tmp_path / "nw").write_text("")
+        monkeypatch.setattr(app_mod.desktop, "get_app_dir", lambda: tmp_path)
+        monkeypatch.setattr(app_mod.desktop, "running_pid", lambda: None)
+        return tmp_path
+
+    def test_missing_binary(self, ctx, monkeypatch, tmp_path):
+        monkeypatch.setattr(app_mod.desktop, "get_app_dir", lambda: tmp_path)
+        with pytest.raises(SystemExit):
+            app_mod.supervise.__wrapped__(ctx)
+
+    def test_desktop_already_running(self, ctx, app_dir, monkeypatch, capsys):
+        monkeypatch.setattr(app_mod.desktop, "running_pid", lambda: os.getpid())
+        with pytest.raises(SystemExit):
+            app_mod.supervise.__wrapped__(ctx)
+        assert "already running" in capsys.readouterr().out
+
+    def test_runs_until_interrupted(self, ctx, app_dir, monkeypatch):
+        start_rec = Recorder()
+        monkeypatch.setattr(app_mod.neurobase, "start", start_rec)
+        supervisors = []
+
+        def interrupt(self, interval):
+            supervisors.append(self)
+            raise KeyboardInterrupt
+
+        stop_rec = Recorder()
+        monkeypatch.setattr(app_mod.Supervisor, "run", interrupt)
+        monkeypatch.setattr(app_mod.Supervisor, "stop", stop_rec)
+
+        app_mod.supervise.__wrapped__(ctx, port=0)
+
+        assert start_rec.call_count == 1
+        assert [s.name for s in supervisors[0].services] == ["neurobase", "desktop"]
+        assert stop_rec.call_count == 1
+
+
 # ---------------------------------------------------------------------------
 # test
 # ---------------------------------------------------------------------------
@@ -131,3 +344,36 @@ class TestTest:
         )
         with pytest.raises(SystemExit):
             app_mod.test.__wrapped__(ctx)
+
+    def test_impact(self, ctx, subprocess_recorder, monkeypatch, tmp_path):
+        monkeypatch.setattr(app_mod.internal_utils, "get_path", lambda k: tmp_path)
+        monkeypatch.delenv("NF_STATE", raising=False)
+        app_mod.test.__wrapped__(ctx, impact=True)
+        cmd = subprocess_recorder.calls[0][0][0]
+        assert cmd[:2] == ["nenv/bin/pytest", "tests/"]
+        assert f"--impact-map={tmp_path / 'impact' / 'app.json'}" in cmd
+        globals_ = [arg.removeprefix("--impact-global=") for arg in cmd if arg.startswith("--impact-global=")]
+        assert globals_ == [str(tmp_path / name) for name in ("Dockerfile", "docker-compose.yml", ".env")]
+        assert "env" in subprocess_recorder.calls[0][1]
+
+
+class TestBench:
+    def test_runs_benchmarks_with_history(self, ctx, subprocess_recorder, monkeypatch, tmp_path):
+        monkeypatch.setenv("NF_STATE", str(tmp_path))
+        app_mod.bench.__wrapped__(ctx)
+        (cmd,), kwargs = subprocess_recorder.calls[0]
+        assert cmd == ["nenv/bin/pytest", "tests/bench", "-q"] + app_mod.nf_bench.bench_args(
+            tmp_path / "bench" / "micro.json", 0.25
+        )
+        assert kwargs["env"]["PYTHONPATH"].startswith(app_mod.nf_impact.PLUGIN_DIR)
+
+    def test_tolerance_and_save(self, ctx, subprocess_recorder):
+        app_mod.bench.__wrapped__(ctx, tolerance="0.5", save=True)
+        cmd = subprocess_recorder.calls[0][0][0]
+        assert "--bench-tolerance=0.5" in cmd
+        assert cmd[-1] == "--bench-save"
+
+    def test_regression_exits(self, ctx, monkeypatch):
+        monkeypatch.setattr(app_mod.subprocess, "run", Recorder(return_value=SubprocessResult(1)))
+        with pytest.raises(SystemExit):
+            app_mod.bench.__wrapped__(ctx)
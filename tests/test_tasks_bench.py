@@ -0,0 +1,130 @@
+"""
+Tests for tasks.pytest_plugins.nf_bench.
+"""
+
+import json
+import os
+
+import pytest
+
+from tasks.pytest_plugins import nf_bench
+
+pytest_plugins = ["pytester"]
+
+
+def stats(median, alloc_peak=1000):
+    return {"rounds": 3, "min": median, "median": median, "mean": median, "stdev": 0.0, "alloc_peak": alloc_peak}
+
+
+# ---------------------------------------------------------------------------
+# Measuring and comparing
+# ---------------------------------------------------------------------------
+
+class TestMeasure:
+    def test_warms_up_times_and_traces(self):
+        calls = []
+        result, value = nf_bench.measure(lambda: calls.append(bytearray(100000)) or len(calls), rounds=3)
+        # One warm-up call, three timed rounds, one traced call.
+        assert len(calls) == 5
+        assert value == 4
+        assert result["rounds"] == 3
+        assert 0 <= result["min"] <= result["median"]
+        assert result["alloc_peak"] >= 100000
+
+    def test_setup_runs_before_every_call(self):
+        order = []
+        nf_bench.measure(lambda: order.append("call"), rounds=2, setup=lambda: order.append("setup"))
+        assert order == ["setup", "call"] * 4
+
+
+class TestBaseline:
+    def test_median_of_recent_runs(self):
+        history = [{"results": {"a": stats(m)}} for m in (100, 1, 2, 3, 4, 5)]
+        baseline = nf_bench.get_baseline(history, window=5)
+        assert baseline == {"a": {"median": 3, "alloc_peak": 1000}}
+
+    def test_only_runs_with_the_benchmark(self):
+        history = [{"results": {"a": stats(1)}}, {"results": {"b": stats(2)}}]
+        assert nf_bench.get_baseline(history)["a"]["median"] == 1
+
+
+class TestCompare:
+    def test_regression_beyond_tolerance(self):
+        baseline = {"a": {"median": 1.0, "alloc_peak": 1000}}
+        rows = nf_bench.compare({"a": stats(1.3, 1100)}, baseline, tolerance=0.25)
+        assert rows[0]["regressed"] == ["median"]
+        assert rows[0]["changes"]["alloc_peak"] == pytest.approx(0.1)
+
+    def test_new_benchmark_has_no_changes(self):
+        rows = nf_bench.compare({"a": stats(1.0)}, {})
+        assert rows == [{"name": "a", "stats": stats(1.0), "changes": {}, "regressed": []}]
+
+
+class TestBenchArgs:
+    def test_history_path(self, tmp_path):
+        assert nf_bench.bench_args(tmp_path / "micro.json", 0.1, save=True) == [
+            "-p", "nf_bench", f"--bench-history={tmp_path / 'micro.json'}",
+            "--bench-tolerance=0.1", "--bench-save",
+        ]
+
+
+# ---------------------------------------------------------------------------
+# Plugin
+# ---------------------------------------------------------------------------
+
+class TestPlugin:
+    @pytest.fixture
+    def project(self, pytester, monkeypatch):
+        monkeypatch.setenv("PYTHONPATH", os.path.dirname(nf_bench.__file__))
+        pytester.makeini("[pytest]\n")
+        pytester.makeconftest(
+            "import pytest\n\n"
+            "@pytest.fixture\n"
+            "def bench(request):\n"
+            "    plugin = request.config.pluginmanager.get_plugin('nf_bench_plugin')\n"
+            "    if plugin is None:\n"
+            "        pytest.skip('no plugin')\n"
+            "    return plugin.runner(request.node.name)\n"
+        )
+        pytester.makepyfile(test_sum="def test_sum(bench):\n    assert bench(sum, range(1000), rounds=3) == 499500\n")
+        return pytester
+
+    def history(self, pytester):
+        return pytester.path / "bench" / "micro.json"
+
+    def run(self, pytester, *args):
+        return pytester.runpytest_subprocess("-p", "nf_bench", f"--bench-history={self.history(pytester)}", *args)
+
+    def write_history(self, pytester, median):
+        runs = [{"time": "t", "results": {"test_sum": stats(median, alloc_peak=10**9)}}]
+        self.history(pytester).parent.mkdir()
+        self.history(pytester).write_text(json.dumps({"version": nf_bench.VERSION, "runs": runs}))
+
+    def test_first_run_records_history(self, project):
+        result = self.run(project)
+        result.assert_outcomes(passed=1)
+        result.stdout.fnmatch_lines(["*test_sum*new*"])
+        runs = json.loads(self.history(project).read_text())["runs"]
+        assert list(runs[0]["results"]) == ["test_sum"]
+
+    def test_regression_fails_and_keeps_history(self, project):
+        self.write_history(project, 1e-12)
+        result = self.run(project)
+        assert result.ret == nf_bench.TESTS_FAILED
+        result.stdout.fnmatch_lines(["*REGRESSED median*", "*history not updated*"])
+        assert len(json.loads(self.history(project).read_text())["runs"]) == 1
+
+    def test_tolerance_option(self, project):
+        self.write_history(project, 1e-12)
+        self.run(project, "--bench-tolerance=1e12").assert_outcomes(passed=1)
+        assert len(json.loads(self.history(project).read_text())["runs"]) == 2
+
+    def test_save_accepts_regression(self, project):
+        self.write_history(project, 1e-12)
+        result = self.run(project, "--bench-save")
+        assert result.ret == 0
+        result.stdout.fnmatch_lines(["*1 regressions accepted*"])
+        assert len(json.loads(self.history(project).read_text())["runs"]) == 2
+
+    def test_skips_without_plugin(self, project):
+        project.runpytest_subprocess().assert_outcomes(skipped=1)
@@ -4,16 +4,22 @@ Tests for tasks.components.desktop (build, run, close).
 
 import json
 import os
+import re
 import signal
+import socket
+import subprocess
+import sys
+import threading
+import time
+import urllib.error
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
 from pathlib import Path
 
 import pytest
-
 from neuro.utils.test_utils import FakeContext, Recorder, SubprocessResult, noop_step
 
 import tasks.components.desktop as desktop_mod
 
-
 # ---------------------------------------------------------------------------
 # Fixtures
 # ---------------------------------------------------------------------------
@@ -28,6 +34,11 @@ def _patch_step(monkeypatch):
     monkeypatch.setattr(desktop_mod.terminal_style, "step", noop_step)
 
 
+@pytest.fixture(autouse=True)
+def _cache_dir(monkeypatch, tmp_path):
+    monkeypatch.setenv("NF_CACHE", str(tmp_path))
+
+
 @pytest.fixture
 def rsync_recorder(monkeypatch):
     rec = Recorder()
@@ -109,6 +120,393 @@ class TestRegisterProtocol:
         out = capsys.readouterr().out
         assert "Not found" in out
 
+    def test_exact_lookup(self, monkeypatch):
+        monkeypatch.setenv("PORT", "8080")
+        monkeypatch.setattr(desktop_mod.network_utils, "is_port_in_use", lambda p: True)
+        wiki = FakeWiki({"abc-123": "MyTiddler"})
+        monkeypatch.setattr(desktop_mod, "tw_get", wiki)
+        monkeypatch.setattr(desktop_mod.tw_actions, "open_tiddler", lambda t: None)
+        desktop_mod.register_protocol("neuro://abc-123")
+        assert wiki.queries == ["[field:neuro.id[abc-123]]"]
+
+    def test_persists_cache(self, monkeypatch, tmp_path):
+        monkeypatch.setenv("PORT", "8080")
+        monkeypatch.setattr(desktop_mod.network_utils, "is_port_in_use", lambda p: True)
+        monkeypatch.setattr(desktop_mod, "tw_get", FakeWiki({"abc-123": "MyTiddler"}))
+        monkeypatch.setattr(desktop_mod.tw_actions, "open_tiddler", lambda t: None)
+        desktop_mod.register_protocol("neuro://abc-123")
+        cache = desktop_mod.TitleCache(str(tmp_path / "neuro-ids.json"))
+        assert cache.get("abc-123") == "MyTiddler"
+
+
+# ---------------------------------------------------------------------------
+# protocol daemon
+# ---------------------------------------------------------------------------
+
+class FakeWiki:
+    """Answers the filters used for neuro.id lookups from a uuid -> title dict."""
+
+    def __init__(self, tiddlers):
+        self.tiddlers = tiddlers
+        self.queries = []
+
+    def filter_output(self, query):
+        self.queries.append(query)
+        if query == desktop_mod.ID_MAP_FILTER:
+            return [f"{uuid} {title}" for uuid, title in self.tiddlers.items()]
+        uuids = re.findall(r"\[field:neuro\.id\[([^\]]*)\]\]", query)
+        if query.endswith(desktop_mod.ID_PAIRS):
+            return [f"{uuid} {self.tiddlers[uuid]}" for uuid in uuids if uuid in self.tiddlers]
+        if uuids:
+            return [self.tiddlers[uuids[0]]] if uuids[0] in self.tiddlers else []
+        title = query.removeprefix("[[").removesuffix("]get[neuro.id]]")
+        return [uuid for uuid, t in self.tiddlers.items() if t == title]
+
+
+class TestTitleCache:
+    def test_lru_eviction(self):
+        cache = desktop_mod.TitleCache(maxsize=2)
+        cache.put("a", "A")
+        cache.put("b", "B")
+        cache.get("a")
+        cache.put("c", "C")
+        assert list(cache.entries) == ["a", "c"]
+
+    def test_persists(self, tmp_path):
+        path = str(tmp_path / "ids.json")
+        cache = desktop_mod.TitleCache(path)
+        cache.put("a", "A")
+        cache.save()
+        assert desktop_mod.TitleCache(path).get("a") == "A"
+
+    def test_corrupt_file(self, tmp_path):
+        path = tmp_path / "ids.json"
+        path.write_text("{not json")
+        assert desktop_mod.TitleCache(str(path)).entries == {}
+
+    def test_invalidate(self):
+        cache = desktop_mod.TitleCache()
+        cache.put("a", "A")
+        cache.put("b", "B")
+        cache.invalidate("a")
+        assert list(cache.entries) == ["b"]
+        cache.invalidate()
+        assert not cache.entries
+
+
+class TestResolveTitle:
+    def test_miss_uses_exact_lookup(self, monkeypatch):
+        wiki = FakeWiki({"abc-1": "First"})
+        monkeypatch.setattr(desktop_mod, "tw_get", wiki)
+        cache = desktop_mod.TitleCache()
+        assert desktop_mod.resolve_title("abc-1", cache) == "First"
+        assert wiki.queries == ["[field:neuro.id[abc-1]]"]
+        assert cache.get("abc-1") == "First"
+
+    def test_hit_is_validated(self, monkeypatch):
+        wiki = FakeWiki({"abc-1": "First"})
+        monkeypatch.setattr(desktop_mod, "tw_get", wiki)
+        cache = desktop_mod.TitleCache()
+        cache.put("abc-1", "First")
+        assert desktop_mod.resolve_title("abc-1", cache) == "First"
+        assert wiki.queries == ["[[First]get[neuro.id]]"]
+
+    def test_stale_hit_falls_through(self, monkeypatch):
+        monkeypatch.setattr(desktop_mod, "tw_get", FakeWiki({"abc-1": "Renamed"}))
+        cache = desktop_mod.TitleCache()
+        cache.put("abc-1", "First")
+        assert desktop_mod.resolve_title("abc-1", cache) == "Renamed"
+        assert cache.get("abc-1") == "Renamed"
+
+    def test_deleted(self, monkeypatch):
+        monkeypatch.setattr(desktop_mod, "tw_get", FakeWiki({}))
+        cache = desktop_mod.TitleCache()
+        cache.put("abc-1", "First")
+        assert desktop_mod.resolve_title("abc-1", cache) is None
+        assert cache.get("abc-1") is None
+
+
+class TestResolveTitles:
+    def test_single_query(self, monkeypatch):
+        wiki = FakeWiki({"a": "A", "b": "B"})
+        monkeypatch.setattr(desktop_mod, "tw_get", wiki)
+        assert desktop_mod.resolve_titles(["a", "b", "c"]) == {"a": "A", "b": "B"}
+        assert len(wiki.queries) == 1
+        assert wiki.queries[0].startswith("[field:neuro.id[a]] [field:neuro.id[b]] [field:neuro.id[c]]")
+
+    def test_chunks_long_lists(self, monkeypatch):
+        wiki = FakeWiki({f"u{i}": f"T{i}" for i in range(5)})
+        monkeypatch.setattr(desktop_mod, "tw_get", wiki)
+        titles = desktop_mod.resolve_titles([f"u{i}" for i in range(5)], chunk=2)
+        assert titles == {f"u{i}": f"T{i}" for i in range(5)}
+        assert len(wiki.queries) == 3
+
+
+class FakeStory:
+    """tw_request stand-in serving $:/StoryList the way the TiddlyWiki server does."""
+
+    def __init__(self, titles=None):
+        self.list = desktop_mod.stringify_title_list(titles) if titles is not None else None
+        self.requests = []
+
+    def __call__(self, port, path, method="GET", body=None):
+        self.requests.append((method, path))
+        if method == "PUT":
+            self.list = body["list"]
+            return b""
+        if self.list is None:
+            raise urllib.error.HTTPError(path, 404, "Not Found", {}, None)
+        return json.dumps({"title": desktop_mod.STORY_LIST, "fields": {"list": self.list}}).encode()
+
+    @property
+    def titles(self):
+        return desktop_mod.parse_title_list(self.list)
+
+
+class TestStoryList:
+    def test_title_list_round_trip(self):
+        titles = ["A", "Two words", "x]y", "$:/Tab"]
+        text = desktop_mod.stringify_title_list(titles)
+        assert text == "A [[Two words]] x]y $:/Tab"
+        assert desktop_mod.parse_title_list(text) == titles
+
+    def test_prepends_in_one_write(self, monkeypatch):
+        story = FakeStory(["Old", "B"])
+        monkeypatch.setattr(desktop_mod, "tw_request", story)
+        assert desktop_mod.open_story(8080, ["A", "B"]) == ["A", "B", "Old"]
+        assert [method for method, _ in story.requests] == ["GET", "PUT"]
+        assert story.requests[1][1] == "/recipes/default/tiddlers/%24%3A%2FStoryList"
+
+    def test_missing_story_list(self, monkeypatch):
+        story = FakeStory()
+        monkeypatch.setattr(desktop_mod, "tw_request", story)
+        desktop_mod.open_story(8080, ["Two words"])
+        assert story.titles == ["Two words"]
+
+
+class TestReadUuids:
+    def test_skips_blanks_and_comments(self, tmp_path):
+        path = tmp_path / "links.txt"
+        path.write_text("# reading list\nneuro://a\n\n  b  \n")
+        assert desktop_mod.read_uuids(str(path)) == ["a", "b"]
+
+
+class TestOpenLinks:
+    @pytest.fixture(autouse=True)
+    def _running(self, monkeypatch):
+        monkeypatch.setenv("PORT", "8080")
+        monkeypatch.setattr(desktop_mod.network_utils, "is_port_in_use", lambda p: True)
+
+    @pytest.fixture
+    def story(self, monkeypatch):
+        story = FakeStory(["Old"])
+        monkeypatch.setattr(desktop_mod, "tw_request", story)
+        return story
+
+    def test_opens_in_given_order(self, ctx, monkeypatch, story):
+        wiki = FakeWiki({"a": "A", "b": "B"})
+        monkeypatch.setattr(desktop_mod, "tw_get", wiki)
+        desktop_mod.open_links.__wrapped__(ctx, urls=["neuro://a", "neuro://b"])
+        assert len(wiki.queries) == 1
+        assert story.titles == ["A", "B", "Old"]
+        assert [method for method, _ in story.requests] == ["GET", "PUT"]
+
+    def test_uuids_file(self, ctx, monkeypatch, tmp_path, story):
+        monkeypatch.setattr(desktop_mod, "tw_get", FakeWiki({"a": "A", "b": "B"}))
+        path = tmp_path / "links.txt"
+        path.write_text("neuro://b\na\n")
+        desktop_mod.open_links.__wrapped__(ctx, urls=["neuro://a"], uuids_file=str(path))
+        assert story.titles == ["A", "B", "Old"]
+
+    def test_reports_missing(self, ctx, monkeypatch, story, capsys):
+        monkeypatch.setattr(desktop_mod, "tw_get", FakeWiki({"a": "A"}))
+        desktop_mod.open_links.__wrapped__(ctx, urls=["neuro://a", "neuro://x"])
+        out = capsys.readouterr().out
+        assert "Not found: x" in out
+        assert "1 of 2" in out
+        assert story.titles == ["A", "Old"]
+
+    def test_nothing_found_leaves_story(self, ctx, monkeypatch, story):
+        monkeypatch.setattr(desktop_mod, "tw_get", FakeWiki({}))
+        desktop_mod.open_links.__wrapped__(ctx, urls=["neuro://x"])
+        assert story.requests == []
+
+    def test_fills_cache(self, ctx, monkeypatch, tmp_path, story):
+        monkeypatch.setattr(desktop_mod, "tw_get", FakeWiki({"a": "A"}))
+        desktop_mod.open_links.__wrapped__(ctx, urls=["neuro://a"])
+        assert desktop_mod.TitleCache(str(tmp_path / "neuro-ids.json")).get("a") == "A"
+
+    def test_not_running(self, ctx, monkeypatch):
+        monkeypatch.setattr(desktop_mod.network_utils, "is_port_in_use", lambda p: False)
+        with pytest.raises(SystemExit):
+            desktop_mod.open_links.__wrapped__(ctx, urls=["neuro://a"])
+
+
+class TestProtocolResolver:
+    @pytest.fixture(autouse=True)
+    def _running(self, monkeypatch):
+        monkeypatch.setenv("PORT", "8080")
+        monkeypatch.setattr(desktop_mod.network_utils, "is_port_in_use", lambda p: True)
+
+    def test_refresh_builds_map(self, monkeypatch):
+        monkeypatch.setattr(desktop_mod, "tw_get",
+                            FakeWiki({"abc-1": "First", "abc-2": "Title with spaces"}))
+        resolver = desktop_mod.ProtocolResolver()
+        resolver.refresh()
+        assert resolver.cache.entries == {"abc-1": "First", "abc-2": "Title with spaces"}
+
+    def test_warm_map_answers_without_queries(self, monkeypatch):
+        wiki = FakeWiki({"abc-1": "First"})
+        monkeypatch.setattr(desktop_mod, "tw_get", wiki)
+        resolver = desktop_mod.ProtocolResolver()
+        assert resolver.resolve("abc-1") == "First"
+        assert resolver.resolve("abc-1") == "First"
+        assert wiki.queries == [desktop_mod.ID_MAP_FILTER]
+
+    def test_stale_map_is_reloaded(self, monkeypatch):
+        wiki = FakeWiki({"abc-1": "First", "abc-2": "Second"})
+        monkeypatch.setattr(desktop_mod, "tw_get", wiki)
+        resolver = desktop_mod.ProtocolResolver(ttl=0)
+        resolver.resolve("abc-1")
+        wiki.tiddlers = {"abc-1": "Renamed"}
+        assert resolver.resolve("abc-1") == "Renamed"
+        assert "abc-2" not in resolver.cache.entries
+
+    def test_miss_uses_exact_lookup(self, monkeypatch):
+        wiki = FakeWiki({"abc-1": "First"})
+        monkeypatch.setattr(desktop_mod, "tw_get", wiki)
+        resolver = desktop_mod.ProtocolResolver()
+        resolver.resolve("abc-1")
+        wiki.tiddlers["abc-2"] = "New"
+        assert resolver.resolve("abc-2") == "New"
+        assert wiki.queries.count(desktop_mod.ID_MAP_FILTER) == 1
+
+    def test_open(self, monkeypatch):
+        opened = []
+        monkeypatch.setattr(desktop_mod, "tw_get", FakeWiki({"abc-1": "First"}))
+        monkeypatch.setattr(desktop_mod.tw_actions, "open_tiddler", lambda t: opened.append(t))
+        response = desktop_mod.ProtocolResolver().open("abc-1")
+        assert response == {"status": "opened", "title": "First"}
+        assert opened == ["First"]
+
+    def test_open_not_found(self, monkeypatch):
+        monkeypatch.setattr(desktop_mod, "tw_get", FakeWiki({}))
+        assert desktop_mod.ProtocolResolver().open("abc-1") == {"status": "not found"}
+
+    def test_open_not_running(self, monkeypatch):
+        monkeypatch.setattr(desktop_mod.network_utils, "is_port_in_use", lambda p: False)
+        assert desktop_mod.ProtocolResolver().open("abc-1") == {"status": "not running"}
+
+    def test_connected_skips_port_probe(self, monkeypatch):
+        probes = []
+        monkeypatch.setattr(desktop_mod.network_utils, "is_port_in_use", lambda p: probes.append(p) or True)
+        monkeypatch.setattr(desktop_mod, "tw_get", FakeWiki({"abc-1": "First"}))
+        monkeypatch.setattr(desktop_mod.tw_actions, "open_tiddler", lambda t: None)
+        resolver = desktop_mod.ProtocolResolver()
+        resolver.open("abc-1")
+        resolver.open("abc-1")
+        assert probes == ["8080"]
+
+    def test_failed_request_marks_not_running(self, monkeypatch):
+        monkeypatch.setattr(desktop_mod, "tw_get", FakeWiki({"abc-1": "First"}))
+        resolver = desktop_mod.ProtocolResolver()
+        resolver.connected = True
+
+        def closed(title):
+            raise ConnectionRefusedError("connection refused")
+
+        monkeypatch.setattr(desktop_mod.tw_actions, "open_tiddler", closed)
+        assert resolver.open("abc-1") == {"status": "not running"}
+        assert not resolver.connected
+
+
+class FakeResolver:
+    def __init__(self):
+        self.requests = []
+        self.cache = desktop_mod.TitleCache()
+
+    def open(self, uuid):
+        self.requests.append(uuid)
+        return {"status": "opened", "title": uuid.upper()}
+
+
+class TestProtocolServer:
+    @pytest.fixture
+    def server(self, monkeypatch, tmp_path):
+        socket_path = str(tmp_path / "p.sock")
+        monkeypatch.setattr(desktop_mod.protocol, "get_socket_path", lambda: socket_path)
+        server = desktop_mod.socketserver.UnixStreamServer(socket_path, desktop_mod.ProtocolHandler)
+        server.resolver = FakeResolver()
+        thread = threading.Thread(target=server.serve_forever)
+        thread.start()
+        yield server
+        server.shutdown()
+        server.server_close()
+        thread.join()
+
+    def test_ping(self, server):
+        assert desktop_mod.protocol.ping()
+
+    def test_forwards_uuid(self, server):
+        response = desktop_mod.protocol.request("abc-1")
+        assert response == {"status": "opened", "title": "ABC-1"}
+        assert server.resolver.requests == ["abc-1"]
+
+    def test_client_main(self, server):
+        assert desktop_mod.protocol.main(["neuro://abc-1", "neuro://abc-2"]) == 0
+        assert server.resolver.requests == ["abc-1", "abc-2"]
+
+    def test_invalidate(self, server):
+        server.resolver.cache.put("abc-1", "First")
+        server.resolver.cache.put("abc-2", "Second")
+        assert desktop_mod.protocol.invalidate("abc-1")
+        assert list(server.resolver.cache.entries) == ["abc-2"]
+        assert desktop_mod.protocol.invalidate()
+        assert not server.resolver.cache.entries
+
+    def test_failed_handler_falls_back(self, server, monkeypatch):
+        def fail(uuid):
+            raise OSError("TW5 HTTP error")
+
+        calls = []
+        monkeypatch.setattr(server.resolver, "open", fail)
+        monkeypatch.setattr(desktop_mod.protocol.subprocess, "run",
+                            lambda cmd, **kw: calls.append(cmd) or SubprocessResult(0))
+        assert desktop_mod.protocol.main(["neuro://abc-1"]) == 0
+        assert calls[0][-1] == "neuro://abc-1"
+
+
+class TestProtocolShutdown:
+    def test_shutdown_stops_server(self, monkeypatch, tmp_path):
+        socket_path = str(tmp_path / "p.sock")
+        monkeypatch.setattr(desktop_mod.protocol, "get_socket_path", lambda: socket_path)
+        monkeypatch.setattr(desktop_mod, "ProtocolResolver", FakeResolver)
+        thread = threading.Thread(target=desktop_mod.serve_protocol, args=(socket_path,))
+        thread.start()
+        deadline = time.monotonic() + 5
+        while not desktop_mod.protocol.ping() and time.monotonic() < deadline:
+            time.sleep(0.01)
+        assert desktop_mod.protocol.shutdown()
+        thread.join(timeout=5)
+        assert not thread.is_alive()
+        assert not os.path.exists(socket_path)
+
+
+class TestStartProtocolDaemon:
+    def test_spawns_when_not_running(self, monkeypatch):
+        spawned = []
+        monkeypatch.setattr(desktop_mod.protocol, "ping", lambda: False)
+        monkeypatch.setattr(desktop_mod.subprocess, "Popen", lambda cmd, **kw: spawned.append(cmd))
+        desktop_mod.start_protocol_daemon()
+        assert spawned[0][-1] == "desktop.protocol-daemon"
+
+    def test_reuses_running_daemon(self, monkeypatch):
+        spawned = []
+        monkeypatch.setattr(desktop_mod.protocol, "ping", lambda: True)
+        monkeypatch.setattr(desktop_mod.subprocess, "Popen", lambda cmd, **kw: spawned.append(cmd))
+        desktop_mod.start_protocol_daemon()
+        assert spawned == []
+
 
 # ---------------------------------------------------------------------------
 # Task: build
@@ -194,79 +592,412 @@ class TestBuild:
 # Task: run
 # ---------------------------------------------------------------------------
 
+class StatusHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path != "/status":
+            self.send_error(404)
+            return
+        body = json.dumps({"username": "", "tiddlywiki_version": "5.3.0"}).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def status_server():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), StatusHandler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server.server_address[1]
+    server.shutdown()
+    server.server_close()
+
+
+class TestServerReady:
+    def test_ready(self, status_server):
+        assert desktop_mod.server_ready(status_server) is True
+
+    def test_nothing_listening(self):
+        with socket.socket() as sock:
+            sock.bind(("127.0.0.1", 0))  # bound but not listening
+            assert desktop_mod.server_ready(sock.getsockname()[1]) is False
+
+
+class TestWaitUntilReady:
+    def test_ready(self, monkeypatch):
+        answers = iter([False, False, True])
+        monkeypatch.setattr(desktop_mod, "server_ready", lambda port: next(answers))
+        monkeypatch.setattr(desktop_mod.time, "sleep", lambda s: None)
+        assert desktop_mod.wait_until_ready(FakePopen(), 8080) == "ready"
+
+    def test_exited(self, monkeypatch):
+        monkeypatch.setattr(desktop_mod, "server_ready", lambda port: False)
+        assert desktop_mod.wait_until_ready(FakePopen(poll_result=1), 8080) == "exited"
+
+    def test_timeout(self, monkeypatch):
+        monkeypatch.setattr(desktop_mod, "server_ready", lambda port: False)
+        monkeypatch.setattr(desktop_mod.time, "sleep", lambda s: None)
+        assert desktop_mod.wait_until_ready(FakePopen(), 8080, timeout=0) == "timeout"
+
+
 class TestRunTask:
+    @pytest.fixture
+    def app_dir(self, monkeypatch, tmp_path):
+        app_dir = tmp_path / "app"
+        app_dir.mkdir()
+        (app_dir / "nw").write_text("fake")
+        monkeypatch.setattr(desktop_mod, "get_app_dir", lambda: str(app_dir))
+        monkeypatch.setattr(desktop_mod, "get_pid_path", lambda: str(tmp_path / "nw.pid"))
+        monkeypatch.setattr(desktop_mod, "start_protocol_daemon", Recorder())
+        monkeypatch.setattr(desktop_mod.time, "sleep", lambda s: None)
+        return app_dir
+
     def test_no_binary_exits(self, ctx, monkeypatch, tmp_path):
         monkeypatch.setattr(desktop_mod, "get_app_dir", lambda: str(tmp_path))
         with pytest.raises(SystemExit):
             desktop_mod.run.__wrapped__(ctx)
 
-    def test_launches_nwjs(self, ctx, monkeypatch, tmp_path, capsys):
-        app_dir = tmp_path / "app"
-        app_dir.mkdir()
-        nw = app_dir / "nw"
-        nw.write_text("fake")
-        pid_path = tmp_path / "nw.pid"
-
-        monkeypatch.setattr(desktop_mod, "get_app_dir", lambda: str(app_dir))
-        monkeypatch.setattr(desktop_mod, "get_pid_path", lambda: str(pid_path))
-        monkeypatch.setattr(desktop_mod.time, "sleep", lambda s: None)
+    def test_launches_nwjs(self, ctx, monkeypatch, app_dir, tmp_path, capsys):
+        answers = iter([False, False, True])
+        monkeypatch.setattr(desktop_mod, "server_ready", lambda port: next(answers))
         monkeypatch.setattr(desktop_mod.subprocess, "Popen",
                             lambda *a, **kw: FakePopen(pid=999))
         desktop_mod.run.__wrapped__(ctx)
         out = capsys.readouterr().out
         assert "999" in out
-        assert pid_path.exists()
-
-    def test_already_running(self, ctx, monkeypatch, tmp_path, capsys):
-        app_dir = tmp_path / "app"
-        app_dir.mkdir()
-        nw = app_dir / "nw"
-        nw.write_text("fake")
+        assert "interactive in" in out
+        assert (tmp_path / "nw.pid").read_text() == "999"
+        assert desktop_mod.start_protocol_daemon.call_count == 1
 
-        monkeypatch.setattr(desktop_mod, "get_app_dir", lambda: str(app_dir))
-        monkeypatch.setattr(desktop_mod.time, "sleep", lambda s: None)
-        monkeypatch.setattr(desktop_mod.subprocess, "Popen",
-                            lambda *a, **kw: FakePopen(poll_result=1))
+    def test_already_running(self, ctx, monkeypatch, app_dir, capsys):
+        monkeypatch.setattr(desktop_mod, "server_ready", lambda port: True)
+        monkeypatch.setattr(desktop_mod.subprocess, "Popen", Recorder())
         desktop_mod.run.__wrapped__(ctx)
         out = capsys.readouterr().out
         assert "Already running" in out
+        assert desktop_mod.subprocess.Popen.call_count == 0
+
+    def test_live_pid_counts_as_running(self, ctx, monkeypatch, app_dir, tmp_path, capsys):
+        (tmp_path / "nw.pid").write_text(str(os.getpid()))
+        monkeypatch.setattr(desktop_mod, "is_desktop_process", lambda pid: True)
+        monkeypatch.setattr(desktop_mod, "server_ready", lambda port: False)
+        monkeypatch.setattr(desktop_mod.subprocess, "Popen", Recorder())
+        desktop_mod.run.__wrapped__(ctx)
+        assert "Already running" in capsys.readouterr().out
+        assert desktop_mod.subprocess.Popen.call_count == 0
+
+    def test_exited_without_server_fails(self, ctx, monkeypatch, app_dir, tmp_path):
+        monkeypatch.setattr(desktop_mod, "server_ready", lambda port: False)
+        monkeypatch.setattr(desktop_mod.subprocess, "Popen",
+                            lambda *a, **kw: FakePopen(poll_result=1))
+        with pytest.raises(SystemExit):
+            desktop_mod.run.__wrapped__(ctx)
+        assert not (tmp_path / "nw.pid").exists()
+
+    def test_timeout_fails(self, ctx, monkeypatch, app_dir):
+        monkeypatch.setattr(desktop_mod, "server_ready", lambda port: False)
+        monkeypatch.setattr(desktop_mod.subprocess, "Popen", lambda *a, **kw: FakePopen())
+        with pytest.raises(SystemExit):
+            desktop_mod.run.__wrapped__(ctx, timeout=0)
+        assert desktop_mod.start_protocol_daemon.call_count == 0
+
+
+# ---------------------------------------------------------------------------
+# Task: profile
+# ---------------------------------------------------------------------------
+
+class TestTreeUsage:
+    def test_includes_children(self):
+        child = subprocess.Popen([sys.executable, "-c", "import time; time.sleep(30)"])
+        try:
+            table = desktop_mod.read_proc_table()
+            assert table[child.pid][0] == os.getpid()
+            own_rss = desktop_mod.read_rss(os.getpid())
+            rss, cpu, processes = desktop_mod.tree_usage(os.getpid(), table)
+            assert rss >= own_rss + desktop_mod.read_rss(child.pid)
+            assert cpu > 0
+            assert processes >= 2
+        finally:
+            child.kill()
+            child.wait()
+
+    def test_gone(self):
+        assert desktop_mod.tree_usage(999999999, {}) is None
+
+
+class TestRecordSamples:
+    def test_writes_time_series(self, tmp_path, monkeypatch):
+        monkeypatch.setattr(desktop_mod.time, "sleep", lambda s: None)
+        path = tmp_path / "profile.ndjson"
+        samples = desktop_mod.record_samples(os.getpid(), str(path), duration=0)
+        assert len(samples) == 1
+        assert json.loads(path.read_text()) == samples[0]
+        assert samples[0]["rss"] > 0
+        assert samples[0]["cpu"] is None
+
+    def test_stops_when_process_exits(self, tmp_path, monkeypatch):
+        usages = iter([(100, 1.0, 2), (200, 1.5, 2), None])
+        monkeypatch.setattr(desktop_mod, "tree_usage", lambda pid: next(usages))
+        monkeypatch.setattr(desktop_mod.time, "sleep", lambda s: None)
+        samples = desktop_mod.record_samples(12345, str(tmp_path / "p.ndjson"))
+        assert [s["rss"] for s in samples] == [100, 200]
+        assert samples[1]["cpu"] is not None
+
+    def test_stops_on_interrupt(self, tmp_path, monkeypatch):
+        def interrupt(seconds):
+            raise KeyboardInterrupt
+
+        monkeypatch.setattr(desktop_mod.time, "sleep", interrupt)
+        samples = desktop_mod.record_samples(os.getpid(), str(tmp_path / "p.ndjson"))
+        assert len(samples) == 1
+
+
+class TestSummarizeProfile:
+    def test_growth_rate(self):
+        samples = [
+            {"elapsed": t, "rss": 100 * desktop_mod.MIB + t * 1000, "cpu": cpu}
+            for t, cpu in [(0, None), (60, 10.0), (120, 20.0)]
+        ]
+        summary = desktop_mod.summarize_profile(samples)
+        assert summary["rss_peak"] == 100 * desktop_mod.MIB + 120000
+        assert summary["rss_growth_per_hour"] == 3600 * 1000
+        assert summary["cpu_mean"] == 15.0
+        assert "heap" not in summary
+
+    def test_no_samples(self, capsys):
+        summary = desktop_mod.summarize_profile([])
+        assert summary["rss_growth_per_hour"] is None
+        desktop_mod.print_profile(summary)
+        assert "No samples" in capsys.readouterr().out
+
+    def test_heap_growth_ranks_by_delta(self, monkeypatch):
+        sizes = {
+            "start": {"Tiddler": [10, 1000], "(string)": [100, 50000]},
+            "end": {"Tiddler": [500, 50000], "(string)": [110, 52000], "Widget": [5, 500]},
+        }
+        monkeypatch.setattr(desktop_mod.devtools, "heap_type_sizes", lambda path: sizes[path])
+        rows = desktop_mod.heap_growth("start", "end")
+        assert [row["type"] for row in rows] == ["Tiddler", "(string)", "Widget"]
+        assert rows[0]["count_delta"] == 490
+
+    def test_single_snapshot_ranks_by_size(self, monkeypatch):
+        monkeypatch.setattr(desktop_mod.devtools, "heap_type_sizes",
+                            lambda path: {"Tiddler": [500, 50000], "(string)": [110, 52000]})
+        rows = desktop_mod.heap_growth("end", "end", top=1)
+        assert [row["type"] for row in rows] == ["(string)"]
+
+
+class TestProfileTask:
+    @pytest.fixture
+    def running(self, monkeypatch):
+        monkeypatch.setattr(desktop_mod, "running_pid", lambda: 12345)
+        monkeypatch.setattr(desktop_mod, "pid_alive", lambda pid: True)
+        samples = [{"elapsed": 0, "rss": desktop_mod.MIB, "cpu": None}]
+        rec = Recorder(return_value=samples)
+        monkeypatch.setattr(desktop_mod, "record_samples", rec)
+        return rec
+
+    def test_not_running(self, ctx, monkeypatch):
+        monkeypatch.setattr(desktop_mod, "running_pid", lambda: None)
+        with pytest.raises(SystemExit):
+            desktop_mod.profile.__wrapped__(ctx)
+
+    def test_writes_summary(self, ctx, running, tmp_path, capsys):
+        output = tmp_path / "out" / "run"
+        desktop_mod.profile.__wrapped__(ctx, interval="0.5", duration="10", output=str(output))
+        assert running.calls[0][0] == (12345, f"{output}.ndjson", 0.5, 10.0)
+        summary = json.loads((tmp_path / "out" / "run-summary.json").read_text())
+        assert summary["samples"] == 1
+        assert "Samples: 1" in capsys.readouterr().out
+
+    def test_heap_needs_devtools_port(self, ctx, running, monkeypatch):
+        monkeypatch.delenv("DESKTOP_DEVTOOLS_PORT", raising=False)
+        with pytest.raises(SystemExit):
+            desktop_mod.profile.__wrapped__(ctx, heap=True)
+
+    def test_heap_snapshots(self, ctx, running, monkeypatch, tmp_path):
+        monkeypatch.setenv("DESKTOP_DEVTOOLS_PORT", "9222")
+        taken = []
+        monkeypatch.setattr(desktop_mod.devtools, "take_heap_snapshot", lambda port, path: taken.append(path))
+        monkeypatch.setattr(desktop_mod, "heap_growth", lambda first, last, top: [])
+        monkeypatch.setattr(desktop_mod.terminal_style, "step", noop_step)
+        output = tmp_path / "run"
+        desktop_mod.profile.__wrapped__(ctx, heap=True, output=str(output))
+        assert taken == [f"{output}-start.heapsnapshot", f"{output}-end.heapsnapshot"]
 
 
 # ---------------------------------------------------------------------------
 # Task: close
 # ---------------------------------------------------------------------------
 
+class FakeProcess:
+    """os.kill stand-in for one process: exits on SIGTERM unless hung, always on SIGKILL."""
+
+    def __init__(self, pid=12345, alive=True, hung=False):
+        self.pid = pid
+        self.alive = alive
+        self.hung = hung
+        self.signals = []
+
+    def kill(self, pid, sig):
+        if pid != self.pid or not self.alive:
+            raise ProcessLookupError()
+        if sig == 0:
+            return
+        self.signals.append(sig)
+        if sig == signal.SIGKILL or not self.hung:
+            self.alive = False
+
+
+class TestRequestFlush:
+    def test_no_devtools_port(self, monkeypatch):
+        monkeypatch.setattr(desktop_mod.devtools, "evaluate", Recorder())
+        assert desktop_mod.request_flush(None) is None
+        assert desktop_mod.devtools.evaluate.call_count == 0
+
+    def test_unreachable(self):
+        with socket.socket() as sock:
+            sock.bind(("127.0.0.1", 0))
+            assert desktop_mod.request_flush(sock.getsockname()[1]) is None
+
+    def test_no_syncer(self, monkeypatch):
+        monkeypatch.setattr(desktop_mod.devtools, "evaluate", lambda port, expression, timeout: None)
+        assert desktop_mod.request_flush(9222) is None
+
+    def test_dirty(self, monkeypatch):
+        monkeypatch.setattr(desktop_mod.devtools, "evaluate", lambda port, expression, timeout: True)
+        assert desktop_mod.request_flush(9222) is True
+
+    def test_flush_waits_until_clean(self, monkeypatch):
+        answers = iter([True, True, False])
+        calls = []
+
+        def fake_request(port, expression=desktop_mod.SYNCER_DIRTY, timeout=1):
+            calls.append(expression)
+            return next(answers)
+
+        monkeypatch.setattr(desktop_mod, "request_flush", fake_request)
+        monkeypatch.setattr(desktop_mod.time, "sleep", lambda s: None)
+        initial, dirty, _ = desktop_mod.flush_desktop(9222)
+        assert (initial, dirty) == (True, False)
+        assert calls == [desktop_mod.SYNCER_FLUSH, desktop_mod.SYNCER_DIRTY, desktop_mod.SYNCER_DIRTY]
+
+    def test_flush_deadline(self, monkeypatch):
+        monkeypatch.setattr(desktop_mod, "request_flush", lambda port, expression=None, timeout=1: True)
+        initial, dirty, _ = desktop_mod.flush_desktop(9222, timeout=0)
+        assert (initial, dirty) == (True, True)
+
+
+class TestRunningPid:
+    @pytest.fixture
+    def pid_path(self, monkeypatch, tmp_path):
+        pid_path = tmp_path / "nw.pid"
+        monkeypatch.setattr(desktop_mod, "get_pid_path", lambda: str(pid_path))
+        return pid_path
+
+    def test_other_binary_is_not_the_desktop(self, monkeypatch, tmp_path):
+        monkeypatch.setattr(desktop_mod, "get_app_dir", lambda: str(tmp_path))
+        assert not desktop_mod.is_desktop_process(os.getpid())
+
+    def test_own_binary_is_the_desktop(self, monkeypatch):
+        monkeypatch.setattr(desktop_mod, "get_app_dir", lambda: "/app")
+        monkeypatch.setattr(desktop_mod.os.path, "realpath",
+                            lambda path: "/app/nw" if path.endswith("/exe") else path)
+        assert desktop_mod.is_desktop_process(os.getpid())
+
+    def test_stale_pid_file_removed(self, pid_path, monkeypatch):
+        pid_path.write_text(str(os.getpid()))
+        monkeypatch.setattr(desktop_mod, "is_desktop_process", lambda pid: False)
+        assert desktop_mod.running_pid() is None
+        assert not pid_path.exists()
+
+    def test_running_desktop(self, pid_path, monkeypatch):
+        pid_path.write_text(str(os.getpid()))
+        monkeypatch.setattr(desktop_mod, "is_desktop_process", lambda pid: True)
+        assert desktop_mod.running_pid() == os.getpid()
+        assert pid_path.exists()
+
+    def test_no_pid_file(self, pid_path):
+        assert desktop_mod.running_pid() is None
+
+
 class TestCloseTask:
+    @pytest.fixture(autouse=True)
+    def _patch_protocol(self, monkeypatch):
+        rec = Recorder(return_value=False)
+        monkeypatch.setattr(desktop_mod.protocol, "shutdown", rec)
+        return rec
+
+    @pytest.fixture
+    def pid_path(self, monkeypatch, tmp_path):
+        pid_path = tmp_path / "nw.pid"
+        pid_path.write_text("12345")
+        monkeypatch.setattr(desktop_mod, "get_pid_path", lambda: str(pid_path))
+        monkeypatch.setattr(desktop_mod.time, "sleep", lambda s: None)
+        return pid_path
+
+    @pytest.fixture
+    def process(self, monkeypatch):
+        process = FakeProcess()
+        monkeypatch.setattr(os, "kill", process.kill)
+        monkeypatch.setattr(desktop_mod, "is_desktop_process", lambda pid: pid == process.pid)
+        return process
+
+    @pytest.fixture
+    def flush(self, monkeypatch):
+        answers = {desktop_mod.SYNCER_FLUSH: True, desktop_mod.SYNCER_DIRTY: False}
+        monkeypatch.setattr(desktop_mod, "request_flush",
+                            lambda port, expression=desktop_mod.SYNCER_DIRTY, timeout=1: answers[expression])
+        return answers
+
+    def test_stops_protocol_daemon(self, ctx, pid_path, process, flush, _patch_protocol, capsys):
+        _patch_protocol.return_value = True
+        desktop_mod.close.__wrapped__(ctx)
+        assert _patch_protocol.call_count == 1
+        assert "Stopped neuro:// protocol daemon" in capsys.readouterr().out
+
     def test_no_pid_file(self, ctx, monkeypatch, tmp_path, capsys):
         monkeypatch.setattr(desktop_mod, "get_pid_path", lambda: str(tmp_path / "nw.pid"))
         desktop_mod.close.__wrapped__(ctx)
         out = capsys.readouterr().out
         assert "already closed" in out
 
-    def test_kills_process(self, ctx, monkeypatch, tmp_path, capsys):
-        pid_path = tmp_path / "nw.pid"
-        pid_path.write_text("12345")
-        monkeypatch.setattr(desktop_mod, "get_pid_path", lambda: str(pid_path))
-
-        killed = []
-        monkeypatch.setattr(os, "kill", lambda pid, sig: killed.append((pid, sig)))
+    def test_flushes_then_terminates(self, ctx, pid_path, process, flush, capsys):
         desktop_mod.close.__wrapped__(ctx)
-
-        assert killed == [(12345, signal.SIGTERM)]
+        assert process.signals == [signal.SIGTERM]
         assert not pid_path.exists()
         out = capsys.readouterr().out
+        assert "Flushed pending saves" in out
         assert "Closed" in out
 
-    def test_process_already_gone(self, ctx, monkeypatch, tmp_path, capsys):
-        pid_path = tmp_path / "nw.pid"
-        pid_path.write_text("99999")
-        monkeypatch.setattr(desktop_mod, "get_pid_path", lambda: str(pid_path))
-
-        def fake_kill(pid, sig):
-            raise ProcessLookupError()
-        monkeypatch.setattr(os, "kill", fake_kill)
+    def test_no_syncer_closes_quietly(self, ctx, pid_path, process, monkeypatch, capsys):
+        monkeypatch.setattr(desktop_mod, "request_flush", lambda port, expression=None, timeout=1: None)
         desktop_mod.close.__wrapped__(ctx)
+        assert process.signals == [signal.SIGTERM]
+        assert desktop_mod.terminal_style.FAIL not in capsys.readouterr().out
+
+    def test_escalates_to_sigkill(self, ctx, pid_path, process, flush, capsys):
+        process.hung = True
+        desktop_mod.close.__wrapped__(ctx, timeout=0)
+        assert process.signals == [signal.SIGTERM, signal.SIGKILL]
+        assert "Killed" in capsys.readouterr().out
+        assert not pid_path.exists()
 
+    def test_process_already_gone(self, ctx, pid_path, process, capsys):
+        process.alive = False
+        desktop_mod.close.__wrapped__(ctx)
         out = capsys.readouterr().out
         assert "already closed" in out
+        assert process.signals == []
+        assert not pid_path.exists()
+
+    def test_reused_pid_not_signalled(self, ctx, pid_path, process, monkeypatch, capsys):
+        monkeypatch.setattr(desktop_mod, "is_desktop_process", lambda pid: False)
+        desktop_mod.close.__wrapped__(ctx)
+        assert process.signals == []
         assert not pid_path.exists()
+        assert "already closed" in capsys.readouterr().out
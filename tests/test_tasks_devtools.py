@@ -0,0 +1,231 @@
+"""
+Tests for tasks.devtools.
+"""
+
+import base64
+import hashlib
+import json
+import socket
+import struct
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+import tasks.devtools as devtools_mod
+
+# ---------------------------------------------------------------------------
+# Fake DevTools endpoint
+# ---------------------------------------------------------------------------
+
+NODE_TYPES = ["hidden", "array", "string", "object", "code", "closure"]
+
+
+def write_heapsnapshot(path, nodes):
+    """A .heapsnapshot with the given (type, name, self_size) nodes and no edges."""
+    strings = []
+    flat = []
+    for kind, name, size in nodes:
+        if name not in strings:
+            strings.append(name)
+        flat += [NODE_TYPES.index(kind), strings.index(name), len(flat), size, 0]
+    snapshot = {
+        "snapshot": {
+            "meta": {
+                "node_fields": ["type", "name", "id", "self_size", "edge_count"],
+                "node_types": [NODE_TYPES, "string", "number", "number", "number"],
+            },
+        },
+        "nodes": flat,
+        "edges": [],
+        "strings": strings,
+    }
+    path.write_text(json.dumps(snapshot))
+    return path
+
+
+def server_frame(opcode, payload, fin=True):
+    length = len(payload)
+    if length < 126:
+        header = bytes([(0x80 if fin else 0) | opcode, length])
+    elif length < 1 << 16:
+        header = bytes([(0x80 if fin else 0) | opcode, 126]) + struct.pack("!H", length)
+    else:
+        header = bytes([(0x80 if fin else 0) | opcode, 127]) + struct.pack("!Q", length)
+    return header + payload
+
+
+def read_client_frame(conn):
+    def exact(size):
+        data = b""
+        while len(data) < size:
+            chunk = conn.recv(size - len(data))
+            if not chunk:
+                raise ConnectionError
+            data += chunk
+        return data
+
+    first, second = exact(2)
+    assert second & 0x80, "client frames must be masked"
+    length = second & 0x7F
+    if length == 126:
+        length = struct.unpack("!H", exact(2))[0]
+    elif length == 127:
+        length = struct.unpack("!Q", exact(8))[0]
+    mask = exact(4)
+    payload = bytes(b ^ mask[i % 4] for i, b in enumerate(exact(length)))
+    return first & 0x0F, payload
+
+
+class FakeDevTools:
+    """Answers /json/list over HTTP and CDP HeapProfiler commands over a WebSocket."""
+
+    def __init__(self, chunks):
+        self.chunks = chunks
+        self.methods = []
+        self.ws = socket.socket()
+        self.ws.bind(("127.0.0.1", 0))
+        self.ws.listen(1)
+        threading.Thread(target=self.serve_ws, daemon=True).start()
+
+        fake = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                targets = [
+                    {"type": "background_page", "webSocketDebuggerUrl": "ws://127.0.0.1:1/devtools/page/BG"},
+                    {"type": "page", "webSocketDebuggerUrl": f"ws://127.0.0.1:{fake.ws.getsockname()[1]}/devtools/page/1"},
+                ]
+                body = json.dumps(targets).encode()
+                self.send_response(200)
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        self.http = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        threading.Thread(target=self.http.serve_forever, daemon=True).start()
+        self.port = self.http.server_address[1]
+
+    def serve_ws(self):
+        try:
+            conn, _ = self.ws.accept()
+        except OSError:
+            return  # closed by a test that never opened a session
+        with conn:
+            request = b""
+            while b"\r\n\r\n" not in request:
+                request += conn.recv(4096)
+            key = next(
+                line.split(": ", 1)[1] for line in request.decode().split("\r\n")
+                if line.lower().startswith("sec-websocket-key")
+            )
+            accept = base64.b64encode(hashlib.sha1((key + devtools_mod.WEBSOCKET_GUID).encode()).digest()).decode()
+            conn.sendall((
+                "HTTP/1.1 101 Switching Protocols\r\nUpgrade: websocket\r\nConnection: Upgrade\r\n"
+                f"Sec-WebSocket-Accept: {accept}\r\n\r\n"
+            ).encode())
+            while True:
+                try:
+                    opcode, payload = read_client_frame(conn)
+                except ConnectionError:
+                    return
+                if opcode == devtools_mod.OP_CLOSE:
+                    return
+                if opcode == devtools_mod.OP_PONG:
+                    continue
+                message = json.loads(payload)
+                self.methods.append(message["method"])
+                if message["method"] == "HeapProfiler.takeHeapSnapshot":
+                    conn.sendall(server_frame(devtools_mod.OP_PING, b"hi"))
+                    for chunk in self.chunks:
+                        event = json.dumps({"method": "HeapProfiler.addHeapSnapshotChunk", "params": {"chunk": chunk}})
+                        data = event.encode()
+                        # Send each event in two fragments to exercise reassembly.
+                        conn.sendall(server_frame(devtools_mod.OP_TEXT, data[:10], fin=False))
+                        conn.sendall(server_frame(devtools_mod.OP_CONTINUATION, data[10:]))
+                if message["method"] == "HeapProfiler.fail":
+                    reply = {"id": message["id"], "error": {"message": "nope"}}
+                elif message["method"] == "Runtime.evaluate":
+                    value = {"type": "boolean", "value": message["params"]["expression"] == "true"}
+                    reply = {"id": message["id"], "result": {"result": value}}
+                else:
+                    reply = {"id": message["id"], "result": {}}
+                conn.sendall(server_frame(devtools_mod.OP_TEXT, json.dumps(reply).encode()))
+
+    def close(self):
+        self.http.shutdown()
+        self.http.server_close()
+        self.ws.close()
+
+
+@pytest.fixture
+def snapshot_text(tmp_path):
+    path = write_heapsnapshot(tmp_path / "source.heapsnapshot", [("object", "Tiddler", 100)] * 5000)
+    text = path.read_text()
+    assert len(text) > 70000
+    return text
+
+
+@pytest.fixture
+def fake_devtools(snapshot_text):
+    # Chunks over 64 KiB use the 8-byte length header.
+    chunks = [snapshot_text[:70000], snapshot_text[70000:]]
+    fake = FakeDevTools([chunk for chunk in chunks if chunk])
+    yield fake
+    fake.close()
+
+
+# ---------------------------------------------------------------------------
+# Tests
+# ---------------------------------------------------------------------------
+
+class TestPageUrl:
+    def test_picks_page_target(self, fake_devtools):
+        assert devtools_mod.page_url(fake_devtools.port).endswith("/devtools/page/1")
+
+    def test_no_endpoint(self):
+        with socket.socket() as sock:
+            sock.bind(("127.0.0.1", 0))
+            with pytest.raises(devtools_mod.DevToolsError):
+                devtools_mod.page_url(sock.getsockname()[1])
+
+
+class TestSession:
+    def test_error_response(self, fake_devtools):
+        with devtools_mod.Session(devtools_mod.page_url(fake_devtools.port), timeout=5) as session:
+            assert session.call("HeapProfiler.enable") == {}
+            with pytest.raises(devtools_mod.DevToolsError, match="nope"):
+                session.call("HeapProfiler.fail")
+
+
+class TestEvaluate:
+    def test_returns_value(self, fake_devtools):
+        assert devtools_mod.evaluate(fake_devtools.port, "true", timeout=5) is True
+
+
+class TestTakeHeapSnapshot:
+    def test_streams_chunks_to_file(self, fake_devtools, snapshot_text, tmp_path):
+        path = tmp_path / "heap.heapsnapshot"
+        size = devtools_mod.take_heap_snapshot(fake_devtools.port, str(path), timeout=5)
+        assert path.read_text() == snapshot_text
+        assert size == len(snapshot_text)
+        assert fake_devtools.methods == [
+            "HeapProfiler.enable", "HeapProfiler.collectGarbage", "HeapProfiler.takeHeapSnapshot",
+        ]
+
+
+class TestHeapTypeSizes:
+    def test_groups_by_constructor_and_type(self, tmp_path):
+        path = write_heapsnapshot(tmp_path / "h.heapsnapshot", [
+            ("object", "Tiddler", 100),
+            ("object", "Tiddler", 60),
+            ("string", "some text", 40),
+            ("closure", "render", 32),
+        ])
+        assert devtools_mod.heap_type_sizes(str(path)) == {
+            "Tiddler": [2, 160],
+            "(string)": [1, 40],
+            "(closure)": [1, 32],
+        }
@@ -0,0 +1,166 @@
+"""
+Tests for tasks.pytest_plugins.nf_impact.
+"""
+
+import json
+import os
+
+import pytest
+
+from tasks.pytest_plugins import nf_impact
+
+pytest_plugins = ["pytester"]
+
+
+# ---------------------------------------------------------------------------
+# Fingerprints
+# ---------------------------------------------------------------------------
+
+class TestFingerprint:
+    def test_missing_file(self, tmp_path):
+        assert nf_impact.fingerprint(str(tmp_path / "gone.py")) is None
+
+    def test_reuses_previous_when_stat_matches(self, tmp_path):
+        path = tmp_path / "a.py"
+        path.write_text("x = 1\n")
+        st = os.stat(path)
+        previous = [st.st_mtime_ns, st.st_size, "cached"]
+        assert nf_impact.fingerprint(str(path), previous) is previous
+
+    def test_changed_files(self, tmp_path):
+        same, edited, gone = tmp_path / "same.py", tmp_path / "edited.py", tmp_path / "gone.py"
+        for path in (same, edited, gone):
+            path.write_text("x = 1\n")
+        files = {str(path): nf_impact.fingerprint(str(path)) for path in (same, edited, gone)}
+        edited.write_text("x = 2\n")
+        gone.unlink()
+        assert nf_impact.changed_files(files) == {str(edited), str(gone)}
+
+    def test_touch_without_edit_is_unchanged(self, tmp_path):
+        path = tmp_path / "a.py"
+        path.write_text("x = 1\n")
+        files = {str(path): nf_impact.fingerprint(str(path))}
+        os.utime(path, ns=(0, 10**9))
+        assert nf_impact.changed_files(files) == set()
+
+
+class TestImpactArgs:
+    def test_map_path(self, tmp_path):
+        args = nf_impact.impact_args(tmp_path / "neuro-unit.json")
+        assert args == ["-p", "nf_impact", f"--impact-map={tmp_path / 'neuro-unit.json'}"]
+
+    def test_global_paths(self, tmp_path):
+        args = nf_impact.impact_args(tmp_path / "neuro-unit.json", ["tw5-plugins", tmp_path])
+        assert args[3:] == ["--impact-global=tw5-plugins", f"--impact-global={tmp_path}"]
+
+    def test_walk_files_skips_python(self, tmp_path):
+        (tmp_path / "plugin").mkdir()
+        (tmp_path / "plugin" / "syncadaptor.js").write_text("")
+        (tmp_path / "plugin" / "helper.py").write_text("")
+        (tmp_path / "__pycache__").mkdir()
+        (tmp_path / "__pycache__" / "x.json").write_text("")
+        (tmp_path / "fixture.tid").write_text("")
+        assert nf_impact.walk_files([str(tmp_path)]) == {
+            str(tmp_path / "plugin" / "syncadaptor.js"), str(tmp_path / "fixture.tid"),
+        }
+
+    def test_env_adds_plugin_dir(self, monkeypatch):
+        monkeypatch.setenv("PYTHONPATH", "/elsewhere")
+        env = nf_impact.impact_env()
+        assert env["PYTHONPATH"] == nf_impact.PLUGIN_DIR + os.pathsep + "/elsewhere"
+
+
+# ---------------------------------------------------------------------------
+# Plugin
+# ---------------------------------------------------------------------------
+
+class TestPlugin:
+    @pytest.fixture
+    def project(self, pytester, monkeypatch):
+        monkeypatch.setenv("PYTHONPATH", os.pathsep.join([nf_impact.PLUGIN_DIR, str(pytester.path)]))
+        pytester.makeini("[pytest]\n")
+        pytester.mkpydir("pkg")
+        pytester.path.joinpath("pkg", "a.py").write_text("def f():\n    return 1\n")
+        pytester.path.joinpath("pkg", "b.py").write_text("def g():\n    return 2\n")
+        pytester.makepyfile(
+            test_a="from pkg import a\n\ndef test_a():\n    assert a.f() == 1\n",
+            test_b="from pkg import b\n\ndef test_b():\n    assert b.g() == 2\n",
+        )
+        return pytester
+
+    def run(self, pytester, *args):
+        impact_map = str(pytester.path / "impact.json")
+        return pytester.runpytest_subprocess("-p", "nf_impact", "--impact-map", impact_map, *args)
+
+    def test_first_run_records_map(self, project):
+        self.run(project).assert_outcomes(passed=2)
+        data = json.loads((project.path / "impact.json").read_text())
+        assert str(project.path / "pkg" / "a.py") in data["tests"]["test_a.py::test_a"]
+        assert str(project.path / "pkg" / "b.py") not in data["tests"]["test_a.py::test_a"]
+
+    def test_unchanged_deselects_everything(self, project):
+        self.run(project)
+        result = self.run(project)
+        result.assert_outcomes(deselected=2)
+        assert result.ret == nf_impact.NO_TESTS_COLLECTED
+
+    def test_runs_affected_tests(self, project):
+        self.run(project)
+        project.path.joinpath("pkg", "a.py").write_text("def f():\n    return 1  # edited\n")
+        self.run(project).assert_outcomes(passed=1, deselected=1)
+
+    def test_new_test_runs(self, project):
+        self.run(project)
+        project.makepyfile(test_c="def test_c():\n    pass\n")
+        self.run(project).assert_outcomes(passed=1, deselected=2)
+
+    def test_failure_keeps_last_green_map(self, project):
+        self.run(project)
+        project.path.joinpath("pkg", "b.py").write_text("def g():\n    return 3\n")
+        self.run(project).assert_outcomes(failed=1, deselected=1)
+        self.run(project).assert_outcomes(failed=1, deselected=1)
+
+    def test_filtered_out_tests_stay_affected(self, project):
+        self.run(project)
+        project.path.joinpath("pkg", "a.py").write_text("def f():\n    return 1  # edited\n")
+        self.run(project, "-k", "test_b").assert_outcomes(deselected=2)
+        self.run(project).assert_outcomes(passed=1, deselected=1)
+
+    def test_constant_change_reselects_importers(self, project):
+        project.path.joinpath("pkg", "consts.py").write_text("LIMIT = 3\n")
+        project.makepyfile(test_c="from pkg.consts import LIMIT\n\ndef test_c():\n    assert LIMIT == 3\n")
+        self.run(project).assert_outcomes(passed=3)
+        project.path.joinpath("pkg", "consts.py").write_text("LIMIT = 3  # edited\n")
+        self.run(project).assert_outcomes(passed=1, deselected=2)
+
+    def test_import_time_code_reselects_transitive_importers(self, project):
+        project.path.joinpath("pkg", "table.py").write_text("ROWS = [n * 2 for n in range(3)]\n")
+        project.path.joinpath("pkg", "b.py").write_text("from pkg.table import ROWS\n\ndef g():\n    return 2\n")
+        self.run(project).assert_outcomes(passed=2)
+        project.path.joinpath("pkg", "table.py").write_text("ROWS = [n * 3 for n in range(3)]\n")
+        result = self.run(project, "-v")
+        result.assert_outcomes(passed=1, deselected=1)
+        result.stdout.fnmatch_lines(["*test_b.py::test_b PASSED*"])
+
+    def test_ini_change_runs_everything(self, project):
+        self.run(project)
+        project.makeini("[pytest]\naddopts = -v\n")
+        self.run(project).assert_outcomes(passed=2)
+
+    def test_global_change_runs_everything(self, project):
+        data = project.path / "data"
+        data.mkdir()
+        (data / "a.tid").write_text("title: A\n")
+        self.run(project, "--impact-global", "data").assert_outcomes(passed=2)
+        self.run(project, "--impact-global", "data").assert_outcomes(deselected=2)
+        (data / "a.tid").write_text("title: A\n\nedited\n")
+        result = self.run(project, "--impact-global", "data")
+        result.assert_outcomes(passed=2)
+        assert "global dependencies changed" in result.stdout.str()
+
+    def test_new_global_file_runs_everything(self, project):
+        data = project.path / "data"
+        data.mkdir()
+        self.run(project, "--impact-global", "data")
+        (data / "b.json").write_text("{}")
+        self.run(project, "--impact-global", "data").assert_outcomes(passed=2)
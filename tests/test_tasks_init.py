@@ -0,0 +1,131 @@
+"""
+Tests for tasks (lazy collection) and its import-time budget.
+"""
+
+import importlib
+import json
+import os
+import subprocess
+import sys
+
+import invoke
+import pytest
+
+import tasks
+from tasks import lazy
+
+ROOT = os.path.join(os.path.dirname(__file__), "..")
+
+# Seconds allowed for `import tasks` plus listing every task, in a fresh interpreter.
+IMPORT_BUDGET = float(os.environ.get("NF_IMPORT_BUDGET", "1.0"))
+
+HEAVY_MODULES = ["neo4j", "neuro.base.api", "neuro.tools.tw5api", "tasks.components.neurobase"]
+
+
+def _fresh_import():
+    code = (
+        "import sys, time, json\n"
+        "started = time.perf_counter()\n"
+        "import tasks\n"
+        "names = tasks.ns.task_names\n"
+        "print(json.dumps({'seconds': time.perf_counter() - started, 'modules': sorted(sys.modules)}))\n"
+    )
+    result = subprocess.run([sys.executable, "-c", code], cwd=ROOT, capture_output=True, text=True, check=True)
+    return json.loads(result.stdout)
+
+
+# ---------------------------------------------------------------------------
+# Import time
+# ---------------------------------------------------------------------------
+
+class TestImportTime:
+    def test_skips_heavy_modules(self):
+        modules = _fresh_import()["modules"]
+        for name in HEAVY_MODULES:
+            assert name not in modules
+
+    def test_within_budget(self):
+        assert _fresh_import()["seconds"] < IMPORT_BUDGET
+
+
+# ---------------------------------------------------------------------------
+# Lazy collection
+# ---------------------------------------------------------------------------
+
+@pytest.fixture(params=tasks.MODULES)
+def module_pair(request):
+    module = importlib.import_module(request.param)
+    return lazy.lazy_collection(request.param), invoke.Collection.from_module(module)
+
+
+class TestLazyCollection:
+    def test_same_task_names(self, module_pair):
+        lazy_collection, eager_collection = module_pair
+        assert lazy_collection.name == eager_collection.name
+        assert lazy_collection.task_names == eager_collection.task_names
+
+    def test_same_arguments(self, module_pair):
+        lazy_collection, eager_collection = module_pair
+        for name in eager_collection.task_names:
+            lazy_args = [(a.names, a.kind, a.default, a.positional)
+                         for a in lazy_collection[name].get_arguments()]
+            eager_args = [(a.names, a.kind, a.default, a.positional)
+                          for a in eager_collection[name].get_arguments()]
+            assert lazy_args == eager_args
+
+    def test_same_help(self, module_pair):
+        lazy_collection, eager_collection = module_pair
+        for name in eager_collection.task_names:
+            assert invoke.util.helpline(lazy_collection[name]) == invoke.util.helpline(eager_collection[name])
+
+
+class TestLazyTask:
+    def test_pre_delegates(self):
+        import tasks.components.neurobase as neurobase_mod
+        start = tasks.ns["neurobase.start"]
+        assert start.pre == neurobase_mod.start.pre
+
+    def test_equals_loaded_task(self):
+        import tasks.actions.setup as setup_mod
+        assert tasks.ns["setup.env"] == setup_mod.env
+
+    def test_same_name_different_module(self):
+        assert tasks.ns["app.test"] != tasks.ns["neuro.test"]
+
+    def test_body_delegates(self, monkeypatch):
+        import tasks.components.nwjs as nwjs_mod
+        calls = []
+        monkeypatch.setattr(nwjs_mod.get, "body", lambda c, **kw: calls.append(kw))
+        tasks.ns["nwjs.get"](invoke.Context(), version="1.0")
+        assert calls == [{"version": "1.0"}]
+
+
+class TestEagerFallback:
+    @pytest.fixture
+    def module_name(self, monkeypatch, tmp_path):
+        (tmp_path / "nf_eager_tasks.py").write_text(
+            "import invoke\n"
+            "\n"
+            "TIMEOUT = 2\n"
+            "\n"
+            "\n"
+            "@invoke.task\n"
+            "def wait(c, timeout=2 * TIMEOUT):\n"
+            "    \"\"\"Wait.\"\"\"\n"
+            "\n"
+            "\n"
+            "@invoke.task(name=\"go\")\n"
+            "def run(c, fast=False):\n"
+            "    \"\"\"Go.\"\"\"\n"
+        )
+        monkeypatch.syspath_prepend(str(tmp_path))
+        yield "nf_eager_tasks"
+        sys.modules.pop("nf_eager_tasks", None)
+
+    def test_non_literal_default_imports_module(self, module_name, caplog):
+        collection = lazy.lazy_collection(module_name)
+        assert sorted(collection.task_names) == ["go", "wait"]
+        assert not any(isinstance(task, lazy.LazyTask) for task in collection.tasks.values())
+        assert collection["wait"].get_arguments()[0].default == 4
+        assert module_name in sys.modules
+        assert "task wait: 2 * TIMEOUT is not a literal" in caplog.text
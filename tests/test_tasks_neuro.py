@@ -5,12 +5,10 @@ Tests for tasks.components.neuro.
 from pathlib import Path
 
 import pytest
-
 from neuro.utils.test_utils import FakeContext, Recorder, SubprocessResult
 
 import tasks.components.neuro as neuro_mod
 
-
 # ---------------------------------------------------------------------------
 # Fixtures
 # ---------------------------------------------------------------------------
@@ -71,7 +69,7 @@ class TestRuff:
         assert patch_subprocess.last_args == (["nenv/bin/ruff", "check", Path("/neuro"), "--fix", "--select", "E"],)
 
     def test_nonzero_exit_raises(self, ctx, monkeypatch):
-        monkeypatch.setattr(neuro_mod.subprocess, "run", lambda args: SubprocessResult(1))
+        monkeypatch.setattr(neuro_mod.subprocess, "run", lambda args, check: SubprocessResult(1))
         with pytest.raises(SystemExit):
             neuro_mod.ruff.__wrapped__(ctx)
 
@@ -114,6 +112,12 @@ class TestTest:
         neuro_mod.test.__wrapped__(ctx, mode="integration")
         assert bundle_rec.call_count == 1
 
+    def test_bundled_skips_bundle(self, ctx, patch_subprocess, monkeypatch):
+        bundle_rec = Recorder()
+        monkeypatch.setattr(neuro_mod.tw5, "bundle", bundle_rec)
+        neuro_mod.test.__wrapped__(ctx, mode="e2e", bundled=True)
+        assert bundle_rec.call_count == 0
+
     def test_unit_skips_bundle(self, ctx, patch_subprocess, monkeypatch):
         bundle_rec = Recorder()
         monkeypatch.setattr(neuro_mod.tw5, "bundle", bundle_rec)
@@ -143,7 +147,7 @@ class TestTest:
             neuro_mod.test.__wrapped__(ctx, mode="bogus")
 
     def test_nonzero_exit_raises(self, ctx, monkeypatch):
-        monkeypatch.setattr(neuro_mod.subprocess, "run", lambda *a: SubprocessResult(1))
+        monkeypatch.setattr(neuro_mod.subprocess, "run", lambda *a, **kw: SubprocessResult(1))
         with pytest.raises(SystemExit):
             neuro_mod.test.__wrapped__(ctx, mode="unit")
 
@@ -153,6 +157,26 @@ class TestTest:
         assert "neuro/tests/core" in args
         assert "-v" in args
 
+    def test_impact_enables_plugin(self, ctx, patch_subprocess, monkeypatch):
+        monkeypatch.setattr(neuro_mod.internal_utils, "get_path", lambda k: Path("/nf"))
+        monkeypatch.delenv("NF_STATE", raising=False)
+        neuro_mod.test.__wrapped__(ctx, mode="unit", pytest_args="-v", impact=True)
+        args = patch_subprocess.last_args[0]
+        assert args[args.index("-p"):] == neuro_mod.nf_impact.impact_args(
+            "/nf/impact/neuro-unit.json", ["/nf/tw5-plugins", "/nf/tw5-editions", "neuro/tests"]
+        )
+        assert "-v" in args
+        assert neuro_mod.nf_impact.PLUGIN_DIR in patch_subprocess.last_kwargs["env"]["PYTHONPATH"]
+
+    def test_impact_all_deselected_succeeds(self, ctx, monkeypatch):
+        monkeypatch.setattr(neuro_mod.subprocess, "run", Recorder(return_value=SubprocessResult(5)))
+        neuro_mod.test.__wrapped__(ctx, mode="unit", impact=True)
+
+    def test_no_tests_without_impact_fails(self, ctx, monkeypatch):
+        monkeypatch.setattr(neuro_mod.subprocess, "run", Recorder(return_value=SubprocessResult(5)))
+        with pytest.raises(SystemExit):
+            neuro_mod.test.__wrapped__(ctx, mode="unit")
+
 
 # ---------------------------------------------------------------------------
 # test_local
@@ -176,6 +200,10 @@ class TestTestLocal:
         neuro_mod.test_local.__wrapped__(ctx, pytest_args="-k foo")
         assert patch_test.last_args[3] == "-k foo"
 
+    def test_passes_impact(self, ctx, patch_rsync, patch_test):
+        neuro_mod.test_local.__wrapped__(ctx, impact=True)
+        assert patch_test.last_args[4] is True
+
 
 # ---------------------------------------------------------------------------
 # test_branch
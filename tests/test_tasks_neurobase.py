@@ -2,13 +2,15 @@
 Tests for tasks.components.neurobase.
 """
 
-import pytest
+import json
+import threading
+from types import SimpleNamespace
 
+import pytest
 from neuro.utils.test_utils import FakeContext, Recorder, SubprocessResult, noop_step
 
 import tasks.components.neurobase as neurobase_mod
 
-
 # ---------------------------------------------------------------------------
 # Fixtures
 # ---------------------------------------------------------------------------
@@ -43,11 +45,22 @@ def patch_verify_neo4j(monkeypatch, request):
         monkeypatch.setattr(neurobase_mod, "verify_neo4j", lambda *a, **kw: None)
 
 
+@pytest.fixture(autouse=True)
+def patch_ensure_image(monkeypatch, request):
+    if request.node.cls and request.node.cls.__name__ != "TestImage":
+        monkeypatch.setattr(neurobase_mod, "ensure_image", lambda: "nbase:1.0-0123456789ab")
+
+
 # ---------------------------------------------------------------------------
 # create
 # ---------------------------------------------------------------------------
 
 class TestCreate:
+    @pytest.fixture(autouse=True)
+    def _patch_memory_settings(self, monkeypatch):
+        monkeypatch.setattr(neurobase_mod, "memory_settings",
+                            lambda name, instances=None: {"NEO4J_HEAP_SIZE": "1024m"})
+
     def test_already_exists(self, ctx, monkeypatch, subprocess_recorder):
         monkeypatch.setenv("BASE_NAME", "nb")
         monkeypatch.setattr(neurobase_mod.docker_tools, "container_exists", lambda n: True)
@@ -67,6 +80,207 @@ class TestCreate:
         neurobase_mod.create.__wrapped__(ctx, name="custom")
         assert subprocess_recorder.call_count == 0
 
+    def test_passes_memory_settings_to_compose(self, ctx, monkeypatch, subprocess_recorder):
+        monkeypatch.setenv("BASE_NAME", "ignored")
+        monkeypatch.setattr(neurobase_mod.docker_tools, "container_exists", lambda n: False)
+        monkeypatch.setattr(neurobase_mod.network_utils, "get_free_ports", lambda n: (17474, 17687))
+        neurobase_mod.create.__wrapped__(ctx, name="custom")
+        env = subprocess_recorder.calls[0][1]["env"]
+        assert env["BASE_NAME"] == "custom"
+        assert env["NEO4J_HEAP_SIZE"] == "1024m"
+        assert env["NBASE_TAG"] == "1.0-0123456789ab"
+
+    def test_named_instance_gets_free_ports(self, ctx, monkeypatch, subprocess_recorder, capsys):
+        monkeypatch.setenv("BASE_NAME", "nb")
+        monkeypatch.setenv("NEO4J_PORT_BOLT", "7687")
+        monkeypatch.setattr(neurobase_mod.docker_tools, "container_exists", lambda n: False)
+        monkeypatch.setattr(neurobase_mod.network_utils, "get_free_ports", lambda n: (17474, 17687))
+        neurobase_mod.create.__wrapped__(ctx, name="custom")
+        env = subprocess_recorder.calls[0][1]["env"]
+        assert (env["NEO4J_PORT_HTTP"], env["NEO4J_PORT_BOLT"]) == ("17474", "17687")
+        assert "NEO4J_URI=bolt://127.0.0.1:17687" in capsys.readouterr().out
+
+    def test_base_name_uses_environment_ports(self, ctx, monkeypatch, subprocess_recorder):
+        monkeypatch.setenv("BASE_NAME", "nb")
+        monkeypatch.setenv("NEO4J_PORT_BOLT", "7687")
+        monkeypatch.setattr(neurobase_mod.docker_tools, "container_exists", lambda n: False)
+        neurobase_mod.create.__wrapped__(ctx, name="nb")
+        assert subprocess_recorder.calls[0][1]["env"]["NEO4J_PORT_BOLT"] == "7687"
+
+
+# ---------------------------------------------------------------------------
+# image
+# ---------------------------------------------------------------------------
+
+class TestImage:
+    @pytest.fixture(autouse=True)
+    def _setup(self, monkeypatch, tmp_path):
+        (tmp_path / "Dockerfile").write_text("FROM neo4j:${NEO4J_BASE_VERSION}\n")
+        monkeypatch.setattr(neurobase_mod.internal_utils, "get_path", lambda k, **kw: tmp_path)
+        monkeypatch.setattr(neurobase_mod.docker_tools, "verify_access", lambda: None)
+        monkeypatch.setenv("NBASE_IMAGE", "nbase")
+        monkeypatch.setenv("NBASE_VERSION", "1.0")
+        monkeypatch.setenv("NEO4J_VERSION", "5.26.7")
+        monkeypatch.delenv("APOC_EXTENDED_VERSION", raising=False)
+        self.dockerfile = tmp_path / "Dockerfile"
+
+    def test_tag_is_stable_hash(self):
+        image = neurobase_mod.get_image()
+        assert image.startswith("nbase:1.0-")
+        assert len(image.rsplit("-", 1)[1]) == neurobase_mod.IMAGE_HASH_LENGTH
+        assert neurobase_mod.get_image() == image
+
+    def test_tag_changes_with_dockerfile_and_versions(self, monkeypatch):
+        image = neurobase_mod.get_image()
+        monkeypatch.setenv("APOC_EXTENDED_VERSION", "5.26.0")
+        with_apoc = neurobase_mod.get_image()
+        self.dockerfile.write_text("FROM neo4j:latest\n")
+        assert len({image, with_apoc, neurobase_mod.get_image()}) == 3
+
+    def test_build_args(self, subprocess_recorder, tmp_path):
+        neurobase_mod.build_image("nbase:1.0-x")
+        (cmd,), kwargs = subprocess_recorder.calls[0]
+        assert cmd == [
+            "docker", "build", "--tag", "nbase:1.0-x",
+            "--build-arg", "NEO4J_BASE_VERSION=5.26.7", "--build-arg", "APOC_EXTENDED_VERSION=5.26.7",
+            str(tmp_path),
+        ]
+        assert kwargs["env"]["DOCKER_BUILDKIT"] == "1"
+
+    def test_build_failure_exits(self, monkeypatch):
+        monkeypatch.setattr(neurobase_mod.subprocess, "run", Recorder(return_value=SubprocessResult(1)))
+        with pytest.raises(SystemExit):
+            neurobase_mod.build_image("nbase:1.0-x")
+
+    def test_ensure_reuses_existing(self, monkeypatch, subprocess_recorder):
+        assert neurobase_mod.ensure_image() == neurobase_mod.get_image()
+        cmds = [c[0][0] for c in subprocess_recorder.calls]
+        assert cmds == [["docker", "image", "inspect", neurobase_mod.get_image()]]
+
+    def test_ensure_builds_missing(self, monkeypatch):
+        commands = []
+        def run(cmd, **kwargs):
+            commands.append(cmd)
+            return SubprocessResult(1 if cmd[:3] == ["docker", "image", "inspect"] else 0)
+        monkeypatch.setattr(neurobase_mod.subprocess, "run", run)
+        neurobase_mod.ensure_image()
+        assert commands[1][:2] == ["docker", "build"]
+
+    def test_task_up_to_date(self, ctx, subprocess_recorder, capsys):
+        neurobase_mod.image.__wrapped__(ctx)
+        assert subprocess_recorder.call_count == 1
+        assert "Image up to date" in capsys.readouterr().out
+
+    def test_task_rebuild(self, ctx, subprocess_recorder, capsys):
+        neurobase_mod.image.__wrapped__(ctx, rebuild=True)
+        cmd = subprocess_recorder.calls[-1][0][0]
+        assert cmd[:2] == ["docker", "build"]
+        assert "--no-cache" in cmd
+        assert "Built nbase:1.0-" in capsys.readouterr().out
+
+
+# ---------------------------------------------------------------------------
+# memory tuning
+# ---------------------------------------------------------------------------
+
+class TestComputeMemory:
+    GIB = neurobase_mod.GIB
+    MIB = neurobase_mod.MIB
+
+    def test_heap_is_quarter_of_share(self):
+        heap, _ = neurobase_mod.compute_memory(16 * self.GIB, 0)
+        assert heap == 3 * self.GIB
+
+    def test_empty_store_gets_half_of_rest(self):
+        heap, pagecache = neurobase_mod.compute_memory(16 * self.GIB, 0)
+        assert pagecache == (12 * self.GIB - heap) // 2
+        assert pagecache > heap
+
+    def test_pagecache_fits_store(self):
+        _, pagecache = neurobase_mod.compute_memory(16 * self.GIB, 6 * self.GIB)
+        assert pagecache == 6 * self.GIB * 6 // 5
+
+    def test_pagecache_bounded_by_share(self):
+        heap, pagecache = neurobase_mod.compute_memory(16 * self.GIB, 100 * self.GIB)
+        assert heap + pagecache == 12 * self.GIB
+
+    def test_instances_split_memory(self):
+        single, _ = neurobase_mod.compute_memory(16 * self.GIB, 0, instances=1)
+        shared, _ = neurobase_mod.compute_memory(16 * self.GIB, 0, instances=4)
+        assert shared == single // 4
+
+    def test_minimums_on_small_host(self):
+        heap, pagecache = neurobase_mod.compute_memory(1 * self.GIB, 10 * self.GIB)
+        assert heap == neurobase_mod.HEAP_MIN
+        assert pagecache == neurobase_mod.PAGECACHE_MIN
+
+    def test_heap_capped(self):
+        heap, _ = neurobase_mod.compute_memory(1024 * self.GIB, 0)
+        assert heap == neurobase_mod.HEAP_MAX
+
+
+class TestMemorySettings:
+    @pytest.fixture(autouse=True)
+    def _patch_probes(self, monkeypatch):
+        monkeypatch.setattr(neurobase_mod, "get_host_memory", lambda: 16 * neurobase_mod.GIB)
+        monkeypatch.setattr(neurobase_mod, "get_store_size", lambda n: 0)
+        monkeypatch.delenv("NEO4J_HEAP_SIZE", raising=False)
+        monkeypatch.delenv("NEO4J_PAGECACHE_SIZE", raising=False)
+
+    def test_formats_megabytes(self):
+        settings = neurobase_mod.memory_settings("nb", instances=1)
+        assert settings == {"NEO4J_HEAP_SIZE": "3072m", "NEO4J_PAGECACHE_SIZE": "4608m"}
+
+    def test_counts_new_instance(self, monkeypatch):
+        monkeypatch.setattr(neurobase_mod, "list_instances", lambda: ["a", "b", "c"])
+        settings = neurobase_mod.memory_settings("nb")
+        assert settings["NEO4J_HEAP_SIZE"] == "768m"
+
+    def test_existing_instance_not_double_counted(self, monkeypatch):
+        monkeypatch.setattr(neurobase_mod, "list_instances", lambda: ["nb", "b"])
+        settings = neurobase_mod.memory_settings("nb")
+        assert settings["NEO4J_HEAP_SIZE"] == "1536m"
+
+    def test_pinned_values_win(self, monkeypatch):
+        monkeypatch.setenv("NEO4J_HEAP_SIZE", "2g")
+        settings = neurobase_mod.memory_settings("nb", instances=1)
+        assert settings["NEO4J_HEAP_SIZE"] == "2g"
+
+
+class TestTune:
+    @pytest.fixture(autouse=True)
+    def _patch_memory_settings(self, monkeypatch):
+        monkeypatch.setattr(neurobase_mod, "memory_settings",
+                            lambda name, instances=None: {"NEO4J_HEAP_SIZE": "1024m"})
+
+    def test_recreates_container(self, ctx, monkeypatch, subprocess_recorder):
+        monkeypatch.setenv("BASE_NAME", "nb")
+        monkeypatch.setattr(neurobase_mod.docker_tools, "container_exists", lambda n: True)
+        neurobase_mod.tune.__wrapped__(ctx)
+        assert subprocess_recorder.calls[-1][0][0] == ["docker", "compose", "up", "-d"]
+        assert subprocess_recorder.calls[-1][1]["env"]["NEO4J_HEAP_SIZE"] == "1024m"
+
+    def test_keeps_published_ports(self, ctx, monkeypatch):
+        bindings = {
+            "7474/tcp": [{"HostIp": "", "HostPort": "43701"}],
+            "7687/tcp": [{"HostIp": "", "HostPort": "47095"}],
+        }
+        rec = Recorder(return_value=SubprocessResult(0, stdout=json.dumps(bindings)))
+        monkeypatch.setattr(neurobase_mod.subprocess, "run", rec)
+        monkeypatch.setenv("NEO4J_PORT_BOLT", "7687")
+        monkeypatch.setattr(neurobase_mod.docker_tools, "container_exists", lambda n: True)
+        neurobase_mod.tune.__wrapped__(ctx, name="fork")
+        assert rec.calls[0][0][0][:2] == ["docker", "inspect"]
+        env = rec.calls[-1][1]["env"]
+        assert (env["NEO4J_PORT_HTTP"], env["NEO4J_PORT_BOLT"]) == ("43701", "47095")
+
+    def test_container_not_exists_fails(self, ctx, monkeypatch, subprocess_recorder):
+        monkeypatch.setenv("BASE_NAME", "nb")
+        monkeypatch.setattr(neurobase_mod.docker_tools, "container_exists", lambda n: False)
+        with pytest.raises(SystemExit):
+            neurobase_mod.tune.__wrapped__(ctx)
+        assert subprocess_recorder.call_count == 0
+
 
 # ---------------------------------------------------------------------------
 # start
@@ -129,6 +343,22 @@ class TestStart:
         out = capsys.readouterr().out
         assert "does not exist" in out
 
+    def test_no_warmup_by_default(self, ctx, monkeypatch, subprocess_recorder):
+        monkeypatch.setenv("BASE_NAME", "nb")
+        monkeypatch.setattr(neurobase_mod.docker_tools, "container_running", lambda n: True)
+        rec = Recorder()
+        monkeypatch.setattr(neurobase_mod, "start_warmup", rec)
+        neurobase_mod.start.__wrapped__(ctx)
+        assert rec.call_count == 0
+
+    def test_warmup(self, ctx, monkeypatch, subprocess_recorder):
+        monkeypatch.setenv("BASE_NAME", "nb")
+        monkeypatch.setattr(neurobase_mod.docker_tools, "container_running", lambda n: True)
+        rec = Recorder()
+        monkeypatch.setattr(neurobase_mod, "start_warmup", rec)
+        neurobase_mod.start.__wrapped__(ctx, warmup=True)
+        assert rec.last_args == ("nb",)
+
 
 # ---------------------------------------------------------------------------
 # stop
@@ -157,6 +387,147 @@ class TestStop:
         assert cmd == ["docker", "stop", "custom"]
 
 
+# ---------------------------------------------------------------------------
+# multi-instance
+# ---------------------------------------------------------------------------
+
+class TestInspectInstances:
+    def test_parses_names_state_and_port(self, monkeypatch):
+        stdout = (
+            "nb-b\texited\t\n"
+            "nb-a\trunning\t0.0.0.0:7475->7474/tcp, 0.0.0.0:7688->7687/tcp\n"
+        )
+        monkeypatch.setattr(neurobase_mod.subprocess, "run",
+                            Recorder(return_value=SimpleNamespace(returncode=0, stdout=stdout)))
+        assert neurobase_mod.inspect_instances() == [
+            {"name": "nb-a", "state": "running", "bolt_port": 7688},
+            {"name": "nb-b", "state": "exited", "bolt_port": None},
+        ]
+
+    def test_filters_by_compose_label(self, monkeypatch):
+        rec = Recorder(return_value=SimpleNamespace(returncode=0, stdout=""))
+        monkeypatch.setattr(neurobase_mod.subprocess, "run", rec)
+        neurobase_mod.inspect_instances()
+        assert "label=com.docker.compose.service=nbase" in rec.last_args[0]
+
+    def test_docker_failure(self, monkeypatch):
+        monkeypatch.setattr(neurobase_mod.subprocess, "run",
+                            Recorder(return_value=SubprocessResult(1)))
+        assert neurobase_mod.inspect_instances() == []
+
+
+class TestRunConcurrently:
+    def test_preserves_order(self):
+        assert neurobase_mod.run_concurrently(lambda n: n * 2, [1, 2, 3], jobs=2) == [2, 4, 6]
+
+    def test_bounded_parallelism(self):
+        lock = threading.Lock()
+        active = []
+        peak = []
+
+        def work(n):
+            with lock:
+                active.append(n)
+                peak.append(len(active))
+            neurobase_mod.time.sleep(0.01)
+            with lock:
+                active.remove(n)
+
+        neurobase_mod.run_concurrently(work, range(8), jobs=2)
+        assert max(peak) <= 2
+
+
+class TestStartAll:
+    @pytest.fixture(autouse=True)
+    def _patch_verify_access(self, monkeypatch):
+        monkeypatch.setattr(neurobase_mod.docker_tools, "verify_access", lambda: None)
+
+    def _row(self, name, ready=True):
+        return {"name": name, "state": "running", "bolt_port": 7687, "ready": ready, "seconds": 0.1}
+
+    def test_starts_every_instance(self, ctx, monkeypatch, capsys):
+        monkeypatch.setattr(neurobase_mod, "list_instances", lambda: ["a", "b"])
+        started = []
+        monkeypatch.setattr(neurobase_mod, "start_instance",
+                            lambda name, timeout: (started.append(name), self._row(name))[1])
+        neurobase_mod.start_all.__wrapped__(ctx)
+        assert sorted(started) == ["a", "b"]
+        out = capsys.readouterr().out
+        assert "a" in out and "b" in out
+
+    def test_not_ready_fails(self, ctx, monkeypatch):
+        monkeypatch.setattr(neurobase_mod, "list_instances", lambda: ["a"])
+        monkeypatch.setattr(neurobase_mod, "start_instance",
+                            lambda name, timeout: self._row(name, ready=False))
+        with pytest.raises(SystemExit):
+            neurobase_mod.start_all.__wrapped__(ctx)
+
+    def test_no_instances(self, ctx, monkeypatch, capsys):
+        monkeypatch.setattr(neurobase_mod, "list_instances", list)
+        neurobase_mod.start_all.__wrapped__(ctx)
+        assert "No NeuroBase containers" in capsys.readouterr().out
+
+
+class TestStartInstance:
+    def test_starts_stopped_container(self, monkeypatch, subprocess_recorder):
+        monkeypatch.setattr(neurobase_mod.docker_tools, "container_running", lambda n: False)
+        monkeypatch.setattr(neurobase_mod, "get_bolt_port", lambda n: 7688)
+        monkeypatch.setattr(neurobase_mod, "bolt_ready", lambda port, timeout: True)
+        row = neurobase_mod.start_instance("a")
+        assert subprocess_recorder.calls[0][0][0] == ["docker", "start", "a"]
+        assert row["bolt_port"] == 7688
+        assert row["ready"]
+
+    def test_no_port_not_ready(self, monkeypatch, subprocess_recorder):
+        monkeypatch.setattr(neurobase_mod.docker_tools, "container_running", lambda n: True)
+        monkeypatch.setattr(neurobase_mod, "get_bolt_port", lambda n: None)
+        row = neurobase_mod.start_instance("a")
+        assert subprocess_recorder.call_count == 0
+        assert not row["ready"]
+
+
+class TestStopAll:
+    @pytest.fixture(autouse=True)
+    def _instances(self, monkeypatch):
+        monkeypatch.setattr(neurobase_mod, "inspect_instances", lambda: [
+            {"name": "a", "state": "running", "bolt_port": 7687},
+            {"name": "b", "state": "exited", "bolt_port": None},
+        ])
+
+    def test_stops_running_only(self, ctx, monkeypatch):
+        running = {"a"}
+        cmds = []
+
+        def fake_run(cmd, **kwargs):
+            cmds.append(cmd)
+            running.discard(cmd[-1])
+            return SubprocessResult(0)
+
+        monkeypatch.setattr(neurobase_mod.docker_tools, "container_running", lambda n: n in running)
+        monkeypatch.setattr(neurobase_mod.subprocess, "run", fake_run)
+        neurobase_mod.stop_all.__wrapped__(ctx)
+        assert cmds == [["docker", "stop", "a"]]
+
+    def test_still_running_fails(self, ctx, monkeypatch, subprocess_recorder):
+        monkeypatch.setattr(neurobase_mod.docker_tools, "container_running", lambda n: n == "a")
+        with pytest.raises(SystemExit):
+            neurobase_mod.stop_all.__wrapped__(ctx)
+
+
+class TestStatus:
+    def test_prints_table(self, ctx, monkeypatch, capsys):
+        monkeypatch.setattr(neurobase_mod, "inspect_instances", lambda: [
+            {"name": "nb-a", "state": "running", "bolt_port": 7688},
+            {"name": "nb-b", "state": "exited", "bolt_port": None},
+        ])
+        monkeypatch.setattr(neurobase_mod, "bolt_ready", lambda port, timeout: port == 7688)
+        neurobase_mod.status.__wrapped__(ctx)
+        out = capsys.readouterr().out
+        assert "nb-a" in out
+        assert "7688" in out
+        assert "exited" in out
+
+
 # ---------------------------------------------------------------------------
 # reset
 # ---------------------------------------------------------------------------
@@ -227,6 +598,133 @@ class TestReset:
         assert "3" in prompts[0]
 
 
+# ---------------------------------------------------------------------------
+# stats
+# ---------------------------------------------------------------------------
+
+PLAIN_ENTRY = (
+    "2025-05-14 09:36:58.330+0000 INFO  id:225 - transaction id:272 - {ms} ms: "
+    "(planning: 3, waiting: 0) - 2752 B - {hits} page hits, {faults} page faults - "
+    "bolt-session\tbolt\tneo4j-python/5.28\t\tclient/172.17.0.1:51562\tserver/172.17.0.2:7687>\t"
+    "neo4j - neo4j - {query} - {{}} - runtime=pipelined - {{}}"
+)
+
+
+class TestQueryShape:
+    def test_replaces_literals(self):
+        shape = neurobase_mod.query_shape("MATCH (t {title: 'A - b'}) RETURN t LIMIT 5")
+        assert shape == "MATCH (t {title: ?}) RETURN t LIMIT ?"
+
+    def test_collapses_whitespace(self):
+        assert neurobase_mod.query_shape("MATCH (n)\n   RETURN n") == "MATCH (n) RETURN n"
+
+    def test_keeps_parameters(self):
+        assert neurobase_mod.query_shape("MATCH (t {title: $title})") == "MATCH (t {title: $title})"
+
+
+class TestParseQueryLog:
+    def test_plain_entry(self):
+        log = PLAIN_ENTRY.format(ms=12, hits=14, faults=2, query="MATCH (n) RETURN n")
+        records = list(neurobase_mod.parse_query_log(log))
+        assert records == [{"query": "MATCH (n) RETURN n", "ms": 12, "hits": 14, "faults": 2}]
+
+    def test_multiline_query(self):
+        log = PLAIN_ENTRY.format(ms=1, hits=0, faults=0, query="MATCH (n)\nRETURN n")
+        records = list(neurobase_mod.parse_query_log(log))
+        assert records[0]["query"] == "MATCH (n)\nRETURN n"
+
+    def test_json_entry(self):
+        log = '{"elapsedTimeMs": 7, "pageHits": 3, "pageFaults": 1, "query": "RETURN 1"}'
+        records = list(neurobase_mod.parse_query_log(log))
+        assert records == [{"query": "RETURN 1", "ms": 7, "hits": 3, "faults": 1}]
+
+    def test_skips_unrelated_lines(self):
+        log = "2025-05-14 09:36:58.330+0000 INFO  Query started\n{not json"
+        assert list(neurobase_mod.parse_query_log(log)) == []
+
+
+class TestAggregateQueries:
+    def test_groups_by_shape(self):
+        records = [
+            {"query": "MATCH (n) RETURN n LIMIT 1", "ms": 10, "hits": 1, "faults": 0},
+            {"query": "MATCH (n) RETURN n LIMIT 2", "ms": 30, "hits": 2, "faults": 1},
+            {"query": "RETURN 1", "ms": 5, "hits": 0, "faults": 0},
+        ]
+        report = neurobase_mod.aggregate_queries(records)
+        assert [r["count"] for r in report] == [2, 1]
+        assert report[0]["total_ms"] == 40
+        assert report[0]["page_hits"] == 3
+        assert report[0]["page_faults"] == 1
+
+    def test_percentiles(self):
+        records = [{"query": "RETURN 1", "ms": ms, "hits": 0, "faults": 0} for ms in range(1, 101)]
+        report = neurobase_mod.aggregate_queries(records)
+        assert report[0]["p50_ms"] == 50
+        assert report[0]["p95_ms"] == 95
+        assert report[0]["p99_ms"] == 99
+        assert report[0]["max_ms"] == 100
+
+
+class TestStats:
+    @pytest.fixture(autouse=True)
+    def _patch_log(self, monkeypatch):
+        log = "\n".join([
+            PLAIN_ENTRY.format(ms=5, hits=1, faults=0, query="RETURN 1"),
+            PLAIN_ENTRY.format(ms=50, hits=9, faults=3, query="MATCH (n) RETURN n"),
+        ])
+        monkeypatch.setattr(neurobase_mod, "read_query_log", lambda name: log)
+
+    def test_prints_report(self, ctx, monkeypatch, capsys):
+        monkeypatch.setenv("BASE_NAME", "nb")
+        neurobase_mod.stats.__wrapped__(ctx)
+        out = capsys.readouterr().out
+        assert out.index("MATCH (n) RETURN n") < out.index("RETURN ?")
+
+    def test_top_limits_report(self, ctx, monkeypatch, capsys):
+        monkeypatch.setenv("BASE_NAME", "nb")
+        neurobase_mod.stats.__wrapped__(ctx, top=1)
+        out = capsys.readouterr().out
+        assert "RETURN ?" not in out
+
+    def test_writes_output(self, ctx, monkeypatch, tmp_path):
+        monkeypatch.setenv("BASE_NAME", "nb")
+        output = tmp_path / "report.json"
+        neurobase_mod.stats.__wrapped__(ctx, output=str(output))
+        report = json.loads(output.read_text())
+        assert report[0]["query"] == "MATCH (n) RETURN n"
+
+    def test_threshold_enables_logging(self, ctx, monkeypatch):
+        monkeypatch.setenv("BASE_NAME", "nb")
+        rec = Recorder()
+        monkeypatch.setattr(neurobase_mod, "enable_query_log", rec)
+        monkeypatch.setenv("NEO4J_URI", "bolt://localhost:7687")
+        neurobase_mod.stats.__wrapped__(ctx, threshold="100ms")
+        assert rec.last_args == ("bolt://localhost:7687", "100ms")
+
+    def test_threshold_uses_instance_uri(self, ctx, monkeypatch):
+        rec = Recorder()
+        monkeypatch.setattr(neurobase_mod, "enable_query_log", rec)
+        monkeypatch.setattr(neurobase_mod, "get_bolt_port", lambda name: 17687)
+        neurobase_mod.stats.__wrapped__(ctx, name="fork", threshold="100ms")
+        assert rec.last_args == ("bolt://127.0.0.1:17687", "100ms")
+
+    def test_enable_query_log_turns_on_page_logging(self, monkeypatch):
+        settings = ["enabled', 'INFO'", "page_logging_enabled', 'true'", "threshold', $threshold"]
+        driver = FakeQueryDriver({f"CALL dbms.setConfigValue('db.logs.query.{setting})": {} for setting in settings})
+        uris = []
+        monkeypatch.setattr(neurobase_mod.neo4j.GraphDatabase, "driver",
+                            lambda uri, auth: uris.append(uri) or driver)
+        neurobase_mod.enable_query_log("bolt://127.0.0.1:17687", "100ms")
+        assert uris == ["bolt://127.0.0.1:17687"]
+        assert len(driver.queries) == 3
+
+    def test_empty_log(self, ctx, monkeypatch, capsys):
+        monkeypatch.setenv("BASE_NAME", "nb")
+        monkeypatch.setattr(neurobase_mod, "read_query_log", lambda name: "")
+        neurobase_mod.stats.__wrapped__(ctx)
+        assert "No queries" in capsys.readouterr().out
+
+
 # ---------------------------------------------------------------------------
 # verify_neo4j
 # ---------------------------------------------------------------------------
@@ -266,6 +764,219 @@ class TestVerifyNeo4j:
             neurobase_mod.verify_neo4j(timeout=0)
 
 
+# ---------------------------------------------------------------------------
+# warm-up
+# ---------------------------------------------------------------------------
+
+class FakeRecord:
+    def __init__(self, data):
+        self._data = data
+
+    def data(self):
+        return self._data
+
+    def __getitem__(self, key):
+        return self._data[key]
+
+
+class FakeQueryDriver:
+    def __init__(self, results, profiles=None):
+        self.results = results
+        self.profiles = profiles or {}
+        self.queries = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        pass
+
+    def execute_query(self, query, **params):
+        self.queries.append(query)
+        result = self.results[query]
+        if isinstance(result, Exception):
+            raise result
+        rows = result if isinstance(result, list) else [result]
+        summary = SimpleNamespace(profile=self.profiles.get(query))
+        return [FakeRecord(row) for row in rows], summary, list(rows[0]) if rows else []
+
+
+class TestWarmup:
+    @pytest.fixture(autouse=True)
+    def _state_dir(self, monkeypatch, tmp_path):
+        monkeypatch.setenv("NF_STATE", str(tmp_path))
+        monkeypatch.setattr(neurobase_mod, "get_bolt_port", lambda name: 17687)
+
+    def _patch_driver(self, monkeypatch, results, profiles):
+        driver = FakeQueryDriver(results, profiles)
+        self.uris = []
+        monkeypatch.setattr(neurobase_mod.neo4j.GraphDatabase, "driver",
+                            lambda uri, auth: self.uris.append(uri) or driver)
+        return driver
+
+    def test_sums_profiled_pages(self, monkeypatch, tmp_path, capsys):
+        nodes, rels = neurobase_mod.WARMUP_QUERIES
+        index = neurobase_mod.index_scan_query("NODE", "Tiddler", ["title"])
+        driver = self._patch_driver(monkeypatch, {
+            neurobase_mod.WARMUP_INDEX_QUERY: [
+                {"entityType": "NODE", "labelsOrTypes": ["Tiddler"], "properties": ["title"]},
+            ],
+            nodes: {"properties": 9},
+            rels: {"properties": 0},
+            index: {"entries": 3},
+        }, {
+            nodes: {"pageCacheHits": 10, "pageCacheMisses": 2, "children": [{"pageCacheHits": 1}]},
+            rels: {"pageCacheHits": 4, "pageCacheMisses": 0, "children": []},
+            index: {"pageCacheHits": 0, "pageCacheMisses": 3},
+        })
+        result = neurobase_mod.warmup_page_cache("nb")
+        assert driver.queries == [neurobase_mod.WARMUP_INDEX_QUERY, nodes, rels, index]
+        assert result["pages"] == 20
+        assert result["indexes"] == 1
+        saved = json.loads((tmp_path / "nb-warmup.json").read_text())
+        assert saved["pages"] == 20
+        assert "20 pages" in capsys.readouterr().out
+
+    def test_connects_to_instance(self, monkeypatch):
+        results = {query: {"properties": 0} for query in neurobase_mod.WARMUP_QUERIES}
+        self._patch_driver(monkeypatch, {neurobase_mod.WARMUP_INDEX_QUERY: [], **results}, {})
+        assert neurobase_mod.warmup_page_cache("fork")["pages"] == 0
+        assert self.uris == ["bolt://127.0.0.1:17687"]
+
+    def test_index_scan_query(self):
+        assert neurobase_mod.index_scan_query("RELATIONSHIP", "LINKS`TO", ["a", "b"]) == (
+            "PROFILE MATCH ()-[e:`LINKS``TO`]-() USING INDEX e:`LINKS``TO`(`a`, `b`) "
+            "WHERE e.`a` IS NOT NULL AND e.`b` IS NOT NULL RETURN count(e) AS entries"
+        )
+
+    def test_start_warmup_runs_in_thread(self, monkeypatch):
+        rec = Recorder()
+        monkeypatch.setattr(neurobase_mod, "warmup_page_cache", rec)
+        neurobase_mod.start_warmup("nb").join()
+        assert rec.last_args == ("nb",)
+
+
+# ---------------------------------------------------------------------------
+# seed
+# ---------------------------------------------------------------------------
+
+class FakeSeedDriver:
+    def __init__(self, existing=0):
+        self.existing = existing
+        self.runs = []
+        self.batches = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        pass
+
+    def session(self):
+        return self
+
+    def run(self, query):
+        self.runs.append(query)
+        return SimpleNamespace(consume=lambda: None)
+
+    def execute_query(self, query, **params):
+        if query == neurobase_mod.COUNT_TIDDLERS_QUERY:
+            return [{"count": self.existing}], None, ["count"]
+        self.batches.append(params["tiddlers"])
+        return [], None, []
+
+
+class TestSyntheticGraph:
+    def test_deterministic(self):
+        graph = neurobase_mod.SyntheticGraph(500, seed=3)
+        assert graph.tiddler(42) == neurobase_mod.SyntheticGraph(500, seed=3).tiddler(42)
+        assert graph.tiddler(42) != neurobase_mod.SyntheticGraph(500, seed=4).tiddler(42)
+
+    def test_tiddler_shape(self):
+        graph = neurobase_mod.SyntheticGraph(500, fields=3, field_size=16)
+        tiddler = graph.tiddler(7)
+        assert tiddler["title"] == graph.title(7)
+        assert len(tiddler["seed.field2"]) == 16
+        assert tiddler["modified"] >= tiddler["created"]
+        assert len(tiddler["neuro.id"]) == 36
+        assert all(tag.startswith("topic-") for tag in tiddler["tags"].split())
+
+    def test_titles_unique(self):
+        graph = neurobase_mod.SyntheticGraph(5000)
+        assert len({graph.title(i) for i in range(5000)}) == 5000
+
+    def test_distributions(self):
+        graph = neurobase_mod.SyntheticGraph(2000, tags=2, links=3, words=100)
+        tiddlers = [graph.tiddler(i) for i in range(2000)]
+        tag_counts = {}
+        for tiddler in tiddlers:
+            for tag in tiddler["tags"].split():
+                tag_counts[tag] = tag_counts.get(tag, 0) + 1
+        # Zipf: the most popular tag is used far more often than a mid-ranked one.
+        assert tag_counts[graph.tag(0)] > 10 * tag_counts.get(graph.tag(100), 1)
+        links = sum(tiddler["text"].count("[[") for tiddler in tiddlers) / len(tiddlers)
+        assert 2 < links < 4
+        lengths = sorted(len(tiddler["text"].split("\n\nSee")[0].split()) for tiddler in tiddlers)
+        assert 70 < lengths[len(lengths) // 2] < 130
+        assert lengths[-1] > 3 * lengths[len(lengths) // 2]
+
+    def test_links_point_to_existing_titles(self):
+        graph = neurobase_mod.SyntheticGraph(300, links=5)
+        titles = {graph.title(i) for i in range(300)}
+        for i in range(50):
+            text = graph.tiddler(i)["text"]
+            for part in text.split("[[")[1:]:
+                assert part.split("]]")[0] in titles
+
+    def test_batches(self):
+        graph = neurobase_mod.SyntheticGraph(12)
+        batches = list(graph.batches(5))
+        assert [len(batch) for batch in batches] == [5, 5, 2]
+        assert batches[2][-1] == graph.tiddler(11)
+
+
+class TestSeed:
+    def _patch_driver(self, monkeypatch, driver):
+        uris = []
+
+        def make(uri, auth):
+            uris.append(uri)
+            return driver
+
+        monkeypatch.setattr(neurobase_mod.neo4j.GraphDatabase, "driver", make)
+        return uris
+
+    def test_writes_batches(self, ctx, monkeypatch, capsys):
+        driver = FakeSeedDriver()
+        monkeypatch.setenv("NEO4J_URI", "bolt://127.0.0.1:7687")
+        uris = self._patch_driver(monkeypatch, driver)
+        neurobase_mod.seed.__wrapped__(ctx, count="12", batch="5")
+        assert uris == ["bolt://127.0.0.1:7687"]
+        assert [len(batch) for batch in driver.batches] == [5, 5, 2]
+        assert driver.runs == []
+        assert "Wrote 12 tiddlers" in capsys.readouterr().out
+
+    def test_refuses_non_empty_database(self, ctx, monkeypatch):
+        driver = FakeSeedDriver(existing=3)
+        self._patch_driver(monkeypatch, driver)
+        with pytest.raises(SystemExit):
+            neurobase_mod.seed.__wrapped__(ctx, count=10)
+        assert driver.batches == []
+
+    def test_clear(self, ctx, monkeypatch):
+        driver = FakeSeedDriver(existing=3)
+        self._patch_driver(monkeypatch, driver)
+        neurobase_mod.seed.__wrapped__(ctx, count=10, clear=True)
+        assert driver.runs == [neurobase_mod.CLEAR_QUERY]
+        assert sum(len(batch) for batch in driver.batches) == 10
+
+    def test_named_instance(self, ctx, monkeypatch):
+        monkeypatch.setattr(neurobase_mod, "get_bolt_port", lambda name: 17687)
+        uris = self._patch_driver(monkeypatch, FakeSeedDriver())
+        neurobase_mod.seed.__wrapped__(ctx, name="nb2", count=1)
+        assert uris == ["bolt://127.0.0.1:17687"]
+
+
 # ---------------------------------------------------------------------------
 # backup
 # ---------------------------------------------------------------------------
@@ -331,6 +1042,82 @@ class TestBackup:
         assert "Already stopped" in capsys.readouterr().out
 
 
+# ---------------------------------------------------------------------------
+# clone
+# ---------------------------------------------------------------------------
+
+class TestClone:
+    @pytest.fixture(autouse=True)
+    def _patch_docker(self, monkeypatch):
+        monkeypatch.setattr(neurobase_mod.docker_tools, "container_exists", lambda n: False)
+        monkeypatch.setattr(neurobase_mod.docker_tools, "container_running", lambda n: False)
+        monkeypatch.setattr(neurobase_mod, "volume_exists", lambda v: v == "a-data")
+        monkeypatch.setattr(neurobase_mod, "get_store_size", lambda n: 64 * neurobase_mod.MIB)
+        monkeypatch.setattr(neurobase_mod, "memory_settings",
+                            lambda name, instances=None: {"NEO4J_HEAP_SIZE": "1024m"})
+        monkeypatch.setattr(neurobase_mod.network_utils, "get_free_ports", lambda n: (17474, 17687))
+
+    def test_copies_volume(self, ctx, subprocess_recorder):
+        neurobase_mod.clone.__wrapped__(ctx, from_="a", to="b")
+        cmds = [c[0][0] for c in subprocess_recorder.calls]
+        assert cmds[0][:3] == ["docker", "volume", "create"]
+        assert cmds[0][-1] == "b-data"
+        assert "com.docker.compose.project=b" in cmds[0]
+        assert "a-data:/from:ro" in cmds[1]
+        assert "b-data:/to" in cmds[1]
+        assert "--reflink=auto" in cmds[1]
+
+    def test_composes_on_free_ports(self, ctx, subprocess_recorder):
+        neurobase_mod.clone.__wrapped__(ctx, from_="a", to="b")
+        compose = subprocess_recorder.calls[-1]
+        assert compose[0][0] == ["docker", "compose", "up", "-d"]
+        env = compose[1]["env"]
+        assert env["BASE_NAME"] == "b"
+        assert env["NEO4J_PORT_HTTP"] == "17474"
+        assert env["NEO4J_PORT_BOLT"] == "17687"
+
+    def test_reports_rate_and_ports(self, ctx, subprocess_recorder, capsys):
+        neurobase_mod.clone.__wrapped__(ctx, from_="a", to="b")
+        out = capsys.readouterr().out
+        assert "64 MiB" in out
+        assert "MiB/s" in out
+        assert "NEO4J_URI=bolt://127.0.0.1:17687" in out
+
+    def test_stops_source(self, ctx, subprocess_recorder, capsys):
+        neurobase_mod.clone.__wrapped__(ctx, from_="a", to="b")
+        assert "Already stopped: a" in capsys.readouterr().out
+        assert ["docker", "start", "a"] not in [c[0][0] for c in subprocess_recorder.calls]
+
+    def test_restarts_running_source(self, ctx, monkeypatch, subprocess_recorder):
+        monkeypatch.setattr(neurobase_mod.docker_tools, "container_running", lambda n: n == "a")
+        neurobase_mod.clone.__wrapped__(ctx, from_="a", to="b")
+        cmds = [c[0][0] for c in subprocess_recorder.calls]
+        assert cmds.index(["docker", "stop", "a"]) < cmds.index(["docker", "start", "a"])
+
+    def test_restarts_source_when_copy_fails(self, ctx, monkeypatch, subprocess_recorder):
+        monkeypatch.setattr(neurobase_mod.docker_tools, "container_running", lambda n: n == "a")
+
+        def fail(*args, **kwargs):
+            raise neurobase_mod.subprocess.CalledProcessError(1, "cp")
+
+        monkeypatch.setattr(neurobase_mod, "copy_volume", fail)
+        with pytest.raises(neurobase_mod.subprocess.CalledProcessError):
+            neurobase_mod.clone.__wrapped__(ctx, from_="a", to="b")
+        assert subprocess_recorder.calls[-1][0][0] == ["docker", "start", "a"]
+
+    def test_missing_source_fails(self, ctx, monkeypatch, subprocess_recorder):
+        monkeypatch.setattr(neurobase_mod, "volume_exists", lambda v: False)
+        with pytest.raises(SystemExit):
+            neurobase_mod.clone.__wrapped__(ctx, from_="a", to="b")
+        assert subprocess_recorder.call_count == 0
+
+    def test_existing_target_fails(self, ctx, monkeypatch, subprocess_recorder):
+        monkeypatch.setattr(neurobase_mod, "volume_exists", lambda v: True)
+        with pytest.raises(SystemExit):
+            neurobase_mod.clone.__wrapped__(ctx, from_="a", to="b")
+        assert subprocess_recorder.call_count == 0
+
+
 # ---------------------------------------------------------------------------
 # delete
 # ---------------------------------------------------------------------------
@@ -0,0 +1,271 @@
+"""
+End-to-end tests for tasks.components.neurobase against FakeDocker and FakeNeo4j.
+
+The tasks run unpatched: their docker commands go to the in-process daemon in
+tests/fake_docker.py and their Bolt connections (the official driver) to the
+stand-in in tests/fake_neo4j.py, so no Docker daemon or Neo4j is needed.
+"""
+
+import json
+import os
+import pathlib
+import socket
+
+import neo4j
+import pytest
+from neuro.utils.test_utils import FakeContext, noop_step
+
+import tasks.components.neurobase as neurobase_mod
+from tests.fake_docker import FakeDocker
+from tests.fake_neo4j import FakeNeo4j
+
+REPO_DIR = pathlib.Path(__file__).resolve().parent.parent
+AUTH = ("neo4j", "testpass")
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def query(uri, text, **params):
+    with neo4j.GraphDatabase.driver(uri, auth=AUTH) as driver:
+        records, _, _ = driver.execute_query(text, **params)
+    return [record.data() for record in records]
+
+
+def count(uri):
+    return query(uri, "MATCH (n) RETURN count(n) AS count")[0]["count"]
+
+
+class BoltNeuroBase:
+    """Stands in for neuro.base.api.NeuroBase in reset: count and clear over Bolt."""
+
+    def __enter__(self):
+        self.uri = os.environ["NEO4J_URI"]
+        return self
+
+    def __exit__(self, *exc):
+        pass
+
+    def count(self):
+        return count(self.uri)
+
+    def clear(self, confirm=False):
+        query(self.uri, "MATCH (n) DETACH DELETE n")
+
+
+# ---------------------------------------------------------------------------
+# Fixtures
+# ---------------------------------------------------------------------------
+
+@pytest.fixture
+def ctx():
+    return FakeContext()
+
+
+@pytest.fixture
+def docker(monkeypatch, tmp_path):
+    nf_dir = tmp_path / "nf"
+    nf_dir.mkdir()
+    (nf_dir / "Dockerfile").write_text((REPO_DIR / "Dockerfile").read_text())
+    archive_dir = tmp_path / "archive"
+    archive_dir.mkdir()
+    paths = {"nf": nf_dir, "archive": archive_dir}
+    monkeypatch.setattr(neurobase_mod.internal_utils, "get_path", lambda k, **kw: paths[k])
+
+    bolt_port = free_port()
+    monkeypatch.setenv("BASE_NAME", "nb")
+    monkeypatch.setenv("NBASE_IMAGE", "nbase")
+    monkeypatch.setenv("NBASE_VERSION", "1.0")
+    monkeypatch.setenv("NEO4J_VERSION", "5.26.7")
+    monkeypatch.setenv("NEO4J_PORT_HTTP", str(free_port()))
+    monkeypatch.setenv("NEO4J_PORT_BOLT", str(bolt_port))
+    monkeypatch.setenv("NEO4J_URI", f"bolt://127.0.0.1:{bolt_port}")
+    monkeypatch.setenv("NEO4J_USER", AUTH[0])
+    monkeypatch.setenv("NEO4J_PASSWORD", AUTH[1])
+    for key in ("APOC_EXTENDED_VERSION", "NEO4J_HEAP_SIZE", "NEO4J_PAGECACHE_SIZE"):
+        monkeypatch.delenv(key, raising=False)
+
+    monkeypatch.setattr(neurobase_mod.terminal_style, "step", noop_step)
+    monkeypatch.setattr(neurobase_mod.terminal_style, "header", lambda text: None)
+    monkeypatch.setattr(neurobase_mod.terminal_components, "bool_prompt", lambda message: True)
+    monkeypatch.setattr(neurobase_mod.network_utils, "get_free_ports", lambda n: [free_port() for _ in range(n)])
+    monkeypatch.setattr(neurobase_mod, "NeuroBase", BoltNeuroBase)
+
+    fake = FakeDocker(archive_dir=archive_dir)
+    fake.install(monkeypatch, neurobase_mod)
+    yield fake
+    fake.close()
+
+
+@pytest.fixture
+def uri():
+    return os.environ["NEO4J_URI"]
+
+
+# ---------------------------------------------------------------------------
+# Bolt stand-in
+# ---------------------------------------------------------------------------
+
+class TestFakeNeo4j:
+    @pytest.fixture
+    def server(self):
+        server = FakeNeo4j(password=AUTH[1]).start()
+        yield server
+        server.stop()
+
+    def test_seed_and_count(self, server):
+        query(server.uri, neurobase_mod.SEED_QUERY, tiddlers=[{"title": "a"}, {"text": "untitled"}])
+        assert query(server.uri, neurobase_mod.COUNT_TIDDLERS_QUERY) == [{"count": 1}]
+        assert count(server.uri) == 2
+
+    def test_rollback_restores_nodes(self, server):
+        query(server.uri, neurobase_mod.SEED_QUERY, tiddlers=[{"title": "a"}])
+        with neo4j.GraphDatabase.driver(server.uri, auth=AUTH) as driver, driver.session() as session:
+            with session.begin_transaction() as tx:
+                tx.run(neurobase_mod.CLEAR_QUERY).consume()
+                tx.rollback()
+            assert session.run("MATCH (n) RETURN count(n) AS count").single()["count"] == 1
+
+    def test_unknown_query_fails_and_connection_recovers(self, server):
+        with neo4j.GraphDatabase.driver(server.uri, auth=AUTH) as driver, driver.session() as session:
+            with pytest.raises(neo4j.exceptions.CypherSyntaxError):
+                session.run("MATCH (n)-[r]->(m) RETURN r").consume()
+            assert session.run("RETURN 1 AS one").single()["one"] == 1
+
+    def test_registered_handler(self, server):
+        server.handle(r"SHOW RANGE INDEXES .*", lambda s, match, params: (["entityType"], [["NODE"]]))
+        assert query(server.uri, neurobase_mod.WARMUP_INDEX_QUERY) == [{"entityType": "NODE"}]
+
+    def test_wrong_password(self, server):
+        with (
+            neo4j.GraphDatabase.driver(server.uri, auth=("neo4j", "wrong")) as driver,
+            pytest.raises(neo4j.exceptions.AuthError),
+        ):
+            driver.verify_connectivity()
+
+
+# ---------------------------------------------------------------------------
+# Tasks
+# ---------------------------------------------------------------------------
+
+class TestCreateStart:
+    def test_create_builds_image_and_runs_container(self, ctx, docker, uri):
+        neurobase_mod.create.__wrapped__(ctx)
+        assert docker.builds == [neurobase_mod.get_image()]
+        assert docker.containers["nb"]["image"] == neurobase_mod.get_image()
+        assert docker.container_running("nb")
+        assert {"nb-data", "nb-logs"} <= set(docker.volumes)
+        assert count(uri) == 0
+
+    def test_instances_share_one_image(self, ctx, docker):
+        neurobase_mod.create.__wrapped__(ctx)
+        neurobase_mod.create.__wrapped__(ctx, name="other")
+        assert len(docker.builds) == 1
+        assert docker.containers["other"]["image"] == docker.containers["nb"]["image"]
+
+    def test_start_verifies_bolt(self, ctx, docker, uri):
+        neurobase_mod.start.__wrapped__(ctx)
+        assert query(uri, "RETURN 1 AS one") == [{"one": 1}]
+
+    def test_named_instance_runs_beside_base(self, ctx, docker):
+        neurobase_mod.create.__wrapped__(ctx)
+        neurobase_mod.create.__wrapped__(ctx, name="other")
+        assert docker.container_running("nb") and docker.container_running("other")
+        assert set(docker.containers["nb"]["ports"].values()).isdisjoint(docker.containers["other"]["ports"].values())
+
+    def test_port_conflict_fails(self, ctx, docker, monkeypatch, capsys):
+        neurobase_mod.create.__wrapped__(ctx)
+        monkeypatch.setattr(neurobase_mod, "get_free_port_settings", lambda: {
+            key: os.environ[key] for key in ("NEO4J_PORT_HTTP", "NEO4J_PORT_BOLT")
+        })
+        with pytest.raises(SystemExit):
+            neurobase_mod.create.__wrapped__(ctx, name="other")
+        assert "port is already allocated" in capsys.readouterr().out
+        assert not docker.container_running("other")
+
+
+class TestStopStart:
+    def test_data_survives_restart(self, ctx, docker, uri):
+        neurobase_mod.start.__wrapped__(ctx)
+        query(uri, neurobase_mod.SEED_QUERY, tiddlers=[{"title": "a"}, {"title": "b"}])
+        neurobase_mod.stop.__wrapped__(ctx)
+        assert not docker.container_running("nb")
+        assert not neurobase_mod.bolt_ready(int(os.environ["NEO4J_PORT_BOLT"]), timeout=0)
+        neurobase_mod.start.__wrapped__(ctx)
+        assert count(uri) == 2
+
+    def test_stop_twice(self, ctx, docker, capsys):
+        neurobase_mod.start.__wrapped__(ctx)
+        neurobase_mod.stop.__wrapped__(ctx)
+        neurobase_mod.stop.__wrapped__(ctx)
+        assert "Already stopped: nb" in capsys.readouterr().out
+
+
+class TestSeedReset:
+    def test_seed_then_reset(self, ctx, docker, uri):
+        neurobase_mod.start.__wrapped__(ctx)
+        neurobase_mod.seed.__wrapped__(ctx, count=50)
+        assert query(uri, neurobase_mod.COUNT_TIDDLERS_QUERY) == [{"count": 50}]
+        neurobase_mod.reset.__wrapped__(ctx, confirmed=True)
+        assert count(uri) == 0
+
+    def test_seed_refuses_non_empty(self, ctx, docker):
+        neurobase_mod.start.__wrapped__(ctx)
+        neurobase_mod.seed.__wrapped__(ctx, count=5)
+        with pytest.raises(SystemExit):
+            neurobase_mod.seed.__wrapped__(ctx, count=5)
+
+
+class TestBackupDelete:
+    def test_backup_stops_and_archives(self, ctx, docker, uri):
+        neurobase_mod.start.__wrapped__(ctx)
+        query(uri, neurobase_mod.SEED_QUERY, tiddlers=[{"title": "a"}])
+        neurobase_mod.backup.__wrapped__(ctx)
+        assert not docker.container_running("nb")
+        archived = json.loads(pathlib.Path(docker.backups[0]).read_text())
+        assert archived == [{"labels": ["Tiddler"], "properties": {"title": "a"}}]
+        assert docker.cleaned == ["nb"]
+
+    def test_delete_removes_container_and_volumes(self, ctx, docker):
+        neurobase_mod.start.__wrapped__(ctx)
+        neurobase_mod.delete.__wrapped__(ctx)
+        assert docker.containers == {}
+        assert docker.volumes == {}
+
+    def test_recreate_after_delete_is_empty(self, ctx, docker, uri):
+        neurobase_mod.start.__wrapped__(ctx)
+        query(uri, neurobase_mod.SEED_QUERY, tiddlers=[{"title": "a"}])
+        neurobase_mod.delete.__wrapped__(ctx)
+        neurobase_mod.start.__wrapped__(ctx)
+        assert count(uri) == 0
+
+
+class TestCloneStatus:
+    def test_clone_copies_data(self, ctx, docker, uri):
+        neurobase_mod.start.__wrapped__(ctx)
+        query(uri, neurobase_mod.SEED_QUERY, tiddlers=[{"title": "a"}])
+        neurobase_mod.clone.__wrapped__(ctx, from_="nb", to="fork")
+        fork_uri = neurobase_mod.get_bolt_uri("fork")
+        query(fork_uri, neurobase_mod.SEED_QUERY, tiddlers=[{"title": "b"}])
+        assert count(fork_uri) == 2
+        assert docker.container_running("nb")
+        assert count(uri) == 1
+
+    def test_tune_keeps_clone_ports(self, ctx, docker):
+        neurobase_mod.start.__wrapped__(ctx)
+        neurobase_mod.clone.__wrapped__(ctx, from_="nb", to="fork")
+        ports = dict(docker.containers["fork"]["ports"])
+        neurobase_mod.stop.__wrapped__(ctx, name="fork")
+        neurobase_mod.tune.__wrapped__(ctx, name="fork")
+        assert docker.containers["fork"]["ports"] == ports
+        assert docker.container_running("fork")
+
+    def test_status_lists_instances(self, ctx, docker, capsys):
+        neurobase_mod.start.__wrapped__(ctx)
+        neurobase_mod.status.__wrapped__(ctx)
+        out = capsys.readouterr().out
+        assert "nb" in out
+        assert "running" in out
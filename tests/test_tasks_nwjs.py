@@ -5,12 +5,10 @@ Tests for tasks.components.nwjs.
 import os
 
 import pytest
-
 from neuro.utils.test_utils import FakeContext, Recorder, SubprocessResult, noop_step
 
 import tasks.components.nwjs as nwjs_mod
 
-
 # ---------------------------------------------------------------------------
 # Fixtures
 # ---------------------------------------------------------------------------
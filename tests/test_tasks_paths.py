@@ -0,0 +1,35 @@
+"""
+Tests for tasks.paths.
+"""
+
+import os
+
+import pytest
+
+import tasks.paths as paths_mod
+
+
+@pytest.fixture
+def nf_dir(monkeypatch, tmp_path):
+    monkeypatch.setattr(paths_mod.internal_utils, "get_path", lambda k: tmp_path / k)
+    monkeypatch.delenv("NF_STATE", raising=False)
+    monkeypatch.delenv("NF_CACHE", raising=False)
+    return tmp_path / "nf"
+
+
+class TestDirs:
+    def test_state_dir_from_env(self, nf_dir, monkeypatch, tmp_path):
+        monkeypatch.setenv("NF_STATE", str(tmp_path / "state"))
+        assert paths_mod.get_state_dir("bench", "baseline.json") == str(tmp_path / "state" / "bench" / "baseline.json")
+
+    def test_cache_dir_from_env(self, nf_dir, monkeypatch, tmp_path):
+        monkeypatch.setenv("NF_CACHE", str(tmp_path / "cache"))
+        assert paths_mod.get_cache_dir("wheels") == str(tmp_path / "cache" / "wheels")
+
+    def test_falls_back_to_nf_dir(self, nf_dir):
+        assert paths_mod.get_state_dir("nw.pid") == str(nf_dir / "nw.pid")
+        assert paths_mod.get_cache_dir("wheels") == str(nf_dir / "wheels")
+
+    def test_empty_env_falls_back(self, nf_dir, monkeypatch):
+        monkeypatch.setenv("NF_STATE", "")
+        assert paths_mod.get_state_dir() == os.fspath(nf_dir)
@@ -0,0 +1,89 @@
+"""
+Tests for tasks.protocol (lightweight neuro:// client).
+"""
+
+import pytest
+
+import tasks.protocol as protocol_mod
+
+# ---------------------------------------------------------------------------
+# get_socket_path
+# ---------------------------------------------------------------------------
+
+class TestGetSocketPath:
+    def test_uses_runtime_dir(self, monkeypatch, tmp_path):
+        monkeypatch.setenv("XDG_RUNTIME_DIR", str(tmp_path))
+        assert protocol_mod.get_socket_path().startswith(str(tmp_path))
+
+    def test_defaults_to_tmp(self, monkeypatch):
+        monkeypatch.delenv("XDG_RUNTIME_DIR", raising=False)
+        assert protocol_mod.get_socket_path().startswith("/tmp/")
+
+    def test_keyed_on_environment_and_port(self, monkeypatch):
+        monkeypatch.setenv("ENVIRONMENT", "PRODUCTION")
+        monkeypatch.setenv("PORT", "8080")
+        production = protocol_mod.get_socket_path()
+        assert production.endswith("-production-8080.sock")
+        monkeypatch.setenv("ENVIRONMENT", "TESTING")
+        monkeypatch.setenv("PORT", "8069")
+        assert protocol_mod.get_socket_path() != production
+
+    def test_dotenv_defaults(self, monkeypatch, tmp_path):
+        (tmp_path / ".env").write_text('# app\nENVIRONMENT=DEVELOP\nPORT="8080"\nHOST=127.0.0.1\n')
+        monkeypatch.setattr(protocol_mod, "APP_DIR", str(tmp_path))
+        monkeypatch.delenv("ENVIRONMENT", raising=False)
+        monkeypatch.delenv("PORT", raising=False)
+        assert protocol_mod.get_socket_path().endswith("-develop-8080.sock")
+
+
+# ---------------------------------------------------------------------------
+# main
+# ---------------------------------------------------------------------------
+
+class TestMain:
+    @pytest.fixture(autouse=True)
+    def _no_daemon(self, monkeypatch, tmp_path):
+        monkeypatch.setattr(protocol_mod, "get_socket_path", lambda: str(tmp_path / "missing.sock"))
+
+    def test_ping_without_daemon(self):
+        assert not protocol_mod.ping()
+
+    def test_falls_back_without_daemon(self, monkeypatch):
+        calls = []
+
+        class Result:
+            returncode = 0
+
+        monkeypatch.setattr(protocol_mod.subprocess, "run",
+                            lambda cmd, **kw: (calls.append(cmd), Result())[1])
+        assert protocol_mod.main(["neuro://abc-1"]) == 0
+        assert calls[0][1] == "-c"
+        assert calls[0][-1] == "neuro://abc-1"
+
+    def test_falls_back_when_daemon_drops_connection(self, monkeypatch):
+        calls = []
+
+        class Result:
+            returncode = 0
+
+        def dropped(message):
+            raise ValueError("Expecting value: line 1 column 1 (char 0)")
+
+        monkeypatch.setattr(protocol_mod, "request", dropped)
+        monkeypatch.setattr(protocol_mod.subprocess, "run",
+                            lambda cmd, **kw: (calls.append(cmd), Result())[1])
+        assert protocol_mod.main(["neuro://abc-1"]) == 0
+        assert calls[0][-1] == "neuro://abc-1"
+
+    def test_shutdown_without_daemon(self):
+        assert not protocol_mod.shutdown()
+
+    def test_reports_not_found(self, monkeypatch, capsys):
+        monkeypatch.setattr(protocol_mod, "request", lambda message: {"status": "not found"})
+        protocol_mod.main(["neuro://abc-1"])
+        assert "Not found: abc-1" in capsys.readouterr().out
+
+    def test_reports_not_running(self, monkeypatch, capsys):
+        monkeypatch.setattr(protocol_mod, "request", lambda message: {"status": "not running"})
+        protocol_mod.main(["neuro://abc-1"])
+        assert "not running" in capsys.readouterr().out
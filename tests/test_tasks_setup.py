@@ -2,12 +2,13 @@
 Tests for tasks.setup.
 """
 
+import io
 import os
+import subprocess
 from contextlib import contextmanager
 
-import pytest
 import invoke
-
+import pytest
 from neuro.utils.test_utils import FakeContext, Recorder, SubprocessResult, noop_step
 
 import tasks.actions.setup as setup_mod
@@ -30,6 +31,9 @@ def ctx():
 @pytest.fixture(autouse=True)
 def _patch_config(monkeypatch):
     monkeypatch.setattr(setup_mod.config, "main", Recorder())
+    monkeypatch.setattr(setup_mod.config, "CONFIG_INITIALIZED", False, raising=False)
+    monkeypatch.setattr(setup_mod, "_config_cache", {})
+    monkeypatch.setattr(setup_mod, "_config_applied", {})
 
 
 @pytest.fixture(autouse=True)
@@ -124,17 +128,167 @@ class TestEnv:
             setup_mod.env.__wrapped__(ctx)
 
 
+# ---------------------------------------------------------------------------
+# load_config
+# ---------------------------------------------------------------------------
+
+class TestLoadConfig:
+    @pytest.fixture
+    def config_files(self, monkeypatch, tmp_path):
+        paths = [tmp_path / ".env", tmp_path / ".env.local"]
+        paths[0].write_text("ENVIRONMENT=PRODUCTION\n")
+        monkeypatch.setattr(setup_mod, "get_config_files", lambda: [str(p) for p in paths])
+        return paths
+
+    @pytest.fixture
+    def main(self, monkeypatch):
+        calls = []
+
+        def fake_main():
+            calls.append(os.environ["ENVIRONMENT"])
+            os.environ["NF_LOADED"] = os.environ["ENVIRONMENT"]
+
+        monkeypatch.setattr(setup_mod.config, "main", fake_main)
+        monkeypatch.delenv("NF_LOADED", raising=False)
+        return calls
+
+    def test_loads_once_per_environment(self, config_files, main):
+        assert setup_mod.load_config("TESTING") is True
+        assert setup_mod.load_config("TESTING") is False
+        assert main == ["TESTING"]
+
+    def test_reloads_for_other_environment(self, config_files, main):
+        setup_mod.load_config("TESTING")
+        setup_mod.load_config("DEVELOPMENT")
+        setup_mod.load_config("TESTING")
+        assert main == ["TESTING", "DEVELOPMENT"]
+
+    def test_cache_hit_restores_variables(self, config_files, main):
+        setup_mod.load_config("TESTING")
+        setup_mod.load_config("DEVELOPMENT")
+        setup_mod.load_config("TESTING")
+        assert os.environ["NF_LOADED"] == "TESTING"
+
+    def test_switch_unsets_previous_environment(self, config_files, monkeypatch):
+        def fake_main():
+            os.environ["NEO4J_URI"] = f"bolt://{os.environ['ENVIRONMENT'].lower()}:7687"
+            if os.environ["ENVIRONMENT"] == "TESTING":
+                os.environ["NF_TESTING_ONLY"] = "1"
+
+        monkeypatch.setattr(setup_mod.config, "main", fake_main)
+        monkeypatch.setenv("NEO4J_URI", "bolt://process:7687")
+        monkeypatch.delenv("NF_TESTING_ONLY", raising=False)
+
+        setup_mod.load_config("TESTING")
+        assert os.environ["NF_TESTING_ONLY"] == "1"
+        setup_mod.load_config("PRODUCTION")
+        assert "NF_TESTING_ONLY" not in os.environ
+        assert os.environ["NEO4J_URI"] == "bolt://production:7687"
+        assert setup_mod.load_config("TESTING") is False
+        assert os.environ["NF_TESTING_ONLY"] == "1"
+        assert os.environ["NEO4J_URI"] == "bolt://testing:7687"
+
+        setup_mod.unload_config()
+        assert os.environ["NEO4J_URI"] == "bolt://process:7687"
+
+    def test_reloads_when_file_changes(self, config_files, main):
+        setup_mod.load_config("TESTING")
+        config_files[1].write_text("NEO4J_PORT_BOLT=7688\n")
+        os.utime(config_files[1], ns=(0, 10**9))
+        setup_mod.load_config("TESTING")
+        assert main == ["TESTING", "TESTING"]
+
+    def test_invalidate(self, config_files, main):
+        setup_mod.load_config("TESTING")
+        setup_mod.invalidate_config()
+        setup_mod.load_config("TESTING")
+        assert main == ["TESTING", "TESTING"]
+
+    def test_env_prints_header_once(self, ctx, config_files, main, monkeypatch, capsys, tmp_path):
+        monkeypatch.setenv("NF_DIR", str(tmp_path))
+        original = os.getcwd()
+        try:
+            setup_mod.env.__wrapped__(ctx, environment="TESTING")
+            setup_mod.env.__wrapped__(ctx, environment="TESTING")
+        finally:
+            os.chdir(original)
+        assert capsys.readouterr().out.count("Environment [TESTING]") == 1
+
+
 # ---------------------------------------------------------------------------
 # Task: nenv
 # ---------------------------------------------------------------------------
 
+PYPROJECT = """
+[build-system]
+requires = ["setuptools"]
+
+[project]
+name = "neuro"
+dependencies = ["neo4j>=5", "requests"]
+"""
+
+
 class TestNenvTask:
+    @pytest.fixture(autouse=True)
+    def _app_dir(self, monkeypatch, tmp_path):
+        monkeypatch.chdir(tmp_path)
+        monkeypatch.setenv("NF_CACHE", str(tmp_path / "cache"))
+        (tmp_path / "neuro").mkdir()
+        (tmp_path / "neuro" / "pyproject.toml").write_text(PYPROJECT)
+        (tmp_path / "nenv").mkdir()  # created by `venv`, which is recorded
+        return tmp_path
+
+    @staticmethod
+    def _existing_venv(deps_hash, installed=False):
+        os.makedirs("nenv/bin", exist_ok=True)
+        open("nenv/bin/pip", "w").close()
+        setup_mod.write_nenv_stamp(deps_hash)
+        if installed:
+            setup_mod.write_nenv_stamp(setup_mod.get_pyproject_hash(), setup_mod.NENV_INSTALL_STAMP)
+
     def test_creates_venv_and_installs(self, ctx, subprocess_recorder):
         setup_mod.nenv.__wrapped__(ctx)
-        assert subprocess_recorder.call_count == 2
         cmds = [c[0][0] for c in subprocess_recorder.calls]
-        assert cmds[0] == ["python3", "-m", "venv", "nenv"]
-        assert cmds[1] == ["nenv/bin/pip", "install", "./neuro"]
+        wheels = os.path.join(os.environ["NF_CACHE"], "wheels")
+        assert cmds == [
+            ["python3", "-m", "venv", "--clear", "nenv"],
+            ["nenv/bin/pip", "wheel", "--wheel-dir", wheels, "--find-links", wheels, "neo4j>=5", "requests"],
+            ["nenv/bin/pip", "install", "--no-index", "--find-links", wheels, "neo4j>=5", "requests"],
+            ["nenv/bin/pip", "install", "--no-deps", "-e", "./neuro"],
+        ]
+
+    def test_writes_stamp(self, ctx, subprocess_recorder):
+        setup_mod.nenv.__wrapped__(ctx)
+        assert setup_mod.read_nenv_stamp() == setup_mod.get_deps_hash(setup_mod.read_deps())
+
+    def test_reuses_venv_when_deps_unchanged(self, ctx, subprocess_recorder):
+        self._existing_venv(setup_mod.get_deps_hash(setup_mod.read_deps()))
+        setup_mod.nenv.__wrapped__(ctx)
+        cmds = [c[0][0] for c in subprocess_recorder.calls]
+        assert cmds == [["nenv/bin/pip", "install", "--no-deps", "-e", "./neuro"]]
+
+    def test_unchanged_tree_installs_nothing(self, ctx, subprocess_recorder):
+        self._existing_venv(setup_mod.get_deps_hash(setup_mod.read_deps()), installed=True)
+        setup_mod.nenv.__wrapped__(ctx)
+        assert subprocess_recorder.call_count == 0
+
+    def test_reinstalls_when_pyproject_changes(self, ctx, subprocess_recorder, tmp_path):
+        self._existing_venv(setup_mod.get_deps_hash(setup_mod.read_deps()), installed=True)
+        (tmp_path / "neuro" / "pyproject.toml").write_text(PYPROJECT + "\n[project.scripts]\nneuro = 'neuro.cli:main'\n")
+        setup_mod.nenv.__wrapped__(ctx)
+        cmds = [c[0][0] for c in subprocess_recorder.calls]
+        assert cmds == [["nenv/bin/pip", "install", "--no-deps", "-e", "./neuro"]]
+
+    def test_rebuilds_when_deps_change(self, ctx, subprocess_recorder):
+        self._existing_venv("stale")
+        setup_mod.nenv.__wrapped__(ctx)
+        assert subprocess_recorder.calls[0][0][0][:3] == ["python3", "-m", "venv"]
+
+    def test_rebuild_flag(self, ctx, subprocess_recorder):
+        self._existing_venv(setup_mod.get_deps_hash(setup_mod.read_deps()))
+        setup_mod.nenv.__wrapped__(ctx, rebuild=True)
+        assert subprocess_recorder.call_count == 4
 
     def test_passes_check_true(self, ctx, subprocess_recorder):
         setup_mod.nenv.__wrapped__(ctx)
@@ -142,6 +296,20 @@ class TestNenvTask:
             assert call[1].get("check") is True
 
 
+class TestDepsHash:
+    def test_ignores_source_metadata(self, tmp_path):
+        (tmp_path / "pyproject.toml").write_text(PYPROJECT)
+        before = setup_mod.get_deps_hash(setup_mod.read_deps(str(tmp_path)))
+        (tmp_path / "pyproject.toml").write_text(PYPROJECT.replace('name = "neuro"', 'name = "neuro"\nversion = "2"'))
+        assert setup_mod.get_deps_hash(setup_mod.read_deps(str(tmp_path))) == before
+
+    def test_changes_with_dependencies(self, tmp_path):
+        (tmp_path / "pyproject.toml").write_text(PYPROJECT)
+        before = setup_mod.get_deps_hash(setup_mod.read_deps(str(tmp_path)))
+        (tmp_path / "pyproject.toml").write_text(PYPROJECT.replace('"requests"', '"requests>=2"'))
+        assert setup_mod.get_deps_hash(setup_mod.read_deps(str(tmp_path))) != before
+
+
 # ---------------------------------------------------------------------------
 # Constants
 # ---------------------------------------------------------------------------
@@ -177,6 +345,96 @@ class TestRsyncTask:
         assert args[2] == "neuro"
 
 
+# ---------------------------------------------------------------------------
+# watch
+# ---------------------------------------------------------------------------
+
+class FakeInotify:
+    def __init__(self, output):
+        self.stdout = io.StringIO(output)
+        self.terminated = False
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def terminate(self):
+        self.terminated = True
+
+
+class TestWatchChanges:
+    def test_batches_events(self, monkeypatch):
+        proc = FakeInotify("/src/neuro/a.py\n/src/neuro/b.py\n/src/neuro/a.py\n")
+        commands = []
+        monkeypatch.setattr(setup_mod.subprocess, "Popen", lambda cmd, **kw: commands.append(cmd) or proc)
+        batches = list(setup_mod.watch_changes(["/src/neuro"], debounce=0.5))
+        assert batches == [{"/src/neuro/a.py", "/src/neuro/b.py"}]
+        assert commands[0][0] == "inotifywait"
+        assert commands[0][-1] == "/src/neuro"
+        assert proc.terminated
+
+    def test_no_events(self, monkeypatch):
+        monkeypatch.setattr(setup_mod.subprocess, "Popen", lambda cmd, **kw: FakeInotify(""))
+        assert list(setup_mod.watch_changes(["/src"])) == []
+
+
+class TestAffectedTests:
+    @pytest.fixture
+    def source(self, tmp_path):
+        (tmp_path / "tests" / "tools").mkdir(parents=True)
+        (tmp_path / "tests" / "tools" / "test_tw5api.py").write_text("")
+        (tmp_path / "tests" / "test_config.py").write_text("")
+        return str(tmp_path)
+
+    def test_changed_test_file(self, source):
+        assert setup_mod.affected_tests(["tests/test_config.py"], source) == ["tests/test_config.py"]
+
+    def test_changed_module(self, source):
+        assert setup_mod.affected_tests(["neuro/tools/tw5api.py"], source) == ["tests/tools/test_tw5api.py"]
+
+    def test_ignores_non_python_and_helpers(self, source):
+        assert setup_mod.affected_tests(["README.md", "tests/conftest.py", "neuro/other.py"], source) == []
+
+
+class TestApplyChanges:
+    @pytest.fixture
+    def recorders(self, monkeypatch, tmp_path, subprocess_recorder):
+        (tmp_path / "tests").mkdir()
+        (tmp_path / "tests" / "test_config.py").write_text("")
+        monkeypatch.setattr(setup_mod.internal_utils, "get_path", lambda k: tmp_path)
+        rsync, nenv = Recorder(), Recorder()
+        monkeypatch.setattr(setup_mod, "rsync_component", rsync)
+        monkeypatch.setattr(setup_mod, "nenv", nenv)
+        return rsync, nenv, subprocess_recorder
+
+    def test_source_change_syncs_and_tests(self, ctx, recorders):
+        rsync, nenv, run = recorders
+        setup_mod.apply_changes(ctx, "neuro", ["neuro/config.py"])
+        assert rsync.call_count == 1
+        assert nenv.call_count == 0
+        assert run.last_args[0][:2] == ["nenv/bin/pytest", os.path.join("neuro", "tests", "test_config.py")]
+
+    def test_pyproject_change_runs_nenv(self, ctx, recorders):
+        _, nenv, _ = recorders
+        setup_mod.apply_changes(ctx, "neuro", ["pyproject.toml", "neuro/config.py"])
+        assert nenv.call_count == 1
+
+    def test_test_change_skips_reinstall(self, ctx, recorders):
+        _, nenv, run = recorders
+        setup_mod.apply_changes(ctx, "neuro", ["tests/test_config.py"])
+        assert nenv.call_count == 0
+        assert run.call_count == 1
+
+    def test_desktop_only_syncs(self, ctx, recorders):
+        rsync, nenv, run = recorders
+        setup_mod.apply_changes(ctx, "desktop", ["main.js"])
+        assert rsync.call_count == 1
+        assert nenv.call_count == 0
+        assert run.call_count == 0
+
+
 # ---------------------------------------------------------------------------
 # reset_submodule
 # ---------------------------------------------------------------------------
@@ -192,6 +450,78 @@ class TestResetSubmodule:
         assert cmds[2] == ["git", "clean", "-fdx"]
 
 
+# ---------------------------------------------------------------------------
+# sync_submodules (local bare repo as origin)
+# ---------------------------------------------------------------------------
+
+def _git(*args, cwd):
+    result = subprocess.run(["git", *args], cwd=cwd, check=True, capture_output=True, text=True)
+    return result.stdout.strip()
+
+
+@pytest.fixture
+def origin(monkeypatch, tmp_path):
+    """A bare origin with master and develop branches, and two clones of it on master."""
+    for key, value in [("NAME", "Test"), ("EMAIL", "test@example.com")]:
+        monkeypatch.setenv(f"GIT_AUTHOR_{key}", value)
+        monkeypatch.setenv(f"GIT_COMMITTER_{key}", value)
+    bare = tmp_path / "origin.git"
+    seed = tmp_path / "seed"
+    _git("init", "--bare", "-b", "master", str(bare), cwd=tmp_path)
+    _git("clone", str(bare), str(seed), cwd=tmp_path)
+    (seed / "README").write_text("master\n")
+    _git("add", "README", cwd=seed)
+    _git("commit", "-m", "master", cwd=seed)
+    _git("push", "origin", "master", cwd=seed)
+    _git("checkout", "-b", "develop", cwd=seed)
+    (seed / "README").write_text("develop\n")
+    _git("commit", "-am", "develop", cwd=seed)
+    _git("push", "origin", "develop", cwd=seed)
+
+    clones = []
+    for name in ("neuro", "desktop"):
+        clone = tmp_path / name
+        _git("clone", "-b", "master", str(bare), str(clone), cwd=tmp_path)
+        clones.append(str(clone))
+    return {"seed": seed, "clones": clones}
+
+
+class TestSyncSubmodules:
+    def test_fetches_and_resets_to_remote(self, origin):
+        rows = setup_mod.sync_submodules(origin["clones"], "develop", remote="origin", jobs=2)
+        develop = _git("rev-parse", "--short", "develop", cwd=origin["seed"])
+        assert [row["status"] for row in rows] == ["ok", "ok"]
+        assert [row["commit"] for row in rows] == [develop, develop]
+        for clone in origin["clones"]:
+            with open(os.path.join(clone, "README")) as f:
+                assert f.read() == "develop\n"
+
+    def test_preserves_order(self, origin):
+        rows = setup_mod.sync_submodules(list(reversed(origin["clones"])), "master", jobs=2)
+        assert [row["path"] for row in rows] == list(reversed(origin["clones"]))
+
+    def test_cleans_untracked_files(self, origin):
+        stray = os.path.join(origin["clones"][0], "stray.txt")
+        open(stray, "w").close()
+        setup_mod.sync_submodules(origin["clones"], "master")
+        assert not os.path.exists(stray)
+
+    def test_missing_branch(self, origin):
+        rows = setup_mod.sync_submodules(origin["clones"], "nope")
+        assert [row["status"] for row in rows] == ["missing", "missing"]
+
+    def test_failure_is_reported(self, origin, tmp_path):
+        rows = setup_mod.sync_submodules([origin["clones"][0], str(tmp_path / "gone")], "develop", remote="origin")
+        assert rows[0]["status"] == "ok"
+        assert rows[1]["status"] == "failed"
+        assert rows[1]["error"]
+
+    def test_develop_task_exits_on_failure(self, ctx, origin, tmp_path, capsys):
+        with pytest.raises(SystemExit):
+            setup_mod.develop.__wrapped__(ctx, components=[str(tmp_path / "gone")])
+        assert "gone" in capsys.readouterr().out
+
+
 class TestBranchTask:
     def test_resets_to_given_branch(self, ctx, monkeypatch, subprocess_recorder):
         monkeypatch.setattr(setup_mod.build_utils, "chdir", _noop_chdir)
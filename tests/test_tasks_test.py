@@ -2,15 +2,16 @@
 Tests for tasks.actions.test.
 """
 
-import os
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import ClassVar
 
 import pytest
-
 from neuro.utils.test_utils import FakeContext, Recorder, SubprocessResult
 
 import tasks.actions.test as test_mod
 
-
 # ---------------------------------------------------------------------------
 # Fixtures
 # ---------------------------------------------------------------------------
@@ -82,6 +83,67 @@ class TestLocal:
         assert patch_app.call_count == 1
 
 
+class TestLocalResults:
+    def test_failure_exits_with_table(self, ctx, monkeypatch, patch_neuro_test_local, patch_app, capsys):
+        def failing(c):
+            raise SystemExit(1)
+
+        monkeypatch.setattr(test_mod.tw5, "test", failing)
+        with pytest.raises(SystemExit):
+            test_mod.local.__wrapped__(ctx, components=[])
+        out = capsys.readouterr().out
+        assert "tw5" in out
+        assert "app" in out
+
+
+class TestLocalParallel:
+    @pytest.fixture(autouse=True)
+    def _prepare(self, monkeypatch, tmp_path):
+        monkeypatch.setenv("NF_STATE", str(tmp_path))
+        self.rsync = Recorder()
+        self.bundle = Recorder()
+        monkeypatch.setattr(test_mod.setup, "rsync", self.rsync)
+        monkeypatch.setattr(test_mod.tw5, "bundle", self.bundle)
+
+    @pytest.fixture
+    def run(self, monkeypatch):
+        calls = []
+
+        def fake_run(args, stdout=None, stderr=None, check=False):
+            calls.append(args)
+            stdout.write(f"output of {args[3]}\n")
+            return SubprocessResult(1 if args[3] == "tw5.test" else 0)
+
+        monkeypatch.setattr(test_mod.subprocess, "run", fake_run)
+        return calls
+
+    def test_runs_all_suites_as_subprocesses(self, ctx, run):
+        with pytest.raises(SystemExit):
+            test_mod.local.__wrapped__(ctx, components=[], parallel=True)
+        tasks = sorted(args[3] for args in run)
+        assert tasks == ["app.test", "neuro.test", "tw5.test"]
+        assert all(args[1:3] == ["-m", "invoke"] for args in run)
+
+    def test_prepares_shared_state_once(self, ctx, run):
+        test_mod.local.__wrapped__(ctx, components=["neuro"], parallel=True)
+        assert self.rsync.call_count == 1
+        assert self.bundle.call_count == 1
+        assert run == [[test_mod.sys.executable, "-m", "invoke", "neuro.test", "--mode", "e2e", "--bundled"]]
+
+    def test_app_only_skips_preparation(self, ctx, run):
+        test_mod.local.__wrapped__(ctx, components=["app"], parallel=True)
+        assert self.rsync.call_count == 0
+        assert self.bundle.call_count == 0
+
+    def test_writes_logs_and_shows_failed_tail(self, ctx, run, capsys, tmp_path):
+        with pytest.raises(SystemExit):
+            test_mod.local.__wrapped__(ctx, components=["app", "tw5"], parallel=True)
+        assert (tmp_path / "logs" / "test-app.log").read_text() == "output of app.test\n"
+        out = capsys.readouterr().out
+        assert "output of tw5.test" in out
+        assert "output of app.test" not in out
+
+
 # ---------------------------------------------------------------------------
 # ruff
 # ---------------------------------------------------------------------------
@@ -111,7 +173,7 @@ class TestRuff:
 
     def test_nonzero_exit_raises(self, ctx, monkeypatch):
         monkeypatch.setattr(test_mod.neuro, "ruff", Recorder())
-        monkeypatch.setattr(test_mod.subprocess, "run", lambda args: SubprocessResult(1))
+        monkeypatch.setattr(test_mod.subprocess, "run", lambda args, check: SubprocessResult(1))
         with pytest.raises(SystemExit):
             test_mod.ruff.__wrapped__(ctx)
 
@@ -120,16 +182,218 @@ class TestRuff:
 # production
 # ---------------------------------------------------------------------------
 
+class RecordingHandler(BaseHTTPRequestHandler):
+    requests: ClassVar[list] = []
+
+    def respond(self):
+        length = int(self.headers.get("Content-Length") or 0)
+        body = self.rfile.read(length) if length else b""
+        RecordingHandler.requests.append((self.command, self.path, dict(self.headers), body))
+        self.send_response(200)
+        self.end_headers()
+        self.wfile.write(b'[{"title": "Bench 000007"}]')
+
+    do_GET = do_PUT = respond
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def tw_server():
+    RecordingHandler.requests = []
+    server = ThreadingHTTPServer(("127.0.0.1", 0), RecordingHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield server.server_address[1]
+    server.shutdown()
+    server.server_close()
+
+
+class TestConfirmClear:
+    @pytest.fixture
+    def testing(self, monkeypatch):
+        monkeypatch.setenv("ENVIRONMENT", "TESTING")
+        monkeypatch.setenv("BASE_NAME", "nb-test")
+
+    def test_refuses_outside_testing(self, monkeypatch, capsys):
+        monkeypatch.setenv("ENVIRONMENT", "DEVELOP")
+        monkeypatch.setattr(test_mod.neurobase, "count_tiddlers", Recorder(return_value=0))
+        with pytest.raises(SystemExit):
+            test_mod.confirm_clear(object())
+        assert "DEVELOP" in capsys.readouterr().out
+        assert test_mod.neurobase.count_tiddlers.call_count == 0
+
+    def test_empty_database(self, testing, monkeypatch):
+        monkeypatch.setattr(test_mod.neurobase, "count_tiddlers", lambda driver: 0)
+        prompt = Recorder(return_value=False)
+        monkeypatch.setattr(test_mod.terminal_components, "bool_prompt", prompt)
+        test_mod.confirm_clear(object())
+        assert prompt.call_count == 0
+
+    def test_prompts_before_deleting(self, testing, monkeypatch):
+        monkeypatch.setattr(test_mod.neurobase, "count_tiddlers", lambda driver: 12)
+        prompt = Recorder(return_value=False)
+        monkeypatch.setattr(test_mod.terminal_components, "bool_prompt", prompt)
+        with pytest.raises(SystemExit, match="Aborting"):
+            test_mod.confirm_clear(object())
+        assert "nb-test" in prompt.calls[0][0][0]
+
+    def test_confirmed_skips_prompt(self, testing, monkeypatch):
+        monkeypatch.setattr(test_mod.neurobase, "count_tiddlers", lambda driver: 12)
+        prompt = Recorder(return_value=False)
+        monkeypatch.setattr(test_mod.terminal_components, "bool_prompt", prompt)
+        test_mod.confirm_clear(object(), confirmed=True)
+        assert prompt.call_count == 0
+
+
+class TestEnsureDesktopClosed:
+    def test_closed(self, monkeypatch):
+        monkeypatch.setattr(test_mod.desktop, "running_pid", lambda: None)
+        monkeypatch.setattr(test_mod.desktop, "server_ready", lambda port: False)
+        test_mod.ensure_desktop_closed("8080")
+
+    def test_live_pid(self, monkeypatch, capsys):
+        monkeypatch.setattr(test_mod.desktop, "running_pid", lambda: 4321)
+        with pytest.raises(SystemExit):
+            test_mod.ensure_desktop_closed("8080")
+        assert "PID 4321" in capsys.readouterr().out
+
+    def test_stale_pid_but_server_answers(self, monkeypatch, capsys):
+        monkeypatch.setattr(test_mod.desktop, "running_pid", lambda: None)
+        monkeypatch.setattr(test_mod.desktop, "server_ready", lambda port: True)
+        with pytest.raises(SystemExit):
+            test_mod.ensure_desktop_closed("8080")
+        assert "port 8080" in capsys.readouterr().out
+
+
+class TestSeedBench:
+    def test_clears_then_writes(self, monkeypatch):
+        calls = []
+        monkeypatch.setattr(test_mod.neurobase, "clear_graph", lambda driver: calls.append("clear"))
+        monkeypatch.setattr(test_mod.neurobase, "write_graph", lambda driver, graph: calls.append("write"))
+        assert test_mod.seed_bench(object(), test_mod.neurobase.SyntheticGraph(10)) >= 0
+        assert calls == ["clear", "write"]
+
+
+class TestTwRequests:
+    def test_put_tiddler(self, tw_server):
+        test_mod.put_tiddler(tw_server, {"title": "A b/c", "text": "x"})
+        method, path, headers, body = RecordingHandler.requests[0]
+        assert (method, path) == ("PUT", "/recipes/default/tiddlers/A%20b%2Fc")
+        assert headers["X-Requested-With"] == "TiddlyWiki"
+        assert json.loads(body) == {"title": "A b/c", "text": "x"}
+
+    def test_run_filter(self, tw_server):
+        assert test_mod.run_filter(tw_server, "[tag[x]]") == [{"title": "Bench 000007"}]
+        assert RecordingHandler.requests[0][1] == "/recipes/default/tiddlers.json?filter=%5Btag%5Bx%5D%5D"
+
+
+class TestCompareResults:
+    def test_flags_regressions(self):
+        baseline = {"1000": {"save_p50": 0.010, "cold_start": 2.0}}
+        current = {"1000": {"save_p50": 0.013, "cold_start": 2.1}}
+        rows = {row["metric"]: row for row in test_mod.compare_results(current, baseline, threshold=0.2)}
+        assert rows["1000/save_p50"]["regressed"] is True
+        assert rows["1000/cold_start"]["regressed"] is False
+
+    def test_skips_metrics_missing_from_either_run(self):
+        baseline = {"1000": {"first_render": 1.0}}
+        current = {"1000": {"first_render": None, "save_p50": 0.01}, "10000": {"save_p50": 0.02}}
+        assert test_mod.compare_results(current, baseline) == []
+
+
+class TestMeasureDesktop:
+    @pytest.fixture(autouse=True)
+    def desktop_closed(self, monkeypatch):
+        monkeypatch.setattr(test_mod, "ensure_desktop_closed", Recorder())
+
+    def test_collects_metrics(self, ctx, monkeypatch):
+        monkeypatch.setenv("PORT", "8080")
+        monkeypatch.delenv("DESKTOP_DEVTOOLS_PORT", raising=False)
+        monkeypatch.setattr(test_mod.desktop, "get_app_dir", lambda: "/app")
+        monkeypatch.setattr(test_mod.desktop, "spawn", lambda app_dir: object())
+        monkeypatch.setattr(test_mod.desktop, "wait_until_ready", lambda process, port: "ready")
+        monkeypatch.setattr(test_mod, "put_tiddler", Recorder())
+        monkeypatch.setattr(test_mod, "run_filter", Recorder())
+        monkeypatch.setattr(test_mod, "wait_for_saved", lambda driver, title, text: 0.05)
+        monkeypatch.setattr(test_mod.desktop, "resolve_title", lambda uuid, cache: "title")
+        close = Recorder()
+        monkeypatch.setattr(test_mod.desktop, "close", close)
+
+        graph = test_mod.neurobase.SyntheticGraph(1000)
+        metrics = test_mod.measure_desktop(ctx, object(), graph, repeat=3)
+
+        assert test_mod.put_tiddler.call_count == 3
+        assert test_mod.run_filter.call_count == 3 * len(test_mod.BENCH_FILTERS)
+        assert {"cold_start", "save_p50", "saved_p95", "filter_tag_p50", "resolve_warm_p95"} <= set(metrics)
+        assert "first_render" not in metrics
+        assert close.call_count == 1
+
+    def test_not_ready_still_closes(self, ctx, monkeypatch):
+        monkeypatch.setattr(test_mod.desktop, "get_app_dir", lambda: "/app")
+        monkeypatch.setattr(test_mod.desktop, "spawn", lambda app_dir: object())
+        monkeypatch.setattr(test_mod.desktop, "wait_until_ready", lambda process, port: "timeout")
+        close = Recorder()
+        monkeypatch.setattr(test_mod.desktop, "close", close)
+        with pytest.raises(SystemExit):
+            test_mod.measure_desktop(ctx, object(), test_mod.neurobase.SyntheticGraph(10))
+        assert close.call_count == 1
+
+    def test_already_running_exits_before_spawn(self, ctx, monkeypatch):
+        def running(port):
+            raise SystemExit(1)
+
+        monkeypatch.setattr(test_mod, "ensure_desktop_closed", running)
+        spawn = Recorder()
+        monkeypatch.setattr(test_mod.desktop, "spawn", spawn)
+        close = Recorder()
+        monkeypatch.setattr(test_mod.desktop, "close", close)
+        with pytest.raises(SystemExit):
+            test_mod.measure_desktop(ctx, object(), test_mod.neurobase.SyntheticGraph(10))
+        assert spawn.call_count == 0
+        assert close.call_count == 0
+
+
 class TestProduction:
-    def test_sets_environment(self, ctx, monkeypatch):
-        monkeypatch.delenv("ENVIRONMENT", raising=False)
-        test_mod.production.__wrapped__(ctx)
-        assert os.environ["ENVIRONMENT"] == "TESTING"
+    @pytest.fixture
+    def bench(self, monkeypatch, tmp_path):
+        monkeypatch.setenv("NF_STATE", str(tmp_path))
+        monkeypatch.setattr(test_mod.neurobase, "start", Recorder())
+        results = {"1000": {"seed": 1.0, "save_p50": 0.010}}
+        rec = Recorder(return_value=results)
+        monkeypatch.setattr(test_mod, "run_benchmarks", rec)
+        return rec
+
+    def test_testing_environment(self):
+        pre = test_mod.production.pre[0]
+        assert pre.kwargs == {"environment": "TESTING"}
+
+    def test_default_sizes(self, ctx, bench, tmp_path, capsys):
+        test_mod.production.__wrapped__(ctx, sizes=[], output=str(tmp_path / "out.json"))
+        assert bench.calls[0][0][1] == test_mod.BENCH_SIZES
+        saved = json.loads((tmp_path / "out.json").read_text())
+        assert saved["results"]["1000"]["save_p50"] == 0.010
+        assert "No baseline" in capsys.readouterr().out
+
+    def test_confirmed_is_passed_on(self, ctx, bench, tmp_path):
+        test_mod.production.__wrapped__(ctx, sizes=["1000"], output=str(tmp_path / "out.json"), confirmed=True)
+        assert bench.calls[0][1]["confirmed"] is True
+
+    def test_save_baseline(self, ctx, bench, tmp_path):
+        test_mod.production.__wrapped__(ctx, sizes=["1000"], save_baseline=True)
+        assert test_mod.read_results(tmp_path / "bench" / "baseline.json") == bench.return_value
+
+    def test_regression_fails(self, ctx, bench, tmp_path, capsys):
+        baseline = tmp_path / "baseline.json"
+        test_mod.write_results(str(baseline), {"1000": {"seed": 1.0, "save_p50": 0.005}}, [1000])
+        with pytest.raises(SystemExit):
+            test_mod.production.__wrapped__(ctx, sizes=["1000"], baseline=str(baseline))
+        assert "1000/save_p50" in capsys.readouterr().out
 
-    def test_prints_stub_message(self, ctx, capsys):
-        test_mod.production.__wrapped__(ctx)
-        out = capsys.readouterr().out
-        assert "not yet implemented" in out
+    def test_within_threshold_passes(self, ctx, bench, tmp_path):
+        baseline = tmp_path / "baseline.json"
+        test_mod.write_results(str(baseline), {"1000": {"seed": 1.0, "save_p50": 0.009}}, [1000])
+        test_mod.production.__wrapped__(ctx, sizes=["1000"], baseline=str(baseline), threshold="0.2")
 
 
 # ---------------------------------------------------------------------------
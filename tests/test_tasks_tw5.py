@@ -6,12 +6,10 @@ import json
 from pathlib import Path
 
 import pytest
-
 from neuro.utils.test_utils import FakeContext, Recorder, SubprocessResult, noop_step
 
 import tasks.components.tw5 as tw5_mod
 
-
 # ---------------------------------------------------------------------------
 # Fixtures
 # ---------------------------------------------------------------------------
@@ -261,6 +259,11 @@ class TestTestTask:
         tw5_mod.test.__wrapped__(ctx)
         assert patch_bundle.call_count == 1
 
+    def test_bundled_skips_bundle(self, ctx, patch_bundle, subprocess_recorder, monkeypatch):
+        monkeypatch.setattr(tw5_mod.internal_utils, "get_path", lambda k: Path("/app/tw5"))
+        tw5_mod.test.__wrapped__(ctx, bundled=True)
+        assert patch_bundle.call_count == 0
+
     def test_runs_test_sh(self, ctx, patch_bundle, subprocess_recorder, monkeypatch):
         monkeypatch.setattr(tw5_mod.internal_utils, "get_path", lambda k: Path("/app/tw5"))
         tw5_mod.test.__wrapped__(ctx)